@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,7 +9,45 @@ class Settings(BaseSettings):
     ALGORITHM: str
     REDIS_HOST: str
 
+    # optional streaming replica for dashboard reads
+    DATABASE_READ_URL: str | None = None
+
+    # ETL log file in addition to stderr; unset logs to stderr only
+    ETL_LOG_FILE: str | None = None
+
+    # API statements slower than this are logged with their SQL shape
+    SLOW_QUERY_MS: float = 200
+
+    # Stand-ins for the upstream sources (app.tools.fake_upstream,
+    # app.tools.synthetic): the day_by endpoint URL, and a directory with
+    # operators_sheet.json / kpi_sheet.json read instead of Google Sheets.
+    METRICS_API_URL: str | None = None
+    SHEETS_DIR: str | None = None
+
+    # Google Sheet with the bonus grid (login, year, month, kie,
+    # active_participation, monitoring); a CSV export works too
+    BONUS_SHEET_URL: str | None = None
+
+    # X-Profile-Token value that enables per-request profiling (unset:
+    # disabled) and where the folded profiles are written
+    PROFILE_TOKEN: str | None = None
+    PROFILE_DIR: str = "profiles"
+
+    # avatar thumbnails written by the sheet sync, served by /api/avatars
+    AVATAR_DIR: str = "avatars"
+
     class Config:
         env_file = ".env"
 
-settings = Settings()
+
+@lru_cache
+def get_settings() -> Settings:
+    """Settings are read on first use, not at import time."""
+    return Settings()
+
+
+def __getattr__(name: str):
+    # `settings` used to be a module attribute built at import time
+    if name == "settings":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
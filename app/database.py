@@ -1,8 +1,82 @@
+import logging
+import threading
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from app.config import settings
+from sqlalchemy.orm import Session, sessionmaker
+from app.config import get_settings
+from app.utils.data_version import replica_is_current
+
+logger = logging.getLogger(__name__)
 
-engine = create_engine(settings.DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
+
+# Two engines: the primary, used for every write (ETL, migrations), and an
+# optional read replica (DATABASE_READ_URL) used by the dashboard.
+_engine: Engine | None = None
+_read_engine: Engine | None = None
+_engine_lock = threading.Lock()
+_session_factory = sessionmaker(autoflush=False, autocommit=False)
+_read_session_factory = sessionmaker(autoflush=False, autocommit=False)
+
+
+def get_engine() -> Engine:
+    """The primary engine, created on first use rather than on import."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_engine(
+                    get_settings().DATABASE_URL,
+                    pool_pre_ping=True
+                )
+                _session_factory.configure(bind=_engine)
+    return _engine
+
+
+def get_read_engine() -> Engine:
+    """The replica engine, or the primary when no replica is configured."""
+    global _read_engine
+    if _read_engine is None:
+        read_url = get_settings().DATABASE_READ_URL
+        if not read_url:
+            return get_engine()
+
+        with _engine_lock:
+            if _read_engine is None:
+                _read_engine = create_engine(read_url, pool_pre_ping=True)
+                _read_session_factory.configure(bind=_read_engine)
+    return _read_engine
+
+
+def SessionLocal(**kwargs) -> Session:
+    """Session on the primary. The ETL and every write use this."""
+    get_engine()
+    return _session_factory(**kwargs)
+
+
+def ReadSessionLocal(**kwargs) -> Session:
+    """
+    Session for dashboard reads: on the replica when there is one and it
+    has caught up with the latest published data version, otherwise on
+    the primary.
+    """
+    if get_read_engine() is get_engine():
+        return SessionLocal(**kwargs)
+
+    db = _read_session_factory(**kwargs)
+    try:
+        if replica_is_current(db):
+            return db
+    except Exception:
+        logger.warning("Read replica check failed, using primary", exc_info=True)
+
+    db.close()
+    return SessionLocal(**kwargs)
+
+
+def __getattr__(name: str):
+    # `engine` used to be a module attribute built at import time
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
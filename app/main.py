@@ -1,14 +1,21 @@
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import Base, engine
-from app.routers import dashboard_router
+from app.routers import avatar_router, dashboard_router, metrics_router, operators_router
+from app.utils.profiler import ProfilerMiddleware
+from app.utils.request_metrics import sql_timing_middleware
 from fastapi import FastAPI
-import asyncio
 
-Base.metadata.create_all(bind=engine)
+# The schema is managed by migrations (python -m app.migrate); importing
+# the app never touches the database.
 
 app = FastAPI(title="Top Operators API", version="1.0.0")
 
 app.include_router(dashboard_router.router)
+app.include_router(operators_router.router)
+app.include_router(avatar_router.router)
+app.include_router(metrics_router.router)
+
+app.middleware("http")(sql_timing_middleware)
+app.add_middleware(ProfilerMiddleware)
 
 
 app.add_middleware(
@@ -0,0 +1,128 @@
+"""
+Apply the versioned SQL migrations in ``migrations/``.
+
+Files are named ``NNN_description.sql`` and applied in order, each in its
+own transaction, and recorded in ``schema_migrations``:
+
+    python -m app.migrate              # apply pending migrations
+    python -m app.migrate --status     # list applied / pending
+    python -m app.migrate --baseline 004
+        # mark 001..004 as applied without running them (databases that
+        # were created by hand from the SQL files)
+"""
+import argparse
+import logging
+import re
+import sys
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.database import get_engine
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations"
+MIGRATION_FILE = re.compile(r"^(\d{3})_[\w-]+\.sql$")
+
+# arbitrary key for pg_advisory_lock, so two runners never interleave
+LOCK_KEY = 7_202_601
+
+logger = logging.getLogger(__name__)
+
+
+def discover(directory: Path = MIGRATIONS_DIR) -> list[tuple[str, Path]]:
+    found = []
+    for path in sorted(directory.iterdir()):
+        m = MIGRATION_FILE.match(path.name)
+        if m:
+            found.append((m.group(1), path))
+
+    versions = [v for v, _ in found]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError(f"Duplicate migration versions in {directory}")
+
+    return found
+
+
+def ensure_table(conn: Connection) -> None:
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR PRIMARY KEY,
+            name VARCHAR NOT NULL,
+            applied_at TIMESTAMP DEFAULT now()
+        )
+    """))
+
+
+def applied_versions(conn: Connection) -> set[str]:
+    return set(conn.execute(text("SELECT version FROM schema_migrations")).scalars())
+
+
+def record(conn: Connection, version: str, name: str) -> None:
+    conn.execute(
+        text("INSERT INTO schema_migrations (version, name) VALUES (:version, :name)"),
+        {"version": version, "name": name}
+    )
+
+
+def apply(conn: Connection, version: str, path: Path) -> None:
+    logger.info(f"Applying {path.name}")
+    with conn.begin():
+        # raw DBAPI cursor: migration files hold several statements and
+        # PL/pgSQL bodies, and must not go through bind-parameter parsing
+        conn.connection.cursor().execute(path.read_text(encoding="utf-8"))
+        record(conn, version, path.name)
+
+
+def migrate(baseline: str | None = None, status: bool = False) -> int:
+    migrations = discover()
+
+    with get_engine().connect() as conn:
+        with conn.begin():
+            ensure_table(conn)
+
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+        conn.commit()
+
+        try:
+            done = applied_versions(conn)
+            conn.commit()
+            pending = [(v, p) for v, p in migrations if v not in done]
+
+            if status:
+                for version, path in migrations:
+                    state = "applied" if version in done else "pending"
+                    print(f"{state:8} {path.name}")
+                return 0
+
+            if baseline:
+                with conn.begin():
+                    for version, path in pending:
+                        if version <= baseline:
+                            record(conn, version, path.name)
+                            logger.info(f"Baselined {path.name}")
+                pending = [(v, p) for v, p in pending if v > baseline]
+
+            for version, path in pending:
+                apply(conn, version, path)
+
+            logger.info(f"Migrations up to date | applied={len(pending)}")
+            return 0
+
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+            conn.commit()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="Apply SQL migrations")
+    parser.add_argument("--status", action="store_true")
+    parser.add_argument("--baseline", metavar="VERSION")
+    args = parser.parse_args()
+
+    sys.exit(migrate(baseline=args.baseline, status=args.status))
@@ -1,21 +1,26 @@
 import uuid
 from sqlalchemy import (
     Column,
+    Computed,
     String,
+    Text,
     Float,
     Date,
     ForeignKey,
-    UniqueConstraint,
     DateTime,
     Integer,
     Boolean,
+    Identity,
+    PrimaryKeyConstraint,
     func,
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 
 from app.database import Base
 
+# The schema is owned by migrations/ (python -m app.migrate); these models
+# only map it.
 
 class Operator(Base):
     __tablename__ = "operators"
@@ -35,12 +40,33 @@ class Operator(Base):
     full_name = Column(String, nullable=False)
     group_name = Column(String, nullable=False)
     avatar_url = Column(String)
+    # thumbnails (app.services.avatars) and the avatar_url they were made from
+    avatar_hash = Column(String(64))
+    avatar_source_url = Column(String)
 
     agent_id = Column(
         Integer,
         unique=True
     )
 
+    # trigram-indexed search key (migrations/016_operator_search.sql)
+    search_key = Column(
+        Text,
+        Computed(
+            "operator_search_key(full_name) || ' ' || operator_search_key(operator_id)"
+            " || ' ' || COALESCE(agent_id::text, '')",
+            persisted=True
+        )
+    )
+
+    # compact key the fact tables reference; id stays the public identifier
+    operator_key = Column(
+        Integer,
+        Identity(always=True),
+        nullable=False,
+        unique=True
+    )
+
     created_at = Column(
         DateTime,
         server_default=func.now()
@@ -61,15 +87,9 @@ class Operator(Base):
 class OperatorMetric(Base):
     __tablename__ = "operator_metrics"
 
-    id = Column(
-        UUID(as_uuid=True),
-        primary_key=True,
-        default=uuid.uuid4
-    )
-
-    operator_uuid = Column(
-        UUID(as_uuid=True),
-        ForeignKey("operators.id", ondelete="CASCADE"),
+    operator_key = Column(
+        Integer,
+        ForeignKey("operators.operator_key", ondelete="CASCADE"),
         nullable=False
     )
 
@@ -85,6 +105,8 @@ class OperatorMetric(Base):
 
     kpi = Column(Float)
 
+    content_hash = Column(String(32))
+
     created_at = Column(
         DateTime,
         server_default=func.now()
@@ -96,25 +118,19 @@ class OperatorMetric(Base):
     )
 
     __table_args__ = (
-        UniqueConstraint(
-            "operator_uuid",
+        PrimaryKeyConstraint(
+            "operator_key",
             "date",
-            name="uq_operator_metrics_operator_date"
+            name="pk_operator_metrics"
         ),
     )
 
 class OperatorMonthlyMetric(Base):
     __tablename__ = "operator_monthly_metrics"
 
-    id = Column(
-        UUID(as_uuid=True),
-        primary_key=True,
-        default=uuid.uuid4
-    )
-
-    operator_uuid = Column(
-        UUID(as_uuid=True),
-        ForeignKey("operators.id", ondelete="CASCADE"),
+    operator_key = Column(
+        Integer,
+        ForeignKey("operators.operator_key", ondelete="CASCADE"),
         nullable=False
     )
 
@@ -136,6 +152,15 @@ class OperatorMonthlyMetric(Base):
 
     stars = Column(Integer)
 
+    # movement of the latest active day (see OperatorDailyRank)
+    rank_delta = Column(Integer)
+    rank_streak = Column(Integer)
+
+    # share of the group below the operator (refresh_cycle_percentiles)
+    call_count_pct = Column(Float)
+    avg_busy_pct = Column(Float)
+    kpi_pct = Column(Float)
+
     created_at = Column(
         DateTime,
         server_default=func.now()
@@ -147,26 +172,20 @@ class OperatorMonthlyMetric(Base):
     )
 
     __table_args__ = (
-        UniqueConstraint(
-            "operator_uuid",
+        PrimaryKeyConstraint(
+            "operator_key",
             "year",
             "month",
-            name="uq_operator_month"
+            name="pk_operator_monthly_metrics"
         ),
     )
 
 class BonusDistribution(Base):
     __tablename__ = "bonus_distributions"
 
-    id = Column(
-        UUID(as_uuid=True),
-        primary_key=True,
-        default=uuid.uuid4
-    )
-
-    operator_uuid = Column(
-        UUID(as_uuid=True),
-        ForeignKey("operators.id", ondelete="CASCADE"),
+    operator_key = Column(
+        Integer,
+        ForeignKey("operators.operator_key", ondelete="CASCADE"),
         nullable=False
     )
 
@@ -181,3 +200,111 @@ class BonusDistribution(Base):
         DateTime,
         server_default=func.now()
     )
+
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "operator_key",
+            "year",
+            "month",
+            name="pk_bonus_distributions"
+        ),
+    )
+
+
+class OperatorLatestMetric(Base):
+    __tablename__ = "operator_latest_metrics"
+
+    operator_key = Column(
+        Integer,
+        ForeignKey("operators.operator_key", ondelete="CASCADE"),
+        nullable=False
+    )
+
+    date = Column(Date, nullable=False)
+
+    call_count = Column(Float)
+    avg_busy_seconds = Column(Float, nullable=False, server_default="0")
+    kpi = Column(Float)
+
+    updated_at = Column(
+        DateTime,
+        server_default=func.now()
+    )
+
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "operator_key",
+            name="pk_operator_latest_metrics"
+        ),
+    )
+
+
+class GroupCycleStat(Base):
+    __tablename__ = "group_cycle_stats"
+
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    group_name = Column(String, nullable=False)
+    metric = Column(String, nullable=False)
+
+    operators = Column(Integer, nullable=False)
+    min_value = Column(Float)
+    max_value = Column(Float)
+    mean_value = Column(Float)
+    p10 = Column(Float)
+    p25 = Column(Float)
+    p50 = Column(Float)
+    p75 = Column(Float)
+    p90 = Column(Float)
+
+    histogram = Column(JSONB, nullable=False)
+
+    computed_at = Column(
+        DateTime,
+        server_default=func.now()
+    )
+
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "year",
+            "month",
+            "group_name",
+            "metric",
+            name="pk_group_cycle_stats"
+        ),
+    )
+
+
+class OperatorDailyRank(Base):
+    __tablename__ = "operator_daily_rank"
+
+    operator_key = Column(
+        Integer,
+        ForeignKey("operators.operator_key"),
+        nullable=False
+    )
+
+    year = Column(Integer, nullable=False)
+    month = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False)
+
+    rank = Column(Integer, nullable=False)
+
+    # against the previous active day of the cycle; positive = moved up.
+    # Both are NULL on days the operator did not work.
+    rank_delta = Column(Integer)
+    # consecutive active days at this rank
+    rank_streak = Column(Integer)
+
+    created_at = Column(
+        DateTime,
+        server_default=func.now()
+    )
+
+    __table_args__ = (
+        PrimaryKeyConstraint(
+            "operator_key",
+            "date",
+            name="pk_operator_daily_rank"
+        ),
+    )
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+
+from app.services.avatars import thumbnail_path
+
+router = APIRouter(prefix="/api/avatars", tags=["Avatars"])
+
+# names are content hashes: a file never changes
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@router.get("/{name}", name="get_avatar")
+def get_avatar(name: str):
+    path = thumbnail_path(name)
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail="Avatar not found")
+
+    return FileResponse(
+        path,
+        media_type="image/webp",
+        headers={"Cache-Control": IMMUTABLE},
+    )
@@ -1,16 +1,181 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from app.database import SessionLocal
+from app.database import ReadSessionLocal
 from app.models import Operator, OperatorMonthlyMetric, BonusDistribution
+from app.services import trends
+from app.services.avatars import LARGE, SMALL, avatar_url
 import logging
 
 router = APIRouter(prefix="/api/groups", tags=["Groups"])
 logger = logging.getLogger(__name__)
 
 
+LEADERBOARD_SQL = text("""
+    SELECT
+        o.id AS operator_uuid,
+        m.operator_key,
+        o.full_name,
+        o.avatar_url,
+        o.avatar_hash,
+
+        m.rank,
+        m.stars,
+        m.rank_delta,
+        m.rank_streak,
+
+        m.call_count,
+        m.kpi,
+        m.avg_busy_per_call,
+
+        COALESCE((
+            SELECT SUM(m2.score)
+            FROM operator_monthly_metrics m2
+            WHERE m2.operator_key = m.operator_key
+              AND m2.year = m.year
+              AND m2.month < m.month
+        ), 0) AS score,
+
+        m.score AS score_delta,
+
+        COALESCE(b.kie, 0) AS kie,
+        COALESCE(b.active_participation, 0) AS active_participation,
+        COALESCE(b.monitoring, 0) AS monitoring,
+
+        l.call_count AS yesterday_call_count,
+        l.avg_busy_seconds AS yesterday_avg_busy_seconds,
+        l.kpi AS yesterday_kpi
+
+    FROM operator_monthly_metrics m
+    JOIN operators o ON o.operator_key = m.operator_key
+    LEFT JOIN bonus_distributions b
+      ON b.operator_key = m.operator_key
+     AND b.year = m.year
+     AND b.month = m.month
+    LEFT JOIN operator_latest_metrics l ON l.operator_key = m.operator_key
+
+    WHERE m.year = :year
+      AND m.month = :month
+      AND o.group_name = :group
+      AND m.rank IS NOT NULL
+
+    ORDER BY m.rank
+    LIMIT 10
+""")
+
+# Closed cycles may have been moved to operator_metrics_archive by the
+# retention job; their graphs are read from there.
+RANK_GRAPH_SQL = text("""
+    SELECT
+        d.date,
+        d.rank
+    FROM operator_daily_rank d
+    JOIN operator_metrics m
+      ON m.operator_key = d.operator_key
+     AND m.date = d.date
+    WHERE d.operator_key = :operator_key
+      AND d.year = :year
+      AND d.month = :month
+      AND m.full_duration <> '00:00:00'
+
+    UNION ALL
+
+    SELECT
+        (e->>'date')::DATE,
+        (e->>'rank')::INT
+    FROM operator_metrics_archive a
+    CROSS JOIN LATERAL jsonb_array_elements(a.days) e
+    WHERE a.operator_key = :operator_key
+      AND a.year = :year
+      AND a.month = :month
+      AND e->>'full_duration' <> '00:00:00'
+      AND e->>'rank' IS NOT NULL
+
+    ORDER BY 1
+""")
+
+PROFILE_SQL = text("""
+    SELECT
+        o.id AS operator_uuid,
+        o.operator_key,
+        o.full_name,
+        o.avatar_url,
+        o.avatar_hash,
+        o.group_name,
+
+        m.rank,
+        m.score,
+        m.stars,
+
+        m.call_count,
+        m.kpi,
+        m.avg_busy_per_call,
+
+        m.call_count_pct,
+        m.avg_busy_pct,
+        m.kpi_pct,
+
+        COALESCE(b.kie, 0) AS kie,
+        COALESCE(b.active_participation, 0) AS active_participation,
+        COALESCE(b.monitoring, 0) AS monitoring,
+
+        l.call_count AS yesterday_call_count,
+        l.avg_busy_seconds AS yesterday_avg_busy_seconds,
+        l.kpi AS yesterday_kpi
+    FROM operators o
+    JOIN operator_monthly_metrics m
+      ON m.operator_key = o.operator_key
+    LEFT JOIN bonus_distributions b
+      ON b.operator_key = o.operator_key
+     AND b.year = m.year
+     AND b.month = m.month
+    LEFT JOIN operator_latest_metrics l
+      ON l.operator_key = o.operator_key
+    WHERE o.id = :operator_uuid
+      AND m.year = :year
+      AND m.month = :month
+""")
+
+# Written by finalize_monthly_scores (refresh_group_cycle_stats).
+GROUP_STATS_SQL = text("""
+    SELECT
+        metric,
+        operators,
+        min_value,
+        max_value,
+        mean_value,
+        p10, p25, p50, p75, p90,
+        histogram,
+        computed_at
+    FROM group_cycle_stats
+    WHERE year = :year
+      AND month = :month
+      AND group_name = :group
+    ORDER BY metric
+""")
+
+TOP_OPERATORS_SQL = text("""
+    SELECT
+        o.group_name,
+        o.id AS operator_uuid,
+        o.full_name,
+        o.avatar_url,
+        o.avatar_hash,
+        m.rank,
+        m.score,
+        m.rank_delta,
+        m.rank_streak
+    FROM operator_monthly_metrics m
+    JOIN operators o ON o.operator_key = m.operator_key
+    WHERE m.year = :year
+      AND m.month = :month
+      AND m.rank <= 3
+    ORDER BY o.group_name, m.rank
+""")
+
+
 def get_db():
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
         yield db
     finally:
@@ -23,6 +188,89 @@ def seconds_to_hhmm(seconds: float | None) -> str:
     h, m = divmod(minutes, 60)
     return f"{h:02d}:{m:02d}"
 
+def yesterday_block(r) -> dict:
+    """The operator's latest closed day, from operator_latest_metrics."""
+    return {
+        "call_count": r["yesterday_call_count"] or 0,
+        "avg_busy_per_call": seconds_to_hhmm(r["yesterday_avg_busy_seconds"]),
+        "kpi": r["yesterday_kpi"],
+    }
+
+def percentile_block(r) -> dict:
+    """Percent of the group below the operator, 0-100 (None without data)."""
+    def pct(value: float | None) -> float | None:
+        return None if value is None else round(value * 100, 1)
+
+    return {
+        "call_count": pct(r["call_count_pct"]),
+        "avg_busy_per_call": pct(r["avg_busy_pct"]),
+        "kpi": pct(r["kpi_pct"]),
+    }
+
+def histogram_buckets(r) -> list[dict]:
+    """Equal-width buckets over [min, max] with their edges."""
+    counts = r["histogram"]
+    low, high = r["min_value"], r["max_value"]
+    width = (high - low) / len(counts) if counts else 0
+    return [
+        {
+            "from": low + i * width,
+            "to": high if i == len(counts) - 1 else low + (i + 1) * width,
+            "operators": count,
+        }
+        for i, count in enumerate(counts)
+    ]
+
+def trend_cycles(
+    from_year: int | None,
+    from_month: int | None,
+    to_year: int | None,
+    to_month: int | None,
+) -> list[tuple[int, int]]:
+    """Requested cycle range; the last DEFAULT_TREND_CYCLES by default."""
+    if (from_year is None) != (from_month is None):
+        raise HTTPException(status_code=400, detail="from_year and from_month go together")
+    if (to_year is None) != (to_month is None):
+        raise HTTPException(status_code=400, detail="to_year and to_month go together")
+
+    last = (to_year, to_month) if to_year is not None else trends.default_range()[1]
+    if from_year is not None:
+        first = (from_year, from_month)
+    else:
+        first = trends.cycle_at(trends.cycle_index(last) - trends.DEFAULT_TREND_CYCLES + 1)
+
+    cycles = trends.cycle_range(first, last)
+    if not cycles:
+        raise HTTPException(status_code=400, detail="Empty cycle range")
+    if len(cycles) > trends.MAX_TREND_CYCLES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {trends.MAX_TREND_CYCLES} cycles per request"
+        )
+    return cycles
+
+def trend_point(year: int, month: int, p: dict) -> dict:
+    return {
+        "year": year,
+        "month": month,
+        "rank": p["rank"],
+        "score": p["score"],
+        "stars": p["stars"],
+        "call_count": p["call_count"],
+        "avg_busy_per_call": seconds_to_hhmm(p["avg_busy_per_call"]),
+        "kpi": p["kpi"],
+    }
+
+def movement_block(r) -> dict:
+    """
+    Rank change since the previous active day and active days at this
+    rank; both None until the operator has worked a day of the cycle.
+    """
+    return {
+        "delta": r["rank_delta"],
+        "streak": r["rank_streak"],
+    }
+
 def medal_by_rank(rank: int) -> str:
     if rank == 1:
         return "gold"
@@ -35,75 +283,24 @@ def medal_by_rank(rank: int) -> str:
 
 @router.get("/{group}/operators")
 def get_group_operators(
+    request: Request,
     group: str,
     year: int = Query(...),
     month: int = Query(...),
     db: Session = Depends(get_db),
 ):
-    operators_query = text("""
-            SELECT
-    m.operator_uuid,
-    o.full_name,
-    o.avatar_url,
-
-    m.rank,
-    m.stars,
-
-    m.call_count,
-    m.kpi,
-    m.avg_busy_per_call,
-
-    COALESCE((
-        SELECT SUM(m2.score)
-        FROM operator_monthly_metrics m2
-        WHERE m2.operator_uuid = m.operator_uuid
-          AND m2.year = m.year
-          AND m2.month < m.month
-    ), 0) AS score,
-
-    m.score AS score_delta
-
-FROM operator_monthly_metrics m
-JOIN operators o ON o.id = m.operator_uuid
-
-WHERE m.year = :year
-  AND m.month = :month
-  AND o.group_name = :group
-  AND m.rank IS NOT NULL
-
-ORDER BY m.rank
-LIMIT 10;
-
-    """)
-
-
     rows = db.execute(
-        operators_query,
+        LEADERBOARD_SQL,
         {"year": year, "month": month, "group": group}
     ).mappings().all()
 
-    graph_query = text("""
-        SELECT
-            d.date,
-            d.rank
-        FROM operator_daily_rank d
-        JOIN operator_metrics m
-            ON m.operator_uuid = d.operator_uuid
-            AND m.date = d.date
-        WHERE d.operator_uuid = :operator_uuid
-            AND d.year = :year
-            AND d.month = :month
-            AND m.full_duration <> '00:00:00'
-        ORDER BY d.date
-    """)
-
     operators = []
 
     for r in rows:
         graph_rows = db.execute(
-            graph_query,
+            RANK_GRAPH_SQL,
             {
-                "operator_uuid": r["operator_uuid"],
+                "operator_key": r["operator_key"],
                 "year": year,
                 "month": month,
             }
@@ -112,10 +309,11 @@ LIMIT 10;
         operators.append({
             "operator_uuid": r["operator_uuid"],
             "full_name": r["full_name"],
-            "avatar_url": r["avatar_url"],
+            "avatar_url": avatar_url(request, r["avatar_hash"], r["avatar_url"], SMALL),
 
             "rank": r["rank"],
             "stars": r["stars"],
+            "movement": movement_block(r),
 
             "call_count": r["call_count"],
             "kpi": r["kpi"],
@@ -125,6 +323,12 @@ LIMIT 10;
             "score": r["score"],
             "score_delta": r["score_delta"],
 
+            "kie": r["kie"],
+            "active_participation": r["active_participation"],
+            "monitoring": r["monitoring"],
+
+            "yesterday": yesterday_block(r),
+
             "graph": [
                 {
                     "day": g["date"].isoformat(),
@@ -145,45 +349,107 @@ LIMIT 10;
 
 
 
+@router.get("/{group}/stats")
+def get_group_stats(
+    group: str,
+    year: int = Query(...),
+    month: int = Query(...),
+    db: Session = Depends(get_db),
+):
+    rows = db.execute(
+        GROUP_STATS_SQL,
+        {"year": year, "month": month, "group": group}
+    ).mappings().all()
+
+    return {
+        "year": year,
+        "month": month,
+        "group": group,
+        "metrics": {
+            r["metric"]: {
+                "operators": r["operators"],
+                "min": r["min_value"],
+                "max": r["max_value"],
+                "mean": r["mean_value"],
+                "quantiles": {
+                    "p10": r["p10"],
+                    "p25": r["p25"],
+                    "p50": r["p50"],
+                    "p75": r["p75"],
+                    "p90": r["p90"],
+                },
+                "histogram": histogram_buckets(r),
+                "computed_at": r["computed_at"].isoformat(),
+            }
+            for r in rows
+        }
+    }
+
+
+@router.get("/{group}/trend")
+def get_group_trend(
+    group: str,
+    from_year: int | None = Query(None),
+    from_month: int | None = Query(None, ge=1, le=12),
+    to_year: int | None = Query(None),
+    to_month: int | None = Query(None, ge=1, le=12),
+    db: Session = Depends(get_db),
+):
+    cycles = trend_cycles(from_year, from_month, to_year, to_month)
+    operators = [
+        {
+            "operator_uuid": o["operator_uuid"],
+            "full_name": o["full_name"],
+            "cycles": [
+                trend_point(year, month, p)
+                for (year, month), p in o["series"]
+            ],
+        }
+        for o in trends.group_trend(db, group, cycles)
+    ]
+
+    return {
+        "group": group,
+        "from": {"year": cycles[0][0], "month": cycles[0][1]},
+        "to": {"year": cycles[-1][0], "month": cycles[-1][1]},
+        "count": len(operators),
+        "operators": operators
+    }
+
+
+@router.get("/operators/{operator_uuid}/trend")
+def get_operator_trend(
+    operator_uuid: str,
+    from_year: int | None = Query(None),
+    from_month: int | None = Query(None, ge=1, le=12),
+    to_year: int | None = Query(None),
+    to_month: int | None = Query(None, ge=1, le=12),
+    db: Session = Depends(get_db),
+):
+    cycles = trend_cycles(from_year, from_month, to_year, to_month)
+    series = trends.operator_trend(db, operator_uuid, cycles)
+
+    return {
+        "operator_uuid": operator_uuid,
+        "from": {"year": cycles[0][0], "month": cycles[0][1]},
+        "to": {"year": cycles[-1][0], "month": cycles[-1][1]},
+        "cycles": [
+            trend_point(year, month, p)
+            for (year, month), p in series
+        ]
+    }
+
+
 @router.get("/operators/{operator_uuid}/profile")
 def get_operator_profile(
+    request: Request,
     operator_uuid: str,
     year: int = Query(...),
     month: int = Query(...),
     db: Session = Depends(get_db),
 ):
-    profile_q = text("""
-        SELECT
-            o.id AS operator_uuid,
-            o.full_name,
-            o.avatar_url,
-            o.group_name,
-
-            m.rank,
-            m.score,
-            m.stars,
-
-            m.call_count,
-            m.kpi,
-            m.avg_busy_per_call,
-
-            COALESCE(b.kie, 0) AS kie,
-            COALESCE(b.active_participation, 0) AS active_participation,
-            COALESCE(b.monitoring, 0) AS monitoring
-        FROM operators o
-        JOIN operator_monthly_metrics m
-          ON m.operator_uuid = o.id
-        LEFT JOIN bonus_distributions b
-          ON b.operator_uuid = o.id
-         AND b.year = m.year
-         AND b.month = m.month
-        WHERE o.id = :operator_uuid
-          AND m.year = :year
-          AND m.month = :month
-    """)
-
     profile = db.execute(
-        profile_q,
+        PROFILE_SQL,
         {
             "operator_uuid": operator_uuid,
             "year": year,
@@ -194,55 +460,22 @@ def get_operator_profile(
     if not profile:
         return {"detail": "Operator not found"}
 
-    graph_q = text("""
-        SELECT
-            d.date,
-            d.rank
-        FROM operator_daily_rank d
-        JOIN operator_metrics m
-          ON m.operator_uuid = d.operator_uuid
-         AND m.date = d.date
-        WHERE d.operator_uuid = :operator_uuid
-          AND d.year = :year
-          AND d.month = :month
-          AND m.full_duration <> '00:00:00'
-        ORDER BY d.date
-    """)
-
     graph_rows = db.execute(
-        graph_q,
+        RANK_GRAPH_SQL,
         {
-            "operator_uuid": operator_uuid,
+            "operator_key": profile["operator_key"],
             "year": year,
             "month": month
         }
     ).mappings().all()
 
-    yesterday_q = text("""
-        SELECT
-            call_count,
-            CASE
-                WHEN call_count > 0 THEN
-                    EXTRACT(EPOCH FROM busy_duration::interval) / call_count
-                ELSE 0
-            END AS avg_busy_seconds,
-            kpi
-        FROM operator_metrics
-        WHERE operator_uuid = :operator_uuid
-        ORDER BY date DESC
-        LIMIT 1
-    """)
-
-    yesterday = db.execute(
-        yesterday_q,
-        {"operator_uuid": operator_uuid}
-    ).mappings().first()
-
     return {
         "operator": {
             "operator_uuid": profile["operator_uuid"],
             "full_name": profile["full_name"],
-            "avatar_url": profile["avatar_url"],
+            "avatar_url": avatar_url(
+                request, profile["avatar_hash"], profile["avatar_url"], LARGE
+            ),
             "group": profile["group_name"],
         },
         "monthly": {
@@ -263,41 +496,21 @@ def get_operator_profile(
             }
             for g in graph_rows
         ],
-        "yesterday": {
-            "call_count": yesterday["call_count"] if yesterday else 0,
-            "avg_busy_per_call": seconds_to_hhmm(
-                yesterday["avg_busy_seconds"] if yesterday else 0
-            ),
-            "kpi": yesterday["kpi"] if yesterday else None,
-        }
+        "percentiles": percentile_block(profile),
+        "yesterday": yesterday_block(profile)
     }
 
 
 
 @router.get("/top-operators")
 def get_top_operators(
+    request: Request,
     year: int = Query(...),
     month: int = Query(...),
     db: Session = Depends(get_db),
 ):
-    query = text("""
-        SELECT
-            o.group_name,
-            m.operator_uuid,
-            o.full_name,
-            o.avatar_url,
-            m.rank,
-            m.score
-        FROM operator_monthly_metrics m
-        JOIN operators o ON o.id = m.operator_uuid
-        WHERE m.year = :year
-          AND m.month = :month
-          AND m.rank <= 3
-        ORDER BY o.group_name, m.rank
-    """)
-
     rows = db.execute(
-        query,
+        TOP_OPERATORS_SQL,
         {"year": year, "month": month}
     ).mappings().all()
 
@@ -317,10 +530,11 @@ def get_top_operators(
         groups_map[group]["top_operators"].append({
             "operator_uuid": r["operator_uuid"],
             "full_name": r["full_name"],
-            "avatar_url": r["avatar_url"],
+            "avatar_url": avatar_url(request, r["avatar_hash"], r["avatar_url"], SMALL),
             "rank": r["rank"],
             "medal": medal_by_rank(r["rank"]),
             "score": r["score"],
+            "movement": movement_block(r),
         })
 
     return {
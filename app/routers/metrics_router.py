@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.database import SessionLocal
+from app.services import etl_metrics
+from app.utils import request_metrics
+
+router = APIRouter(prefix="/metrics", tags=["Metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("", response_class=PlainTextResponse)
+def get_request_metrics():
+    """Per-route request, SQL time and statement-count histograms."""
+    return PlainTextResponse(
+        request_metrics.render_prometheus(),
+        media_type=PROMETHEUS_CONTENT_TYPE,
+    )
+
+
+@router.get("/etl", response_class=PlainTextResponse)
+def get_etl_metrics():
+    """Last run of every ETL job, in Prometheus text format."""
+    db = SessionLocal()
+    try:
+        runs = etl_metrics.last_runs(db)
+    finally:
+        db.close()
+
+    return PlainTextResponse(
+        etl_metrics.render_prometheus(runs),
+        media_type=PROMETHEUS_CONTENT_TYPE,
+    )
@@ -0,0 +1,93 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.routers.dashboard_router import get_db, medal_by_rank
+from app.services.avatars import SMALL, avatar_url
+from app.services.sources import resolve_monthly_cycle
+
+router = APIRouter(prefix="/api/operators", tags=["Operators"])
+
+# pg_trgm needs at least one trigram to use the index (and to match
+# anything sensible)
+MIN_KEY_LENGTH = 3
+
+SEARCH_KEY_SQL = text("SELECT operator_search_key(:q)")
+
+# Both conditions can use idx_operators_search_key_trgm; :key is the
+# query's operator_search_key, passed as a constant.
+SEARCH_SQL = text("""
+    SELECT
+        o.id AS operator_uuid,
+        o.full_name,
+        o.operator_id AS login,
+        o.agent_id,
+        o.group_name,
+        o.avatar_url,
+        o.avatar_hash,
+
+        m.rank,
+        m.score,
+
+        word_similarity(:key, o.search_key) AS similarity
+    FROM operators o
+    LEFT JOIN operator_monthly_metrics m
+      ON m.operator_key = o.operator_key
+     AND m.year = :year
+     AND m.month = :month
+    WHERE :key <% o.search_key
+       OR o.search_key LIKE '%' || :key || '%'
+    ORDER BY
+        similarity DESC,
+        m.rank NULLS LAST,
+        o.full_name
+    LIMIT :limit
+""")
+
+
+@router.get("/search")
+def search_operators(
+    request: Request,
+    q: str = Query(..., min_length=2, max_length=100),
+    year: int | None = Query(None),
+    month: int | None = Query(None),
+    limit: int = Query(20, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    if year is None or month is None:
+        year, month = resolve_monthly_cycle(date.today())
+
+    key = db.execute(SEARCH_KEY_SQL, {"q": q}).scalar_one()
+    if len(key) < MIN_KEY_LENGTH:
+        raise HTTPException(
+            status_code=422,
+            detail=f"q needs at least {MIN_KEY_LENGTH} letters or digits"
+        )
+
+    rows = db.execute(
+        SEARCH_SQL,
+        {"key": key, "year": year, "month": month, "limit": limit}
+    ).mappings().all()
+
+    return {
+        "query": q,
+        "year": year,
+        "month": month,
+        "count": len(rows),
+        "operators": [
+            {
+                "operator_uuid": r["operator_uuid"],
+                "full_name": r["full_name"],
+                "login": r["login"],
+                "agent_id": r["agent_id"],
+                "group": r["group_name"],
+                "avatar_url": avatar_url(request, r["avatar_hash"], r["avatar_url"], SMALL),
+                "rank": r["rank"],
+                "medal": medal_by_rank(r["rank"]),
+                "score": r["score"],
+            }
+            for r in rows
+        ]
+    }
@@ -1,28 +1,19 @@
-import requests
-from datetime import date
+import logging
+import sys
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
-from app.models import Operator
+from app.services.sources import fetch_day_data
 
+logger = logging.getLogger(__name__)
 
-def fetch_agent_map(day: date):
-    params = {
-        "columns": "1,2,3,4,5,8,9,10,11,14",
-        "year": day.year,
-        "month": f"{day.month:02d}",
-        "day": f"{day.day:02d}",
-    }
-
-    r = requests.get(
-        "http://csv.ccenter.uz:5000/csv-to-json/day_by",
-        params=params,
-        timeout=30
-    )
-    r.raise_for_status()
 
+def agent_map_from_rows(rows: list) -> dict:
     mapping = {}
-    for row in r.json().get("data", []):
+    for row in rows:
         login = str(row.get("login")).strip()
         agent_id = row.get("ID")
 
@@ -32,47 +23,139 @@ def fetch_agent_map(day: date):
     return mapping
 
 
-def update_agent_ids(day: date):
-    db: Session = SessionLocal()
-
-    agent_map = fetch_agent_map(day)
-
-    updated = 0
-    skipped = 0
-
-    for login, agent_id in agent_map.items():
-        operator = db.query(Operator).filter(
-            Operator.operator_id == login
-        ).first()
-
-        if not operator:
-            skipped += 1
-            continue
-
-        if operator.agent_id == agent_id:
-            continue
-
-        if operator.agent_id is not None:
-            skipped += 1
-            continue
+def fetch_agent_map(day: date) -> dict:
+    return agent_map_from_rows(fetch_day_data(day) or [])
+
+
+@dataclass
+class AgentIdReport:
+    updated: list[tuple[str, int]] = field(default_factory=list)
+    unchanged: int = 0
+    unknown_login: list[str] = field(default_factory=list)
+    already_assigned: list[tuple[str, int]] = field(default_factory=list)
+    conflicts: list[tuple[str, int]] = field(default_factory=list)
+
+    @property
+    def skipped(self) -> int:
+        return len(self.unknown_login) + len(self.already_assigned)
+
+    def summary(self) -> str:
+        return (
+            f"agent_id updated={len(self.updated)} unchanged={self.unchanged} "
+            f"unknown_login={len(self.unknown_login)} "
+            f"already_assigned={len(self.already_assigned)} "
+            f"conflicts={len(self.conflicts)}"
+        )
+
+
+RECONCILE_SQL = text("""
+    WITH incoming AS (
+        SELECT login, agent_id
+        FROM unnest(
+            CAST(:logins AS varchar[]),
+            CAST(:agent_ids AS int[])
+        ) AS v(login, agent_id)
+    ),
+
+    classified AS (
+        SELECT
+            i.login,
+            i.agent_id,
+            o.id AS operator_uuid,
+            CASE
+                WHEN o.id IS NULL THEN 'unknown_login'
+                WHEN o.agent_id = i.agent_id THEN 'unchanged'
+                WHEN o.agent_id IS NOT NULL THEN 'already_assigned'
+                WHEN COUNT(*) OVER (PARTITION BY i.agent_id) > 1 THEN 'conflict'
+                WHEN EXISTS (
+                    SELECT 1
+                    FROM operators x
+                    WHERE x.agent_id = i.agent_id
+                      AND x.id <> o.id
+                ) THEN 'conflict'
+                ELSE 'updated'
+            END AS status
+        FROM incoming i
+        LEFT JOIN operators o ON o.operator_id = i.login
+    ),
+
+    -- data-modifying CTEs always run, even when not referenced below
+    applied AS (
+        UPDATE operators o
+        SET agent_id = c.agent_id
+        FROM classified c
+        WHERE c.status = 'updated'
+          AND o.id = c.operator_uuid
+        RETURNING o.id
+    )
 
-        exists = db.query(Operator).filter(
-            Operator.agent_id == agent_id,
-            Operator.id != operator.id
-        ).first()
+    SELECT login, agent_id, status
+    FROM classified
+""")
+
+
+def reconcile_agent_ids(db: Session, agent_map: dict) -> AgentIdReport:
+    """
+    Assign agent_id to operators (matched by login) that don't have one yet,
+    in one statement inside the caller's transaction.
+
+    A login is skipped when it is unknown or its operator already has a
+    different agent_id; it is a conflict when the agent_id belongs to
+    another operator or comes with several logins.
+    """
+    report = AgentIdReport()
+    if not agent_map:
+        return report
+
+    logins = list(agent_map)
+    rows = db.execute(
+        RECONCILE_SQL,
+        {"logins": logins, "agent_ids": [agent_map[k] for k in logins]}
+    ).all()
+
+    for login, agent_id, status in rows:
+        if status == "updated":
+            report.updated.append((login, agent_id))
+        elif status == "unchanged":
+            report.unchanged += 1
+        elif status == "unknown_login":
+            report.unknown_login.append(login)
+        elif status == "already_assigned":
+            report.already_assigned.append((login, agent_id))
+        else:
+            report.conflicts.append((login, agent_id))
+
+    return report
+
+
+def update_agent_ids(day: date) -> AgentIdReport:
+    db: Session = SessionLocal()
 
-        if exists:
-            skipped += 1
-            continue
+    try:
+        report = reconcile_agent_ids(db, fetch_agent_map(day))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-        operator.agent_id = agent_id
-        updated += 1
+    logger.info(report.summary())
+    for login, agent_id in report.conflicts:
+        logger.warning(f"agent_id conflict | login={login}, agent_id={agent_id}")
 
-    db.commit()
-    db.close()
+    return report
 
-    print(f"✅ agent_id updated: {updated}")
-    print(f"⚠️ skipped: {skipped}")
 
 if __name__ == "__main__":
-    update_agent_ids(date(2026, 1, 18))
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s",
+    )
+
+    day = (
+        date.fromisoformat(sys.argv[1])
+        if len(sys.argv) > 1
+        else date.today() - timedelta(days=1)
+    )
+    update_agent_ids(day)
@@ -0,0 +1,243 @@
+"""
+Local avatar thumbnails.
+
+The roster sheet links avatars on arbitrary (slow) hosts. The sheet sync
+downloads each one once, stores square WebP thumbnails in AVATAR_DIR
+named by the SHA-256 of the original image (``<sha256>-<size>.webp``),
+and records the hash on the operator with the URL it came from; an image
+is fetched again only when its URL changes. ``/api/avatars/{name}``
+serves the files as immutable, and the dashboard links to them.
+
+    python -m app.services.etl_daily_metrics avatars
+"""
+import hashlib
+import io
+import logging
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import requests
+from fastapi import Request
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.services import etl_metrics
+
+# leaderboard rows and the profile header
+AVATAR_SIZES = (64, 192)
+SMALL, LARGE = AVATAR_SIZES
+
+THUMBNAIL_NAME = re.compile(r"^[0-9a-f]{64}-(\d+)\.webp$")
+
+DOWNLOAD_TIMEOUT = (5, 20)
+MAX_AVATAR_BYTES = 10 * 1024 * 1024
+DOWNLOAD_WORKERS = 8
+
+logger = logging.getLogger(__name__)
+
+
+class PermanentAvatarError(Exception):
+    """The URL will not give a usable image; don't retry until it changes."""
+
+
+@dataclass
+class AvatarSyncReport:
+    urls_updated: int = 0
+    pending: int = 0
+    stored: int = 0
+    failed: int = 0
+    retry: int = 0
+
+    def summary(self) -> str:
+        return (
+            f"Avatar sync | urls_updated={self.urls_updated} pending={self.pending} "
+            f"stored={self.stored} failed={self.failed} retry={self.retry}"
+        )
+
+
+def avatar_dir() -> Path:
+    return Path(get_settings().AVATAR_DIR)
+
+
+def thumbnail_name(digest: str, size: int) -> str:
+    return f"{digest}-{size}.webp"
+
+
+def thumbnail_path(name: str) -> Path | None:
+    """Path of a served thumbnail, or None for anything that isn't one."""
+    m = THUMBNAIL_NAME.match(name)
+    if not m or int(m.group(1)) not in AVATAR_SIZES:
+        return None
+    return avatar_dir() / name
+
+
+# ---------- download ----------
+def download(url: str) -> bytes:
+    try:
+        with requests.get(url, timeout=DOWNLOAD_TIMEOUT, stream=True) as r:
+            if 400 <= r.status_code < 500:
+                raise PermanentAvatarError(f"HTTP {r.status_code}")
+            r.raise_for_status()
+
+            data = bytearray()
+            for chunk in r.iter_content(64 * 1024):
+                data += chunk
+                if len(data) > MAX_AVATAR_BYTES:
+                    raise PermanentAvatarError(f"larger than {MAX_AVATAR_BYTES} bytes")
+            return bytes(data)
+    except requests.exceptions.InvalidURL as exc:
+        raise PermanentAvatarError(str(exc)) from exc
+
+
+def store_thumbnails(data: bytes, out_dir: Path) -> str:
+    """Write the thumbnails of an image (once per content) and return its hash."""
+    digest = hashlib.sha256(data).hexdigest()
+    missing = [
+        size for size in AVATAR_SIZES
+        if not (out_dir / thumbnail_name(digest, size)).exists()
+    ]
+    if not missing:
+        return digest
+
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGBA" if "A" in img.getbands() else "RGB")
+
+            out_dir.mkdir(parents=True, exist_ok=True)
+            for size in missing:
+                # avatars are shown as squares / circles
+                thumb = ImageOps.fit(img, (size, size), Image.Resampling.LANCZOS)
+                path = out_dir / thumbnail_name(digest, size)
+                # unique per writer: workers may store the same image at once
+                with tempfile.NamedTemporaryFile(
+                    dir=out_dir, suffix=".tmp", delete=False
+                ) as f:
+                    tmp = Path(f.name)
+                try:
+                    thumb.save(tmp, "WEBP", quality=82, method=6)
+                    tmp.replace(path)
+                except BaseException:
+                    tmp.unlink(missing_ok=True)
+                    raise
+    except (UnidentifiedImageError, Image.DecompressionBombError) as exc:
+        raise PermanentAvatarError(f"not a usable image: {exc}") from exc
+
+    return digest
+
+
+def fetch_avatar(url: str, out_dir: Path) -> str:
+    return store_thumbnails(download(url), out_dir)
+
+
+# ---------- sync ----------
+def update_avatar_urls(db: Session, sheet_map: dict) -> int:
+    """Copy changed avatar links from the sheet onto existing operators."""
+    logins = list(sheet_map)
+    if not logins:
+        return 0
+
+    result = db.execute(
+        text("""
+            UPDATE operators o
+            SET avatar_url = v.avatar_url
+            FROM unnest(
+                CAST(:logins AS varchar[]),
+                CAST(:avatar_urls AS varchar[])
+            ) AS v(login, avatar_url)
+            WHERE o.operator_id = v.login
+              AND o.avatar_url IS DISTINCT FROM v.avatar_url
+        """),
+        {
+            "logins": logins,
+            "avatar_urls": [sheet_map[login]["avatar_url"] for login in logins],
+        }
+    )
+    return result.rowcount
+
+
+def sync_avatars(sheet_map: dict | None = None) -> AvatarSyncReport:
+    """
+    Make thumbnails for every operator whose avatar_url differs from the
+    URL its thumbnails were made from. Network errors and 5xx are retried
+    on the next sync; 4xx and undecodable images are not, until the URL
+    changes.
+    """
+    report = AvatarSyncReport()
+    out_dir = avatar_dir()
+
+    db: Session = SessionLocal()
+    try:
+        if sheet_map:
+            report.urls_updated = update_avatar_urls(db, sheet_map)
+
+        pending = db.execute(text("""
+            SELECT operator_key, avatar_url
+            FROM operators
+            WHERE avatar_url IS DISTINCT FROM avatar_source_url
+        """)).all()
+        report.pending = len(pending)
+        # no transaction (or row lock) stays open during the downloads
+        db.commit()
+
+        def fetch(url: str | None) -> tuple[str | None, Exception | None]:
+            if not url:
+                return None, None
+            try:
+                return fetch_avatar(url, out_dir), None
+            except Exception as exc:
+                return None, exc
+
+        with etl_metrics.timer("avatars"), ThreadPoolExecutor(DOWNLOAD_WORKERS) as pool:
+            outcomes = list(pool.map(fetch, [url for _, url in pending]))
+
+        for (operator_key, url), (digest, error) in zip(pending, outcomes):
+            if error is not None and not isinstance(error, PermanentAvatarError):
+                logger.warning(f"Avatar fetch failed, will retry | {url} | {error}")
+                report.retry += 1
+                continue
+
+            if error is not None:
+                logger.warning(f"Avatar unusable | {url} | {error}")
+                report.failed += 1
+            elif digest:
+                report.stored += 1
+
+            # only if the URL is still the one that was fetched
+            db.execute(
+                text("""
+                    UPDATE operators
+                    SET avatar_hash = :digest,
+                        avatar_source_url = :url
+                    WHERE operator_key = :operator_key
+                      AND avatar_url IS NOT DISTINCT FROM :url
+                """),
+                {"digest": digest, "url": url, "operator_key": operator_key}
+            )
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    etl_metrics.record("avatars_stored", report.stored)
+    etl_metrics.record("avatars_failed", report.failed)
+    etl_metrics.record("avatars_retry", report.retry)
+    logger.info(report.summary())
+    return report
+
+
+# ---------- API ----------
+def avatar_url(request: Request, digest: str | None, original: str | None, size: int) -> str | None:
+    """Local thumbnail URL when there is one, else the sheet's link."""
+    if not digest:
+        return original
+    return str(request.url_for("get_avatar", name=thumbnail_name(digest, size)))
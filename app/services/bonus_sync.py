@@ -0,0 +1,160 @@
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.services import etl_metrics
+from app.services.sources import load_bonus_grid, parse_bonus_sheet
+from app.utils import data_version
+
+logger = logging.getLogger(__name__)
+
+# rejected / unknown entries logged individually, the rest only counted
+LOG_LIMIT = 20
+
+
+@dataclass
+class BonusSyncReport:
+    sheet_rows: int = 0
+    rejected: int = 0
+    resolved: int = 0
+    rows_written: int = 0
+    unknown_logins: list[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (
+            f"Bonus sync | sheet_rows={self.sheet_rows} rejected={self.rejected} "
+            f"resolved={self.resolved} rows_written={self.rows_written} "
+            f"unknown_logins={len(self.unknown_logins)}"
+        )
+
+
+BONUS_UPSERT_SQL = text("""
+    WITH incoming AS (
+        SELECT *
+        FROM unnest(
+            CAST(:logins AS varchar[]),
+            CAST(:years AS int[]),
+            CAST(:months AS int[]),
+            CAST(:kies AS int[]),
+            CAST(:active_participations AS int[]),
+            CAST(:monitorings AS int[])
+        ) AS v(login, year, month, kie, active_participation, monitoring)
+    ),
+
+    resolved AS (
+        SELECT o.operator_key, i.*
+        FROM incoming i
+        JOIN operators o ON o.operator_id = i.login
+    ),
+
+    written AS (
+        INSERT INTO bonus_distributions (
+            operator_key, year, month, kie, active_participation, monitoring
+        )
+        SELECT
+            operator_key, year, month, kie, active_participation, monitoring
+        FROM resolved
+        ON CONFLICT (operator_key, year, month)
+        DO UPDATE SET
+            kie = EXCLUDED.kie,
+            active_participation = EXCLUDED.active_participation,
+            monitoring = EXCLUDED.monitoring
+        WHERE (
+                bonus_distributions.kie,
+                bonus_distributions.active_participation,
+                bonus_distributions.monitoring
+              ) IS DISTINCT FROM (
+                EXCLUDED.kie,
+                EXCLUDED.active_participation,
+                EXCLUDED.monitoring
+              )
+        RETURNING 1
+    )
+
+    SELECT
+        (SELECT COUNT(*) FROM resolved) AS resolved,
+        (SELECT COUNT(*) FROM written) AS rows_written,
+        ARRAY(
+            SELECT DISTINCT i.login
+            FROM incoming i
+            WHERE NOT EXISTS (
+                SELECT 1 FROM operators o WHERE o.operator_id = i.login
+            )
+            ORDER BY i.login
+        ) AS unknown_logins
+""")
+
+
+def apply_bonus_map(db: Session, bonus_map: dict) -> BonusSyncReport:
+    """
+    Upsert every (login, year, month) of the bonus map in one statement
+    inside the caller's transaction, on the (operator_key, year, month)
+    primary key. Unchanged rows are not rewritten; logins without an
+    operator are reported, not created.
+    """
+    report = BonusSyncReport(sheet_rows=len(bonus_map))
+    if not bonus_map:
+        return report
+
+    keys = list(bonus_map)
+    row = db.execute(
+        BONUS_UPSERT_SQL,
+        {
+            "logins": [login for login, _, _ in keys],
+            "years": [year for _, year, _ in keys],
+            "months": [month for _, _, month in keys],
+            "kies": [bonus_map[k][0] for k in keys],
+            "active_participations": [bonus_map[k][1] for k in keys],
+            "monitorings": [bonus_map[k][2] for k in keys],
+        }
+    ).one()
+
+    report.resolved = row.resolved
+    report.rows_written = row.rows_written
+    report.unknown_logins = list(row.unknown_logins)
+    return report
+
+
+def sync_bonus(csv_path: Path | None = None) -> BonusSyncReport | None:
+    """Load the bonus grid (CSV or sheet), validate it and upsert it."""
+    try:
+        with etl_metrics.timer("bonus_load"):
+            bonus_map, rejected = parse_bonus_sheet(load_bonus_grid(csv_path))
+    except Exception:
+        logger.exception("Bonus source failed, nothing to sync")
+        return None
+
+    for message in rejected[:LOG_LIMIT]:
+        logger.warning(f"Bonus row rejected | {message}")
+
+    db: Session = SessionLocal()
+    try:
+        with etl_metrics.timer("bonus_upsert"):
+            report = apply_bonus_map(db, bonus_map)
+        version = data_version.bump(db) if report.rows_written else None
+        db.commit()
+        data_version.announce(version)
+    except Exception:
+        db.rollback()
+        logger.exception("Bonus sync failed")
+        raise
+    finally:
+        db.close()
+
+    report.rejected = len(rejected)
+    if report.unknown_logins:
+        logger.warning(
+            f"Bonus rows for unknown logins skipped | "
+            f"{report.unknown_logins[:LOG_LIMIT]}"
+        )
+
+    etl_metrics.record("bonus_rows", report.sheet_rows)
+    etl_metrics.record("bonus_rejected", report.rejected)
+    etl_metrics.record("bonus_written", report.rows_written)
+    etl_metrics.record("bonus_unknown", len(report.unknown_logins))
+    logger.info(report.summary())
+    return report
@@ -0,0 +1,59 @@
+import argparse
+import logging
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.utils import data_version
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_cycle_ranks(db: Session, year: int, month: int) -> int:
+    """
+    Recompute as-of-date ranks for every day of the (year, month) cycle
+    inside the caller's transaction. Returns the number of rows written.
+    """
+    return db.execute(
+        text("SELECT rebuild_daily_rank(:year, :month)"),
+        {"year": year, "month": month}
+    ).scalar_one()
+
+
+def rebuild_daily_rank(year: int, month: int) -> int:
+    db: Session = SessionLocal()
+
+    try:
+        rows = rebuild_cycle_ranks(db, year, month)
+        version = data_version.bump(db)
+        db.commit()
+        data_version.announce(version)
+        logger.info(
+            f"Daily ranks rebuilt | year={year} month={month} rows={rows}"
+        )
+        return rows
+
+    except Exception:
+        db.rollback()
+        logger.exception(f"Daily rank rebuild failed | year={year} month={month}")
+        raise
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(
+        description="Rebuild operator_daily_rank for whole cycles"
+    )
+    parser.add_argument("year", type=int)
+    parser.add_argument("months", type=int, nargs="+")
+    args = parser.parse_args()
+
+    for m in args.months:
+        rebuild_daily_rank(args.year, m)
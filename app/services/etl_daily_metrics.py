@@ -1,258 +1,167 @@
 from datetime import date, datetime, timedelta
+from pathlib import Path
+import argparse
+import json
 import time
-import requests
 import logging
-import re
-import gspread
-from sqlalchemy.orm import Session
 
+from app.config import get_settings
 from app.database import SessionLocal
-from app.models import Operator, OperatorMetric
-
-API_URL = "http://csv.ccenter.uz:5000/csv-to-json/day_by"
-COLUMNS = "1,2,3,4,5,8,9,10,11,14"
-
-KPI_SHEET_URL = "https://docs.google.com/spreadsheets/d/1yKRsDh0S1lmcfFthlxhUtScGA-FK2XSe_8snO5-i50A"
-GOOGLE_CREDS = "genial-smoke-461106-e4-90a8532e00b8.json"
-OPERATORS_SHEET_URL = "https://docs.google.com/spreadsheets/d/1lOyz1d6iL6Ok0uzElqrn_KM8Im-MgrEslRHu2Hi8ZKE/edit?gid=0#gid=0"
-ALLOWED_GROUPS = {"1009", "1000", "1242", "1170", "1093", "ДОП"}
+from app.services import etl_ledger, etl_metrics
+from app.services.avatars import sync_avatars
+from app.services.bonus_sync import sync_bonus
+from app.services.kpi_sync import sync_kpi
+from app.services.pipeline import (
+    Fetcher,
+    RunContext,
+    cycles_for_days,
+    daterange,
+    finalize_cycles,
+    log_run_totals,
+    payload_fetcher,
+    process_day,
+)
+from app.services.sources import (
+    fetch_day_data,
+    load_kpi_map,
+    load_operator_sheet,
+    resolve_cycle_for_date,
+)
+from app.utils.profiler import SamplingProfiler
 
 MAX_RETRY_HOUR = 23
 RETRY_INTERVAL = 3600  # 1 soat
+INTRADAY_INTERVAL = 5  # minutes
 
-LOG_FILE = "/home/user/Projects/top_operator/logs/etl_daily.log"
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
-def load_operator_sheet() -> dict:
-    logger.info("Loading operators sheet...")
-
-    gc = gspread.service_account(GOOGLE_CREDS)
-    sh = gc.open_by_url(OPERATORS_SHEET_URL)
-    ws = sh.worksheet("Operators")
-
-    values = ws.get_all_values()
-    rows = values[1:]
-
-    sheet_map = {}
-
-    for r in rows:
-        if len(r) < 3:
-            continue
-
-        login = r[1].strip() 
-        group_name = r[2].strip()
-
-        if group_name not in ALLOWED_GROUPS:
-            continue
-
-        if not login.isdigit():
-            continue
-
-        full_name = r[0].replace("👤", "").strip()
-        avatar_url = r[5].strip() if len(r) > 5 and r[5] else None
 
-        sheet_map[login] = {
-            "full_name": full_name,
-            "group_name": group_name,
-            "avatar_url": avatar_url,
-        }
+def configure_logging(log_file: str | None = None) -> None:
+    """Log to stderr, and to ``log_file`` (ETL_LOG_FILE) when given."""
+    handlers: list[logging.Handler] = [logging.StreamHandler()]
+    if log_file:
+        Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(logging.FileHandler(log_file))
 
-    logger.info(
-        f"Operators loaded from sheet: {len(sheet_map)} | groups={ALLOWED_GROUPS}"
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s",
+        handlers=handlers,
     )
-    return sheet_map
-
-
-def load_kpi_map() -> dict:
-    logger.info("Loading KPI sheet...")
-    gc = gspread.service_account(GOOGLE_CREDS)
-    sheet = gc.open_by_url(KPI_SHEET_URL).sheet1
-    rows = sheet.get_all_values()
-
-    kpi_map = {}
-
-    for row in rows[1:]:
-        if len(row) < 3:
-            continue
-
-        fio, kpi, cycle = row[0], row[1], row[2]
-
-        m = re.search(r"\((\d+)\)", fio)
-        if not m:
-            continue
-
-        try:
-            agent_id = int(m.group(1))
-            cycle = int(cycle)
-            kpi_value = float(kpi.replace(",", "."))
-        except Exception:
-            continue
-
-        kpi_map[(agent_id, cycle)] = kpi_value
-
-    logger.info(f"KPI loaded: {len(kpi_map)} rows")
-    return kpi_map
-
-
-def resolve_cycle_for_date(d: date) -> int:
-    if d.day >= 20:
-        return d.month
-    return 12 if d.month == 1 else d.month - 1
-
-
-def fetch_day_data(day: date):
-    params = {
-        "columns": COLUMNS,
-        "year": day.year,
-        "month": f"{day.month:02d}",
-        "day": f"{day.day:02d}",
-    }
-
-    r = requests.get(API_URL, params=params, timeout=30)
-    r.raise_for_status()
-
-    payload = r.json()
-
-    if "error" in payload:
-        logger.warning(f"API error for {day}: {payload['error']}")
-        return None
-
-    return payload.get("data", [])
 
-def get_or_create_operator(
-    db: Session,
-    agent_id: int,
-    login: str,
-    sheet_map: dict
-) -> Operator | None:
 
-    operator = db.query(Operator).filter(
-        Operator.agent_id == agent_id
-    ).first()
-
-    if operator:
-        return operator
+def load_sheets() -> tuple[dict, dict] | None:
+    """(kpi_map, sheet_map), or None when the operators sheet is unavailable."""
+    try:
+        kpi_map = load_kpi_map()
+    except Exception:
+        logger.exception("KPI sheet failed, continue without KPI")
+        etl_metrics.record("sheet_errors")
+        kpi_map = {}
 
-    sheet_row = sheet_map.get(login)
-    if not sheet_row:
-        # logger.warning(
-        #     f"Operator not found in sheet | login={login}, agent_id={agent_id}"
-        # )
+    try:
+        sheet_map = load_operator_sheet()
+    except Exception:
+        logger.exception("Operators sheet failed, ETL cannot continue")
+        etl_metrics.record("sheet_errors")
         return None
 
-    operator = Operator(
-        agent_id=agent_id,
-        operator_id=login,
-        full_name=sheet_row["full_name"],
-        group_name=sheet_row["group_name"],
-        avatar_url=sheet_row["avatar_url"],
-    )
+    return kpi_map, sheet_map
 
-    db.add(operator)
-    db.flush()
 
-    logger.info(
-        f"New operator inserted | login={login}, agent_id={agent_id}"
-    )
-    return operator
+def refresh_avatars(sheet_map: dict | None = None) -> None:
+    """Thumbnails for new or changed avatar links; never fails the job."""
+    try:
+        sync_avatars(sheet_map)
+    except Exception:
+        logger.exception("Avatar sync failed")
+        etl_metrics.record("avatar_errors")
 
 
 def try_fetch_and_save(
     day: date,
     kpi_map: dict,
     cycle: int,
-    sheet_map: dict
+    sheet_map: dict,
+    fetch: Fetcher = fetch_day_data
 ) -> bool:
-    db: Session = SessionLocal()
-    inserted = 0
+    ctx = RunContext(kpi_map=kpi_map, sheet_map=sheet_map, fetch=fetch)
+    return process_day(day, ctx, cycle).ok
 
-    try:
-        api_rows = fetch_day_data(day)
-
-        if api_rows is None or len(api_rows) == 0:
-            logger.warning(f"No API data yet for {day}")
-            return False
-
-        for row in api_rows:
-            agent_id = row.get("ID")
-
-            if not agent_id or not str(agent_id).isdigit():
-                continue
-
-            agent_id = int(agent_id)
-            operator = get_or_create_operator(
-                db=db,
-                agent_id=agent_id,
-                login=row.get("login"),
-                sheet_map=sheet_map
-            )
-
-            if not operator:
-                continue
-
-
-            kpi = kpi_map.get((agent_id, cycle))
-
-            db.query(OperatorMetric).filter(
-                OperatorMetric.operator_uuid == operator.id,
-                OperatorMetric.date == day
-            ).delete(synchronize_session=False)
-
-            db.add(
-                OperatorMetric(
-                    operator_uuid=operator.id,
-                    date=day,
-                    busy_duration=row.get("BusyDuration"),
-                    call_count=float(row.get("CallCount", 0)),
-                    distributed_call_count=float(row.get("DistributedCallCount", 0)),
-                    full_duration=row.get("FullDuration"),
-                    hold_duration=row.get("HoldDuration"),
-                    idle_duration=row.get("IdleDuration"),
-                    lock_duration=row.get("LockDuration"),
-                    kpi=kpi,
-                )
-            )
-            inserted += 1
 
-        db.commit()
-        logger.info(
-            f"Saved metrics for {day} | inserted={inserted} | cycle={cycle}"
+def report_archived(stats: etl_metrics.RunStats, results: list) -> None:
+    """List the days refused because their cycle is archived."""
+    archived = [r for r in results if r.status == "archived"]
+    if not archived:
+        return
+
+    stats.status = "partial"
+    cycles = sorted(cycles_for_days(r.day for r in archived))
+    logger.warning(
+        f"{len(archived)} days not loaded, their cycles are archived: "
+        f"{', '.join(str(r.day) for r in archived)} | restore first: "
+        + "; ".join(
+            f"python -m app.services.retention --restore {year} {month}"
+            for year, month in cycles
         )
-        return True
+    )
 
-    except Exception:
-        db.rollback()
-        logger.exception(f"ETL error on {day}")
-        return False
 
+def finalize_range(
+    stats: etl_metrics.RunStats,
+    results: list,
+    start_date: date,
+    end_date: date
+) -> None:
+    """
+    Re-rank the cycles this run wrote to, plus those an interrupted run
+    left pending in the same window, and mark their days finalized.
+    """
+    days = {r.day for r in results if r.ok and r.written}
+
+    db = SessionLocal()
+    try:
+        days |= etl_ledger.unfinalized_days(db, start_date, end_date)
+    finally:
+        db.close()
+
+    with stats.stage("finalize_cycles"):
+        finalize_cycles(cycles_for_days(days))
+
+    db = SessionLocal()
+    try:
+        etl_ledger.mark_finalized(db, days)
+        db.commit()
     finally:
         db.close()
 
 
-def run_daily_job():
+def run_daily_job(payload_dir: Path | None = None, force: bool = False):
+    with etl_metrics.run("daily") as stats:
+        _run_daily_job(stats, payload_dir, force)
+
+
+def _run_daily_job(
+    stats: etl_metrics.RunStats,
+    payload_dir: Path | None,
+    force: bool
+):
     target_day = date.today() - timedelta(days=1)
 
     logger.info(f"Daily ETL started | target_day={target_day}")
 
-    try:
-        kpi_map = load_kpi_map()
-    except Exception:
-        logger.exception("KPI sheet failed, continue without KPI")
-        kpi_map = {} 
-
-    try:
-        sheet_map = load_operator_sheet()
-    except Exception:
-        logger.exception("Operators sheet failed, ETL cannot continue")
+    sheets = load_sheets()
+    if sheets is None:
+        stats.status = "failed"
         return
+
+    kpi_map, sheet_map = sheets
+    ctx = RunContext(
+        kpi_map=kpi_map,
+        sheet_map=sheet_map,
+        payload_dir=payload_dir,
+        skip_unchanged=not force,
+    )
     cycle = resolve_cycle_for_date(target_day)
 
     logger.info(f"Resolved KPI cycle={cycle} for date={target_day}")
@@ -262,45 +171,152 @@ def run_daily_job():
 
         if now.hour > MAX_RETRY_HOUR:
             logger.error(f"23:00 bo‘ldi, data kelmadi: {target_day}")
+            stats.status = "no_data"
             break
 
-        if try_fetch_and_save(target_day, kpi_map, cycle, sheet_map):
+        result = process_day(target_day, ctx, cycle)
+        stats.add_day(result)
+
+        if result.ok:
             logger.info("ETL finished successfully")
             break
 
+        if result.status in ("locked", "archived"):
+            # an overlapping invocation is loading the day, or retrying
+            # cannot help
+            break
+
         logger.info("Retry after 1 hour...")
+        stats.add("retries")
         time.sleep(RETRY_INTERVAL)
 
+    refresh_avatars(sheet_map)
+
+
+def run_intraday_job(interval: float = INTRADAY_INTERVAL, once: bool = False):
+    """
+    Poll today's data every ``interval`` minutes. A poll writes only the
+    rows whose counters changed and re-ranks only their groups
+    (provisional ranks); a poll that sees the same payload as the last
+    one writes nothing. When the date rolls over, the closed day is
+    loaded once more with the full finalize; with ``once`` (cron) that
+    is left to the daily job. Every poll is its own run in etl_job_runs.
+    """
+    day = date.today()
+    sheets = None
+
+    while True:
+        with etl_metrics.run("intraday") as stats:
+            today = date.today()
+            if sheets is None or today != day:
+                sheets = load_sheets()
+
+            if sheets is None:
+                stats.status = "failed"
+            else:
+                results = []
+                if today != day:
+                    results.append(close_intraday_day(day, sheets))
+                    day = today
+                results.append(poll_intraday(day, sheets))
+
+                for result in results:
+                    stats.add_day(result)
+                    if result.status in ("failed", "no_data"):
+                        stats.status = result.status
+
+        if once:
+            return
+        time.sleep(interval * 60)
+
+
+def poll_intraday(day: date, sheets: tuple[dict, dict]):
+    kpi_map, sheet_map = sheets
+    ctx = RunContext(
+        kpi_map=kpi_map,
+        sheet_map=sheet_map,
+        finalize=False,
+        provisional=True,
+    )
+    return process_day(day, ctx)
+
+
+def close_intraday_day(day: date, sheets: tuple[dict, dict]):
+    """Final load of a day the intraday polls left provisional."""
+    kpi_map, sheet_map = sheets
+    logger.info(f"Intraday day closed | finalizing {day}")
+    return process_day(day, RunContext(kpi_map=kpi_map, sheet_map=sheet_map))
+
+
+def run_range_job(
+    start_date: date,
+    end_date: date,
+    payload_dir: Path | None = None,
+    create_missing: bool = True,
+    resume: bool = False,
+    force: bool = False
+):
+    with etl_metrics.run("range") as stats:
+        _run_range_job(
+            stats, start_date, end_date, payload_dir, create_missing, resume, force
+        )
+
 
-def run_range_job(start_date: date, end_date: date):
+def _run_range_job(
+    stats: etl_metrics.RunStats,
+    start_date: date,
+    end_date: date,
+    payload_dir: Path | None,
+    create_missing: bool,
+    resume: bool,
+    force: bool
+):
     logger.info(
         f"ETL range started | from={start_date} to={end_date}"
     )
 
-    try:
-        kpi_map = load_kpi_map()
-    except Exception:
-        logger.exception("KPI sheet failed, continue without KPI")
-        kpi_map = {}
-
-    try:
-        sheet_map = load_operator_sheet()
-    except Exception:
-        logger.exception("Operators sheet failed, ETL cannot continue")
+    sheets = load_sheets()
+    if sheets is None:
+        stats.status = "failed"
         return
 
-    d = start_date
-    while d <= end_date:
-        cycle = resolve_cycle_for_date(d)
-        logger.info(f"Processing date={d} | cycle={cycle}")
+    kpi_map, sheet_map = sheets
+    ctx = RunContext(
+        kpi_map=kpi_map,
+        sheet_map=sheet_map,
+        payload_dir=payload_dir,
+        create_missing=create_missing,
+        finalize=False,
+        skip_unchanged=not force,
+    )
+
+    # --resume trusts the ledger and does not even fetch loaded days
+    loaded = set()
+    if resume and not force:
+        db = SessionLocal()
+        try:
+            loaded = etl_ledger.done_days(db, start_date, end_date)
+        finally:
+            db.close()
+        logger.info(f"Resuming | {len(loaded)} days already loaded")
+
+    results = []
 
-        success = False
-        retry_started_at = datetime.now()
+    for d in daterange(start_date, end_date):
+        if d in loaded:
+            stats.add("days_resumed")
+            continue
+
+        logger.info(f"Processing date={d}")
 
         while True:
-            if try_fetch_and_save(d, kpi_map, cycle, sheet_map):
+            result = process_day(d, ctx)
+            stats.add_day(result)
+            if result.ok:
                 logger.info(f"ETL success for {d}")
-                success = True
+                break
+
+            if result.status in ("locked", "archived"):
                 break
 
             if datetime.now().hour > MAX_RETRY_HOUR:
@@ -308,15 +324,215 @@ def run_range_job(start_date: date, end_date: date):
                 break
 
             logger.info(f"Retry {d} after 1 hour...")
+            stats.add("retries")
             time.sleep(RETRY_INTERVAL)
 
-        if not success:
+        if result.status == "locked":
+            logger.warning(f"ETL skipped date={d}, another run is loading it")
+        elif result.status == "archived":
+            stats.status = "partial"
+        elif not result.ok:
             logger.warning(f"ETL skipped date={d}")
+            stats.status = "partial"
 
-        d += timedelta(days=1)
+        results.append(result)
 
+    report_archived(stats, results)
+    finalize_range(stats, results, start_date, end_date)
+    refresh_avatars(sheet_map)
+    log_run_totals(results)
     logger.info("ETL range finished")
 
 
+def run_replay_job(payload_dir: Path, start_date: date, end_date: date):
+    """Re-run saved payloads through the pipeline without calling the API."""
+    with etl_metrics.run("replay") as stats:
+        _run_replay_job(stats, payload_dir, start_date, end_date)
+
+
+def _run_replay_job(
+    stats: etl_metrics.RunStats,
+    payload_dir: Path,
+    start_date: date,
+    end_date: date
+):
+    logger.info(
+        f"ETL replay started | dir={payload_dir} from={start_date} to={end_date}"
+    )
+
+    sheets = load_sheets()
+    if sheets is None:
+        stats.status = "failed"
+        return
+
+    kpi_map, sheet_map = sheets
+    ctx = RunContext(
+        kpi_map=kpi_map,
+        sheet_map=sheet_map,
+        fetch=payload_fetcher(payload_dir),
+        finalize=False,
+        # replaying is asking for the days to be processed again
+        skip_unchanged=False,
+    )
+
+    results = [process_day(d, ctx) for d in daterange(start_date, end_date)]
+    for result in results:
+        stats.add_day(result)
+
+    report_archived(stats, results)
+    finalize_range(stats, results, start_date, end_date)
+    log_run_totals(results)
+    logger.info("ETL replay finished")
+
+
+def print_last_runs(prometheus: bool = False):
+    db = SessionLocal()
+    try:
+        runs = etl_metrics.last_runs(db)
+    finally:
+        db.close()
+
+    if prometheus:
+        print(etl_metrics.render_prometheus(runs), end="")
+    else:
+        print(json.dumps(runs, indent=2, ensure_ascii=False))
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Operator metrics ETL")
+    parser.add_argument(
+        "--log-file",
+        help="also log to this file (default: ETL_LOG_FILE)",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="FILE",
+        help="sample the run and write a flamegraph (folded stacks) file",
+    )
+    sub = parser.add_subparsers(dest="mode")
+
+    daily = sub.add_parser("daily", help="load yesterday, retrying until data arrives")
+    daily.add_argument("--payload-dir", type=Path, help="save fetched payloads here")
+    daily.add_argument(
+        "--force",
+        action="store_true",
+        help="reload the day even if the ledger has it done and unchanged",
+    )
+
+    rng = sub.add_parser("range", help="load every day in [start, end]")
+    rng.add_argument("start", type=date.fromisoformat)
+    rng.add_argument("end", type=date.fromisoformat)
+    rng.add_argument("--payload-dir", type=Path, help="save fetched payloads here")
+    rng.add_argument(
+        "--no-create-operators",
+        action="store_true",
+        help="only load operators that already exist",
+    )
+    rng.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip days the ledger has as done without fetching them again",
+    )
+    rng.add_argument(
+        "--force",
+        action="store_true",
+        help="reload every day, ignoring the ledger",
+    )
+
+    replay = sub.add_parser("replay", help="re-run payloads saved by --payload-dir")
+    replay.add_argument("payload_dir", type=Path)
+    replay.add_argument("start", type=date.fromisoformat)
+    replay.add_argument("end", type=date.fromisoformat)
+
+    intraday = sub.add_parser(
+        "intraday",
+        help="poll today every few minutes and keep provisional ranks current",
+    )
+    intraday.add_argument(
+        "--interval",
+        type=float,
+        default=INTRADAY_INTERVAL,
+        help=f"minutes between polls (default: {INTRADAY_INTERVAL})",
+    )
+    intraday.add_argument(
+        "--once",
+        action="store_true",
+        help="poll once and exit (for cron; overlapping runs skip a locked day)",
+    )
+
+    kpi = sub.add_parser("kpi", help="apply late KPI values from the sheet only")
+    kpi.add_argument(
+        "--since",
+        type=date.fromisoformat,
+        help="earliest metrics date to update (default: previous KPI cycle)",
+    )
+
+    bonus = sub.add_parser("bonus", help="upsert KIE / participation / monitoring bonuses")
+    bonus.add_argument(
+        "--csv",
+        type=Path,
+        help="CSV export of the bonus grid (default: SHEETS_DIR or BONUS_SHEET_URL)",
+    )
+
+    sub.add_parser("avatars", help="fetch thumbnails for new or changed avatars")
+
+    stats = sub.add_parser("stats", help="print the last run of every job")
+    stats.add_argument(
+        "--prometheus",
+        action="store_true",
+        help="in Prometheus text format instead of JSON",
+    )
+
+    args = parser.parse_args(argv)
+
+    configure_logging(args.log_file or get_settings().ETL_LOG_FILE)
+
+    if args.profile:
+        with SamplingProfiler() as profiler:
+            dispatch(args)
+        profiler.write(args.profile)
+    else:
+        dispatch(args)
+
+
+def dispatch(args: argparse.Namespace):
+    if args.mode == "range":
+        run_range_job(
+            args.start,
+            args.end,
+            payload_dir=args.payload_dir,
+            create_missing=not args.no_create_operators,
+            resume=args.resume,
+            force=args.force,
+        )
+    elif args.mode == "replay":
+        run_replay_job(args.payload_dir, args.start, args.end)
+    elif args.mode == "intraday":
+        run_intraday_job(args.interval, args.once)
+    elif args.mode == "kpi":
+        with etl_metrics.run("kpi") as stats:
+            if sync_kpi(args.since) is None:
+                stats.status = "failed"
+    elif args.mode == "bonus":
+        with etl_metrics.run("bonus") as stats:
+            if sync_bonus(args.csv) is None:
+                stats.status = "failed"
+    elif args.mode == "avatars":
+        with etl_metrics.run("avatars") as stats:
+            sheets = load_sheets()
+            if sheets is None:
+                stats.status = "failed"
+            else:
+                sync_avatars(sheets[1])
+    elif args.mode == "stats":
+        print_last_runs(args.prometheus)
+    else:
+        run_daily_job(
+            payload_dir=getattr(args, "payload_dir", None),
+            force=getattr(args, "force", False),
+        )
+
+
 if __name__ == "__main__":
-    run_daily_job()
+    main()
@@ -0,0 +1,207 @@
+"""
+Per-day ETL ledger (``etl_runs``): status, row counts, payload hash,
+duration and error of the last attempt at every day.
+
+``process_day`` holds the day's advisory lock for the whole load, reads
+the ledger, and writes it in the same transaction as the day's metrics. Jobs use it to
+skip days that are done and unchanged, and to resume a backfill.
+"""
+import hashlib
+import json
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.orm import Session
+
+from app.services import etl_metrics
+
+# first key of pg_try_advisory_lock(int, int); the second is the day
+LOCK_NAMESPACE = 7_202_602
+
+
+def try_lock(conn: Connection, day: date) -> bool:
+    """
+    Lock ``day`` for the database session of ``conn``, across its
+    transactions, until ``unlock``. False when another run holds it.
+    """
+    locked = conn.execute(
+        text("SELECT pg_try_advisory_lock(:namespace, :day)"),
+        {"namespace": LOCK_NAMESPACE, "day": day.toordinal()}
+    ).scalar_one()
+    conn.commit()
+    return locked
+
+
+def unlock(conn: Connection, day: date) -> None:
+    conn.execute(
+        text("SELECT pg_advisory_unlock(:namespace, :day)"),
+        {"namespace": LOCK_NAMESPACE, "day": day.toordinal()}
+    )
+    conn.commit()
+
+
+def payload_hash(api_rows: list) -> str:
+    raw = json.dumps(api_rows, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def inputs_hash(kpi_map: dict, sheet_map: dict, cycle: int) -> str:
+    """
+    Hash of everything besides the payload that decides what a day
+    writes: the cycle's KPI values and the logins listed in the sheet.
+    """
+    kpis = sorted(
+        (agent_id, kpi)
+        for (agent_id, kpi_cycle), kpi in kpi_map.items()
+        if kpi_cycle == cycle
+    )
+    raw = json.dumps([kpis, sorted(sheet_map)], ensure_ascii=False)
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def previous(db: Session, day: date) -> Row | None:
+    return db.execute(
+        text("""
+            SELECT status, payload_hash, inputs_hash, finalized_at
+            FROM etl_runs
+            WHERE day = :day
+        """),
+        {"day": day}
+    ).first()
+
+
+def is_unchanged(prev: Row | None, status: str, payload: str, inputs: str) -> bool:
+    """Whether ``prev`` already has ``status`` for the same payload and inputs."""
+    return (
+        prev is not None
+        and prev.status == status
+        and prev.payload_hash == payload
+        and prev.inputs_hash == inputs
+    )
+
+
+def needs_finalize(prev: Row | None) -> bool:
+    """
+    Whether the day's rows are in but its cycle was never re-ranked with
+    them: intraday polls (provisional) or a load without finalize.
+    """
+    return prev is not None and (
+        prev.status == "provisional"
+        or (prev.status == "done" and prev.finalized_at is None)
+    )
+
+
+def record(
+    db: Session,
+    result,
+    started_at: datetime,
+    duration: float,
+    finalized: bool
+) -> None:
+    """
+    Upsert the outcome of a pipeline.DayResult into the caller's
+    transaction. ``finalized``: the day's cycle was re-ranked with it.
+    """
+    run = etl_metrics.current()
+
+    db.execute(
+        text("""
+            INSERT INTO etl_runs (
+                day, status, job, fetched, parsed, written, unchanged,
+                unresolved, payload_hash, inputs_hash, started_at,
+                finished_at, duration_seconds, finalized_at, error
+            )
+            VALUES (
+                :day, :status, :job, :fetched, :parsed, :written, :unchanged,
+                :unresolved, :payload_hash, :inputs_hash, :started_at,
+                now(), :duration, CASE WHEN :finalized THEN now() END, :error
+            )
+            ON CONFLICT (day) DO UPDATE SET
+                status = EXCLUDED.status,
+                job = EXCLUDED.job,
+                attempts = CASE
+                    WHEN etl_runs.status = 'done' THEN 1
+                    ELSE etl_runs.attempts + 1
+                END,
+                fetched = EXCLUDED.fetched,
+                parsed = EXCLUDED.parsed,
+                written = EXCLUDED.written,
+                unchanged = EXCLUDED.unchanged,
+                unresolved = EXCLUDED.unresolved,
+                payload_hash = EXCLUDED.payload_hash,
+                inputs_hash = EXCLUDED.inputs_hash,
+                started_at = EXCLUDED.started_at,
+                finished_at = EXCLUDED.finished_at,
+                duration_seconds = EXCLUDED.duration_seconds,
+                -- a write without re-ranking leaves the cycle pending
+                finalized_at = CASE
+                    WHEN :finalized THEN now()
+                    WHEN EXCLUDED.written > 0 THEN NULL
+                    ELSE etl_runs.finalized_at
+                END,
+                error = EXCLUDED.error
+            -- an empty upstream answer does not unload a loaded day
+            WHERE NOT (etl_runs.status = 'done' AND EXCLUDED.status = 'no_data')
+        """),
+        {
+            "day": result.day,
+            "status": result.status,
+            "job": run.job if run else None,
+            "fetched": result.fetched,
+            "parsed": result.parsed,
+            "written": result.written,
+            "unchanged": result.unchanged,
+            "unresolved": result.unresolved,
+            "payload_hash": result.payload_hash,
+            "inputs_hash": result.inputs_hash,
+            "started_at": started_at,
+            "duration": duration,
+            "finalized": finalized,
+            "error": result.error,
+        }
+    )
+
+
+def done_days(db: Session, start: date, end: date) -> set[date]:
+    return set(
+        db.execute(
+            text("""
+                SELECT day
+                FROM etl_runs
+                WHERE day BETWEEN :start AND :end
+                  AND status = 'done'
+            """),
+            {"start": start, "end": end}
+        ).scalars()
+    )
+
+
+def unfinalized_days(db: Session, start: date, end: date) -> set[date]:
+    """Loaded days whose cycle was never re-ranked, e.g. after a crash."""
+    return set(
+        db.execute(
+            text("""
+                SELECT day
+                FROM etl_runs
+                WHERE day BETWEEN :start AND :end
+                  AND status = 'done'
+                  AND finalized_at IS NULL
+            """),
+            {"start": start, "end": end}
+        ).scalars()
+    )
+
+
+def mark_finalized(db: Session, days: set[date]) -> None:
+    if not days:
+        return
+    db.execute(
+        text("""
+            UPDATE etl_runs
+            SET finalized_at = now()
+            WHERE day = ANY(:days)
+              AND status = 'done'
+        """),
+        {"days": sorted(days)}
+    )
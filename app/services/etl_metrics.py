@@ -0,0 +1,232 @@
+"""
+Per-run ETL statistics: stage timings and counters for one job run
+(daily, range, replay, kpi), logged as JSON, stored in etl_job_runs and
+exported in Prometheus text format by /metrics/etl.
+
+A job wraps its work in ``run()``; lower layers report into the active
+run with ``record()`` / ``timer()``, which do nothing outside of one.
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+
+METRIC_PREFIX = "top_operator_etl"
+
+# DayResult counters summed over the run
+DAY_COUNTERS = (
+    "fetched",
+    "parsed",
+    "skipped",
+    "agent_ids_updated",
+    "operators_created",
+    "unresolved",
+    "written",
+    "unchanged",
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RunStats:
+    job: str
+    started_at: datetime = field(default_factory=datetime.now)
+    finished_at: datetime | None = None
+    status: str = "running"
+    counters: dict[str, float] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+    days: list[dict] = field(default_factory=list)
+
+    def add(self, name: str, value: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - started)
+
+    def add_day(self, result) -> None:
+        """Fold a pipeline.DayResult into the run and log it as JSON."""
+        day = asdict(result)
+        day["day"] = result.day.isoformat()
+        self.days.append(day)
+
+        self.add("days")
+        self.add("days_ok", int(result.ok))
+        self.add(f"days_{result.status}")
+        for name in DAY_COUNTERS:
+            self.add(name, day[name])
+        for name, seconds in result.timings.items():
+            self.add_time(name, seconds)
+
+        logger.info(json.dumps({"event": "etl_day", "job": self.job, **day}))
+
+    def as_dict(self) -> dict:
+        return {
+            "job": self.job,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": (
+                self.finished_at.isoformat(timespec="seconds")
+                if self.finished_at else None
+            ),
+            "duration": (
+                (self.finished_at - self.started_at).total_seconds()
+                if self.finished_at else None
+            ),
+            "counters": self.counters,
+            "timings": {k: round(v, 6) for k, v in self.timings.items()},
+            "days": self.days,
+        }
+
+
+_current: RunStats | None = None
+
+
+def current() -> RunStats | None:
+    return _current
+
+
+def record(name: str, value: float = 1) -> None:
+    """Add to a counter of the active run, if any."""
+    if _current is not None:
+        _current.add(name, value)
+
+
+@contextmanager
+def timer(name: str):
+    """Time a block into the active run, if any."""
+    if _current is None:
+        yield
+        return
+    with _current.stage(name):
+        yield
+
+
+@contextmanager
+def run(job: str):
+    """
+    Collect the statistics of one job run. Jobs set ``status`` themselves
+    when they give up; an exception marks the run failed.
+    """
+    global _current
+
+    stats = RunStats(job=job)
+    previous, _current = _current, stats
+    try:
+        yield stats
+        if stats.status == "running":
+            stats.status = "ok"
+    except BaseException:
+        stats.status = "failed"
+        raise
+    finally:
+        _current = previous
+        stats.finished_at = datetime.now()
+
+        summary = stats.as_dict()
+        logger.info(json.dumps(
+            {"event": "etl_run", **{k: v for k, v in summary.items() if k != "days"}}
+        ))
+        save(stats)
+
+
+def save(stats: RunStats) -> None:
+    db: Session = SessionLocal()
+    try:
+        db.execute(
+            text("""
+                INSERT INTO etl_job_runs (job, status, started_at, finished_at, stats)
+                VALUES (:job, :status, :started_at, :finished_at, CAST(:stats AS jsonb))
+            """),
+            {
+                "job": stats.job,
+                "status": stats.status,
+                "started_at": stats.started_at,
+                "finished_at": stats.finished_at,
+                "stats": json.dumps(stats.as_dict()),
+            }
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        logger.warning(f"Could not store ETL run stats | job={stats.job}", exc_info=True)
+    finally:
+        db.close()
+
+
+def last_runs(db: Session) -> list[dict]:
+    """The latest stored run of every job."""
+    return list(
+        db.execute(text("""
+            SELECT DISTINCT ON (job) stats
+            FROM etl_job_runs
+            ORDER BY job, started_at DESC
+        """)).scalars()
+    )
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+
+def render_prometheus(runs: list[dict]) -> str:
+    """Prometheus text exposition of the last run of each job."""
+    families = {
+        "last_run_timestamp_seconds": ("gauge", "Start of the last run"),
+        "last_run_success": ("gauge", "1 if the last run finished ok"),
+        "last_run_duration_seconds": ("gauge", "Wall time of the last run"),
+        "last_run_stage_seconds": ("gauge", "Time per stage in the last run"),
+        "last_run_count": ("gauge", "Counters of the last run"),
+    }
+    samples: dict[str, list[str]] = {name: [] for name in families}
+
+    for r in runs:
+        job = r["job"]
+        started = datetime.fromisoformat(r["started_at"]).timestamp()
+
+        samples["last_run_timestamp_seconds"].append(
+            f"{{{_labels(job=job)}}} {started}"
+        )
+        samples["last_run_success"].append(
+            f"{{{_labels(job=job)}}} {int(r['status'] == 'ok')}"
+        )
+        if r.get("duration") is not None:
+            samples["last_run_duration_seconds"].append(
+                f"{{{_labels(job=job)}}} {r['duration']}"
+            )
+        for stage, seconds in sorted(r["timings"].items()):
+            samples["last_run_stage_seconds"].append(
+                f"{{{_labels(job=job, stage=stage)}}} {seconds}"
+            )
+        for name, value in sorted(r["counters"].items()):
+            samples["last_run_count"].append(
+                f"{{{_labels(job=job, name=name)}}} {value}"
+            )
+
+    lines = []
+    for name, (kind, help_text) in families.items():
+        metric = f"{METRIC_PREFIX}_{name}"
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        lines.extend(f"{metric}{sample}" for sample in samples[name])
+
+    return "\n".join(lines) + "\n"
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 
 from app.database import SessionLocal
 from app.models import Operator
+from app.services.avatars import sync_avatars
 
 SHEET_URL = "https://docs.google.com/spreadsheets/d/1lOyz1d6iL6Ok0uzElqrn_KM8Im-MgrEslRHu2Hi8ZKE"
 GOOGLE_CREDS = "genial-smoke-461106-e4-1ff74dbbfcd0.json"
@@ -116,6 +117,9 @@ def run_etl():
 
     print(f"✅ Operators synced | inserted={inserted}, updated={updated}")
 
+    # thumbnails for new or changed avatar links
+    print(f"✅ {sync_avatars().summary()}")
+
 
 if __name__ == "__main__":
     run_etl()
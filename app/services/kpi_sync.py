@@ -0,0 +1,204 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.services import etl_metrics
+from app.services.pipeline import finalize_cycles
+from app.services.sources import load_kpi_map
+from app.utils import data_version
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class KpiSyncReport:
+    since: date
+    sheet_rows: int = 0
+    rows_updated: int = 0
+    monthly_rows: int = 0
+    cycles: list[tuple[int, int]] = field(default_factory=list)
+
+    def summary(self) -> str:
+        return (
+            f"KPI sync | since={self.since} sheet_rows={self.sheet_rows} "
+            f"rows_updated={self.rows_updated} monthly_rows={self.monthly_rows} "
+            f"cycles={self.cycles}"
+        )
+
+
+def kpi_cycle_start(d: date) -> date:
+    """First day of the KPI cycle (see resolve_cycle_for_date) containing d."""
+    if d.day >= 20:
+        return date(d.year, d.month, 20)
+    if d.month == 1:
+        return date(d.year - 1, 12, 20)
+    return date(d.year, d.month - 1, 20)
+
+
+def default_since(today: date | None = None) -> date:
+    """
+    Start of the previous KPI cycle. The sheet only carries the cycle
+    month, so the window must stay shorter than a year.
+    """
+    current = kpi_cycle_start(today or date.today())
+    return kpi_cycle_start(current - timedelta(days=1))
+
+
+KPI_SYNC_SQL = text("""
+    WITH incoming AS (
+        SELECT agent_id, cycle, kpi
+        FROM unnest(
+            CAST(:agent_ids AS int[]),
+            CAST(:cycles AS int[]),
+            CAST(:kpis AS float8[])
+        ) AS v(agent_id, cycle, kpi)
+    ),
+
+    changed AS (
+        UPDATE operator_metrics m
+        SET kpi = i.kpi
+        FROM operators o
+        JOIN incoming i ON i.agent_id = o.agent_id
+        WHERE m.operator_key = o.operator_key
+          AND m.date >= :since
+          AND i.cycle = CASE
+                WHEN EXTRACT(DAY FROM m.date) >= 20 THEN EXTRACT(MONTH FROM m.date)
+                WHEN EXTRACT(MONTH FROM m.date) = 1 THEN 12
+                ELSE EXTRACT(MONTH FROM m.date) - 1
+            END
+          AND m.kpi IS DISTINCT FROM i.kpi
+        RETURNING m.operator_key, m.date, m.kpi
+    ),
+
+    latest AS (
+        UPDATE operator_latest_metrics l
+        SET kpi = c.kpi,
+            updated_at = now()
+        FROM changed c
+        WHERE l.operator_key = c.operator_key
+          AND l.date = c.date
+    )
+
+    SELECT
+        c.operator_key,
+        r.year,
+        r.month,
+        COUNT(*) AS rows_updated
+    FROM changed c
+    CROSS JOIN LATERAL resolve_cycle(c.date) r
+    GROUP BY c.operator_key, r.year, r.month
+""")
+
+# monthly kpi = the latest non-null daily KPI of the cycle, as in
+# recalc_operator_monthly_metrics_daily; only the KPI can have changed
+KPI_MONTHLY_SQL = text("""
+    UPDATE operator_monthly_metrics mm
+    SET kpi = k.kpi
+    FROM unnest(
+        CAST(:operator_keys AS int[]),
+        CAST(:years AS int[]),
+        CAST(:months AS int[])
+    ) AS a(operator_key, year, month)
+    LEFT JOIN LATERAL (
+        SELECT m.kpi
+        FROM operator_metrics m
+        WHERE m.operator_key = a.operator_key
+          AND m.date >= (make_date(a.year, a.month, 20) - INTERVAL '1 month')::date
+          AND m.date <  make_date(a.year, a.month, 20)
+          AND m.kpi IS NOT NULL
+        ORDER BY m.date DESC
+        LIMIT 1
+    ) k ON true
+    WHERE mm.operator_key = a.operator_key
+      AND mm.year = a.year
+      AND mm.month = a.month
+      AND mm.kpi IS DISTINCT FROM k.kpi
+""")
+
+SKIP_MONTHLY_RECALC_SQL = text(
+    "SELECT set_config('top_operator.skip_monthly_recalc', :value, true)"
+)
+
+
+def apply_kpi_map(db: Session, kpi_map: dict, since: date) -> KpiSyncReport:
+    """
+    Write the KPI of every (agent_id, cycle) whose stored value differs
+    from the sheet, in one statement inside the caller's transaction,
+    with the per-row monthly recalc trigger switched off; a changed
+    latest day is copied to operator_latest_metrics in the same
+    statement. The KPI of the affected monthly rows is then recomputed
+    in one more statement.
+    """
+    report = KpiSyncReport(since=since, sheet_rows=len(kpi_map))
+    if not kpi_map:
+        return report
+
+    keys = list(kpi_map)
+    db.execute(SKIP_MONTHLY_RECALC_SQL, {"value": "on"})
+    rows = db.execute(
+        KPI_SYNC_SQL,
+        {
+            "agent_ids": [agent_id for agent_id, _ in keys],
+            "cycles": [cycle for _, cycle in keys],
+            "kpis": [kpi_map[k] for k in keys],
+            "since": since,
+        }
+    ).all()
+    db.execute(SKIP_MONTHLY_RECALC_SQL, {"value": "off"})
+
+    report.rows_updated = sum(r.rows_updated for r in rows)
+    report.monthly_rows = len(rows)
+    report.cycles = sorted({(r.year, r.month) for r in rows})
+
+    if rows:
+        db.execute(
+            KPI_MONTHLY_SQL,
+            {
+                "operator_keys": [r.operator_key for r in rows],
+                "years": [r.year for r in rows],
+                "months": [r.month for r in rows],
+            }
+        )
+
+    return report
+
+
+def sync_kpi(since: date | None = None) -> KpiSyncReport | None:
+    """
+    Apply late KPI values from the sheet without calling the metrics API,
+    then re-rank only the cycles that changed.
+    """
+    since = since or default_since()
+
+    try:
+        kpi_map = load_kpi_map()
+    except Exception:
+        logger.exception("KPI sheet failed, nothing to sync")
+        return None
+
+    db: Session = SessionLocal()
+    try:
+        with etl_metrics.timer("kpi_update"):
+            report = apply_kpi_map(db, kpi_map, since)
+        version = data_version.bump(db) if report.rows_updated else None
+        db.commit()
+        data_version.announce(version)
+    except Exception:
+        db.rollback()
+        logger.exception("KPI sync failed")
+        raise
+    finally:
+        db.close()
+
+    if report.cycles:
+        with etl_metrics.timer("finalize_cycles"):
+            finalize_cycles(report.cycles)
+
+    etl_metrics.record("rows_updated", report.rows_updated)
+    etl_metrics.record("monthly_rows", report.monthly_rows)
+    etl_metrics.record("cycles", len(report.cycles))
+    logger.info(report.summary())
+    return report
@@ -0,0 +1,707 @@
+"""
+Single-pass ETL pipeline for the ``day_by`` metrics endpoint.
+
+Every day goes through the same stages, each fetched and parsed once:
+
+    fetch -> parse (validate, quarantine) -> reconcile (agent_id)
+          -> resolve (operators) -> kpi -> write (+ monthly recalc triggers)
+          -> finalize/snapshot
+
+under the day's advisory lock, and is recorded in the etl_runs ledger
+(``etl_ledger``) in the same transaction. The fetch runs before that
+transaction opens, so a slow upstream never keeps one idle with a
+snapshot. A day whose payload and inputs match its last successful load
+is skipped after the fetch.
+
+Intraday polls (``RunContext.provisional``) re-rank only the groups whose
+rows changed and are recorded as provisional until the closed day is
+loaded with the full finalize.
+
+Job orchestration (retries, CLI) lives in ``etl_daily_metrics``.
+"""
+import hashlib
+import json
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, get_engine
+from app.models import Operator
+from app.services import etl_ledger, sources, validation
+from app.services.agent_id import reconcile_agent_ids
+from app.services.daily_rank import rebuild_cycle_ranks
+from app.utils import data_version
+
+logger = logging.getLogger(__name__)
+
+Fetcher = Callable[[date], list | None]
+
+
+@dataclass
+class MetricRow:
+    agent_id: int
+    login: str | None
+    busy_duration: str | None
+    call_count: float
+    distributed_call_count: float
+    full_duration: str | None
+    hold_duration: str | None
+    idle_duration: str | None
+    lock_duration: str | None
+    kpi: float | None = None
+    operator_key: int | None = None
+
+    def content_hash(self) -> str:
+        """Hash of the upstream fields; KPI is compared on its own."""
+        raw = "\x1f".join(
+            repr(v)
+            for v in (
+                self.busy_duration,
+                self.call_count,
+                self.distributed_call_count,
+                self.full_duration,
+                self.hold_duration,
+                self.idle_duration,
+                self.lock_duration,
+            )
+        )
+        return hashlib.md5(raw.encode()).hexdigest()
+
+
+@dataclass
+class RunContext:
+    kpi_map: dict
+    sheet_map: dict
+    fetch: Fetcher = sources.fetch_day_data
+    payload_dir: Path | None = None
+    create_missing: bool = True
+    finalize: bool = True
+    # skip days the ledger has as done with the same payload and inputs
+    skip_unchanged: bool = True
+    # intraday poll of an open day: provisional ranks for changed groups
+    provisional: bool = False
+
+
+@dataclass
+class DayResult:
+    day: date
+    ok: bool = False
+    # done, provisional (intraday), unchanged (skipped), no_data, failed,
+    # locked (another run has it), archived (cycle must be restored first)
+    status: str = "failed"
+    fetched: int = 0
+    parsed: int = 0
+    # rows rejected by validation (etl_quarantine)
+    skipped: int = 0
+    agent_ids_updated: int = 0
+    operators_created: int = 0
+    unresolved: int = 0
+    written: int = 0
+    unchanged: int = 0
+    payload_hash: str | None = None
+    inputs_hash: str | None = None
+    # the cycle was re-ranked with the day (finalize_day ran)
+    finalized: bool = False
+    error: str | None = None
+    timings: dict[str, float] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        timings = " ".join(f"{k}={v:.3f}s" for k, v in self.timings.items())
+        return (
+            f"Day {self.day} {self.status} | "
+            f"fetched={self.fetched} parsed={self.parsed} skipped={self.skipped} "
+            f"agent_ids={self.agent_ids_updated} created={self.operators_created} "
+            f"unresolved={self.unresolved} written={self.written} "
+            f"unchanged={self.unchanged} | {timings}"
+        )
+
+
+@contextmanager
+def stage(result: DayResult, name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        result.timings[name] = result.timings.get(name, 0.0) + (
+            time.perf_counter() - started
+        )
+
+
+def daterange(start: date, end: date):
+    cur = start
+    while cur <= end:
+        yield cur
+        cur += timedelta(days=1)
+
+
+# ---------- payloads ----------
+def payload_path(payload_dir: Path, day: date) -> Path:
+    return Path(payload_dir) / f"{day.isoformat()}.json"
+
+
+def save_payload(payload_dir: Path, day: date, rows: list) -> None:
+    path = payload_path(payload_dir, day)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"data": rows}, ensure_ascii=False))
+
+
+def payload_fetcher(payload_dir: Path) -> Fetcher:
+    """Fetcher that replays payloads saved by an earlier run."""
+    def fetch(day: date) -> list | None:
+        path = payload_path(payload_dir, day)
+        if not path.exists():
+            return None
+        return json.loads(path.read_text()).get("data", [])
+
+    return fetch
+
+
+# ---------- stages ----------
+def parse_rows(api_rows: list) -> tuple[list[MetricRow], dict[int, list[str]]]:
+    """
+    Validate raw API rows (``validation``) and turn the accepted ones into
+    MetricRow, one per agent_id. Returns (rows, rejected payload index ->
+    reasons).
+    """
+    checked = validation.validate_payload(api_rows)
+
+    rows = [
+        MetricRow(
+            agent_id=r["agent_id"],
+            login=r["login"],
+            busy_duration=r["busy_duration"],
+            call_count=r["call_count"],
+            distributed_call_count=r["distributed_call_count"],
+            full_duration=r["full_duration"],
+            hold_duration=r["hold_duration"],
+            idle_duration=r["idle_duration"],
+            lock_duration=r["lock_duration"],
+        )
+        for r in checked.valid.to_dict("records")
+    ]
+    return rows, checked.rejected
+
+
+def resolve_operators(
+    db: Session,
+    rows: list[MetricRow],
+    sheet_map: dict,
+    create_missing: bool = True
+) -> tuple[list[MetricRow], int, int]:
+    """
+    Attach operator_key to every row by agent_id, creating operators that
+    are listed in the sheet. Returns (resolved rows, created, unresolved).
+    """
+    known = dict(
+        db.execute(
+            text("SELECT agent_id, operator_key FROM operators WHERE agent_id = ANY(:ids)"),
+            {"ids": [r.agent_id for r in rows]}
+        ).all()
+    )
+
+    missing = [r for r in rows if r.agent_id not in known]
+    created = 0
+
+    if missing and create_missing:
+        taken_logins = set(
+            db.execute(
+                text("SELECT operator_id FROM operators WHERE operator_id = ANY(:logins)"),
+                {"logins": [r.login for r in missing if r.login]}
+            ).scalars()
+        )
+
+        new_operators = []
+        for r in missing:
+            sheet_row = sheet_map.get(r.login)
+            if not sheet_row or r.login in taken_logins:
+                continue
+
+            new_operators.append(
+                Operator(
+                    agent_id=r.agent_id,
+                    operator_id=r.login,
+                    full_name=sheet_row["full_name"],
+                    group_name=sheet_row["group_name"],
+                    avatar_url=sheet_row["avatar_url"],
+                )
+            )
+
+        if new_operators:
+            db.add_all(new_operators)
+            db.flush()
+
+            for operator in new_operators:
+                known[operator.agent_id] = operator.operator_key
+                logger.info(
+                    f"New operator inserted | login={operator.operator_id}, "
+                    f"agent_id={operator.agent_id}"
+                )
+
+        created = len(new_operators)
+
+    resolved = []
+    for r in rows:
+        r.operator_key = known.get(r.agent_id)
+        if r.operator_key is not None:
+            resolved.append(r)
+
+    return resolved, created, len(rows) - len(resolved)
+
+
+def write_latest_metrics(db: Session, day: date, operator_keys: list[int]) -> int:
+    """
+    Point operator_latest_metrics at ``day`` for the given operators, read
+    back from operator_metrics by its primary key. Older
+    days (a replay or backfill) never replace a newer one. Returns the
+    number of rows inserted or updated.
+    """
+    if not operator_keys:
+        return 0
+
+    result = db.execute(
+        text("""
+            INSERT INTO operator_latest_metrics (
+                operator_key, date, call_count, avg_busy_seconds, kpi
+            )
+            SELECT
+                m.operator_key,
+                m.date,
+                m.call_count,
+                CASE
+                    WHEN m.call_count > 0 THEN
+                        EXTRACT(EPOCH FROM m.busy_duration::interval) / m.call_count
+                    ELSE 0
+                END,
+                m.kpi
+            FROM operator_metrics m
+            WHERE m.operator_key = ANY(:keys)
+              AND m.date = :day
+            ON CONFLICT (operator_key) DO UPDATE SET
+                date = EXCLUDED.date,
+                call_count = EXCLUDED.call_count,
+                avg_busy_seconds = EXCLUDED.avg_busy_seconds,
+                kpi = EXCLUDED.kpi,
+                updated_at = now()
+            WHERE operator_latest_metrics.date <= EXCLUDED.date
+              AND (
+                    operator_latest_metrics.date,
+                    operator_latest_metrics.call_count,
+                    operator_latest_metrics.avg_busy_seconds,
+                    operator_latest_metrics.kpi
+                  ) IS DISTINCT FROM (
+                    EXCLUDED.date,
+                    EXCLUDED.call_count,
+                    EXCLUDED.avg_busy_seconds,
+                    EXCLUDED.kpi
+                  )
+        """),
+        {"keys": operator_keys, "day": day}
+    )
+    return result.rowcount
+
+
+def join_kpi(rows: list[MetricRow], kpi_map: dict, cycle: int) -> None:
+    for r in rows:
+        r.kpi = kpi_map.get((r.agent_id, cycle))
+
+
+def write_metrics(db: Session, day: date, rows: list[MetricRow]) -> list[int]:
+    """
+    Upsert the day's rows in one statement, skipping rows whose content
+    hash and KPI are unchanged. The row triggers on operator_metrics keep
+    operator_monthly_metrics in sync for the rows actually written.
+    Returns the operator_key of every row inserted or updated.
+    """
+    if not rows:
+        return []
+
+    result = db.execute(
+        text("""
+            INSERT INTO operator_metrics (
+                operator_key,
+                date,
+                busy_duration,
+                call_count,
+                distributed_call_count,
+                full_duration,
+                hold_duration,
+                idle_duration,
+                lock_duration,
+                kpi,
+                content_hash
+            )
+            SELECT
+                v.operator_key,
+                :day,
+                v.busy_duration,
+                v.call_count,
+                v.distributed_call_count,
+                v.full_duration,
+                v.hold_duration,
+                v.idle_duration,
+                v.lock_duration,
+                v.kpi,
+                v.content_hash
+            FROM unnest(
+                CAST(:operator_keys AS int[]),
+                CAST(:busy_durations AS varchar[]),
+                CAST(:call_counts AS float8[]),
+                CAST(:distributed_call_counts AS float8[]),
+                CAST(:full_durations AS varchar[]),
+                CAST(:hold_durations AS varchar[]),
+                CAST(:idle_durations AS varchar[]),
+                CAST(:lock_durations AS varchar[]),
+                CAST(:kpis AS float8[]),
+                CAST(:content_hashes AS varchar[])
+            ) AS v(
+                operator_key,
+                busy_duration,
+                call_count,
+                distributed_call_count,
+                full_duration,
+                hold_duration,
+                idle_duration,
+                lock_duration,
+                kpi,
+                content_hash
+            )
+            ON CONFLICT (operator_key, date)
+            DO UPDATE SET
+                busy_duration = EXCLUDED.busy_duration,
+                call_count = EXCLUDED.call_count,
+                distributed_call_count = EXCLUDED.distributed_call_count,
+                full_duration = EXCLUDED.full_duration,
+                hold_duration = EXCLUDED.hold_duration,
+                idle_duration = EXCLUDED.idle_duration,
+                lock_duration = EXCLUDED.lock_duration,
+                kpi = EXCLUDED.kpi,
+                content_hash = EXCLUDED.content_hash
+            WHERE operator_metrics.content_hash
+                    IS DISTINCT FROM EXCLUDED.content_hash
+               OR operator_metrics.kpi IS DISTINCT FROM EXCLUDED.kpi
+            RETURNING operator_key
+        """),
+        {
+            "day": day,
+            "operator_keys": [r.operator_key for r in rows],
+            "busy_durations": [r.busy_duration for r in rows],
+            "call_counts": [r.call_count for r in rows],
+            "distributed_call_counts": [r.distributed_call_count for r in rows],
+            "full_durations": [r.full_duration for r in rows],
+            "hold_durations": [r.hold_duration for r in rows],
+            "idle_durations": [r.idle_duration for r in rows],
+            "lock_durations": [r.lock_duration for r in rows],
+            "kpis": [r.kpi for r in rows],
+            "content_hashes": [r.content_hash() for r in rows],
+        }
+    )
+    return list(result.scalars())
+
+
+def finalize_day(db: Session, day: date) -> None:
+    """Re-rank the day's cycle and snapshot the ranks for the day."""
+    year, month = sources.resolve_monthly_cycle(day)
+    params = {"year": year, "month": month, "day": day}
+
+    db.execute(text("SELECT finalize_monthly_scores(:year, :month)"), params)
+    db.execute(text("SELECT snapshot_daily_rank(:year, :month, :day)"), params)
+
+
+def refresh_provisional_ranks(db: Session, day: date, operator_keys: list[int]) -> None:
+    """
+    Re-rank only the groups of the operators just written, and snapshot
+    the open day's (provisional) ranks; unchanged ranks are not rewritten.
+    """
+    year, month = sources.resolve_monthly_cycle(day)
+    groups = list(
+        db.execute(
+            text("""
+                SELECT DISTINCT group_name
+                FROM operators
+                WHERE operator_key = ANY(:keys)
+            """),
+            {"keys": operator_keys}
+        ).scalars()
+    )
+    params = {"year": year, "month": month, "day": day, "groups": groups}
+
+    db.execute(
+        text("SELECT finalize_monthly_scores(:year, :month, CAST(:groups AS varchar[]))"),
+        params
+    )
+    db.execute(text("SELECT snapshot_daily_rank(:year, :month, :day)"), params)
+
+
+def cycles_for_days(days: Iterable[date]) -> set[tuple[int, int]]:
+    return {sources.resolve_monthly_cycle(d) for d in days}
+
+
+def finalize_cycles(
+    cycles: Iterable[tuple[int, int]]
+) -> dict[tuple[int, int], float]:
+    """
+    Re-rank every (year, month) cycle and rebuild its daily rank history
+    in one pass. Returns the seconds spent per cycle.
+    """
+    cycles = sorted(set(cycles))
+    timings = {}
+
+    db: Session = SessionLocal()
+    try:
+        for year, month in cycles:
+            started = time.perf_counter()
+            db.execute(
+                text("SELECT finalize_monthly_scores(:year, :month)"),
+                {"year": year, "month": month}
+            )
+            rows = rebuild_cycle_ranks(db, year, month)
+            version = data_version.bump(db)
+            db.commit()
+            data_version.announce(version)
+
+            timings[(year, month)] = time.perf_counter() - started
+            logger.info(
+                f"Cycle finalized | year={year} month={month} "
+                f"daily_ranks={rows} | {timings[(year, month)]:.3f}s"
+            )
+    except Exception:
+        db.rollback()
+        logger.exception("Cycle finalize failed")
+        raise
+    finally:
+        db.close()
+
+    return timings
+
+
+def archived_cycle(db: Session, day: date) -> tuple[int, int] | None:
+    """
+    The day's (year, month) cycle if retention archived it. Loading into
+    an archived cycle would recalc its monthly rows from the re-loaded
+    days only and duplicate them in the rank graphs.
+    """
+    year, month = sources.resolve_monthly_cycle(day)
+    archived = db.execute(
+        text("""
+            SELECT EXISTS (
+                SELECT 1
+                FROM archived_cycles
+                WHERE year = :year
+                  AND month = :month
+            )
+        """),
+        {"year": year, "month": month}
+    ).scalar_one()
+    return (year, month) if archived else None
+
+
+# ---------- driver ----------
+def refuse_archived(db: Session, day: date, result: DayResult) -> bool:
+    """Mark ``result`` archived if the day's cycle was archived."""
+    with stage(result, "ledger"):
+        archived = archived_cycle(db, day)
+    if not archived:
+        return False
+
+    year, month = archived
+    result.status = "archived"
+    result.error = (
+        f"cycle {year}-{month:02d} is archived; restore it first "
+        f"(python -m app.services.retention --restore {year} {month})"
+    )
+    logger.error(f"Day {day} not loaded | {result.error}")
+    return True
+
+
+def fetch_day(day: date, ctx: RunContext, result: DayResult) -> list | None:
+    """
+    Fetch (and save) the day's payload and hash it. Runs outside any
+    transaction: it can wait on the upstream for its whole timeout.
+    """
+    with stage(result, "fetch"):
+        api_rows = ctx.fetch(day)
+
+    if not api_rows:
+        logger.warning(f"No API data yet for {day}")
+        result.status = "no_data"
+        return None
+
+    result.fetched = len(api_rows)
+    if ctx.payload_dir:
+        save_payload(ctx.payload_dir, day, api_rows)
+
+    result.payload_hash = etl_ledger.payload_hash(api_rows)
+    return api_rows
+
+
+def load_day(
+    db: Session,
+    day: date,
+    ctx: RunContext,
+    cycle: int,
+    result: DayResult,
+    api_rows: list
+) -> int | None:
+    """
+    Run the stages after the fetch for ``day`` in the caller's
+    transaction and set ``result.status``. Returns the bumped data
+    version, if anything was written.
+    """
+    with stage(result, "ledger"):
+        previous = etl_ledger.previous(db, day)
+
+    result.inputs_hash = etl_ledger.inputs_hash(ctx.kpi_map, ctx.sheet_map, cycle)
+
+    status = "provisional" if ctx.provisional else "done"
+    # rows already written by intraday polls or a range load still need
+    # the full finalize, even when nothing changes now
+    pending = ctx.finalize and etl_ledger.needs_finalize(previous)
+
+    if not pending and ctx.skip_unchanged and etl_ledger.is_unchanged(
+        previous, status, result.payload_hash, result.inputs_hash
+    ):
+        result.status = "unchanged"
+        return None
+
+    with stage(result, "parse"):
+        rows, rejected = parse_rows(api_rows)
+    result.parsed = len(rows)
+
+    with stage(result, "quarantine"):
+        result.skipped = validation.quarantine(db, day, api_rows, rejected)
+
+    with stage(result, "reconcile"):
+        report = reconcile_agent_ids(
+            db, {r.login: r.agent_id for r in rows if r.login}
+        )
+    result.agent_ids_updated = len(report.updated)
+    for login, agent_id in report.conflicts:
+        logger.warning(
+            f"agent_id conflict on {day} | login={login}, agent_id={agent_id}"
+        )
+
+    with stage(result, "resolve"):
+        rows, result.operators_created, result.unresolved = resolve_operators(
+            db, rows, ctx.sheet_map, ctx.create_missing
+        )
+
+    with stage(result, "kpi"):
+        join_kpi(rows, ctx.kpi_map, cycle)
+
+    with stage(result, "write"):
+        written = write_metrics(db, day, rows)
+    result.written = len(written)
+    result.unchanged = len(rows) - result.written
+
+    if not ctx.provisional:
+        # every resolved row: rows an intraday poll already wrote are
+        # unchanged now, but the day has just become the latest closed one
+        with stage(result, "latest"):
+            write_latest_metrics(db, day, [r.operator_key for r in rows])
+
+    if ctx.finalize and (result.written or pending):
+        with stage(result, "finalize"):
+            finalize_day(db, day)
+        result.finalized = True
+    elif ctx.provisional and result.written:
+        with stage(result, "provisional_rank"):
+            refresh_provisional_ranks(db, day, written)
+
+    result.status = status
+    return data_version.bump(db) if result.written or result.finalized else None
+
+
+def process_day(day: date, ctx: RunContext, cycle: int | None = None) -> DayResult:
+    result = DayResult(day=day)
+    if cycle is None:
+        cycle = sources.resolve_cycle_for_date(day)
+
+    started_at = datetime.now()
+    started = time.perf_counter()
+    # one connection for the lock and the session: the lock is held by the
+    # database session, across the transactions below
+    conn = get_engine().connect()
+    db: Session = SessionLocal(bind=conn)
+    locked = False
+
+    try:
+        # overlapping runs never load the same day
+        locked = etl_ledger.try_lock(conn, day)
+        if not locked:
+            result.status = "locked"
+            logger.warning(f"Day {day} is being loaded by another run, skipped")
+            return result
+
+        refused = refuse_archived(db, day, result)
+        db.commit()
+        if refused:
+            return result
+
+        version = None
+        try:
+            api_rows = fetch_day(day, ctx, result)
+            if api_rows:
+                # a failed day rolls back to here and is still recorded
+                with db.begin_nested():
+                    version = load_day(db, day, ctx, cycle, result, api_rows)
+        except Exception as exc:
+            logger.exception(f"ETL error on {day}")
+            result.status = "failed"
+            result.error = f"{type(exc).__name__}: {exc}"
+            # rolled back
+            result.written = result.unchanged = 0
+            result.finalized = False
+
+        finalized = result.status == "done" and result.finalized
+
+        with stage(result, "commit"):
+            if result.status != "unchanged":
+                etl_ledger.record(
+                    db, result, started_at, time.perf_counter() - started, finalized
+                )
+            db.commit()
+
+        result.ok = result.status in ("done", "provisional", "unchanged")
+        data_version.announce(version)
+
+    except Exception:
+        db.rollback()
+        result.ok = False
+        result.status = "failed"
+        logger.exception(f"ETL error on {day}")
+
+    finally:
+        db.close()
+        try:
+            if locked:
+                etl_ledger.unlock(conn, day)
+        except Exception:
+            # a pooled connection must not keep the lock
+            conn.invalidate()
+            logger.warning(f"Could not unlock day {day}", exc_info=True)
+        finally:
+            conn.close()
+
+    logger.info(f"{result.summary()} | cycle={cycle}")
+    return result
+
+
+def log_run_totals(results: list[DayResult]) -> None:
+    totals: dict[str, float] = {}
+    for r in results:
+        for name, seconds in r.timings.items():
+            totals[name] = totals.get(name, 0.0) + seconds
+
+    logger.info(
+        f"Run totals | days={len(results)} "
+        f"ok={sum(r.ok for r in results)} "
+        f"written={sum(r.written for r in results)} | "
+        + " ".join(f"{k}={v:.3f}s" for k, v in totals.items())
+    )
@@ -0,0 +1,142 @@
+"""
+Retention for closed cycles.
+
+Keeps the live operator_metrics / operator_daily_rank tables sized to the
+last ``--keep`` cycles. Older cycles are completed (monthly rows, final
+ranks, rank history) and rolled up into operator_metrics_archive by the
+archive_cycle() SQL function; rank graphs keep reading them from there.
+
+    python -m app.services.retention [--keep 2] [--dry-run]
+    python -m app.services.retention --restore 2025 11
+"""
+import argparse
+import logging
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.services.sources import resolve_monthly_cycle
+from app.utils import data_version
+
+DEFAULT_KEEP_CYCLES = 2
+
+logger = logging.getLogger(__name__)
+
+
+def cycle_start(year: int, month: int) -> date:
+    if month == 1:
+        return date(year - 1, 12, 20)
+    return date(year, month - 1, 20)
+
+
+def oldest_kept_cycle(keep: int, today: date | None = None) -> tuple[int, int]:
+    year, month = resolve_monthly_cycle(today or date.today())
+    for _ in range(keep - 1):
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return year, month
+
+
+def archivable_cycles(db: Session, keep: int) -> list[tuple[int, int]]:
+    """Cycles older than the last ``keep`` that still have live daily rows."""
+    cutoff = cycle_start(*oldest_kept_cycle(keep))
+
+    rows = db.execute(
+        text("""
+            SELECT DISTINCT c.year, c.month
+            FROM (
+                SELECT DISTINCT date
+                FROM operator_metrics
+                WHERE date < :cutoff
+            ) d
+            CROSS JOIN LATERAL resolve_cycle(d.date) c
+            ORDER BY c.year, c.month
+        """),
+        {"cutoff": cutoff}
+    ).all()
+
+    return [tuple(r) for r in rows]
+
+
+def archive_cycles(keep: int = DEFAULT_KEEP_CYCLES, dry_run: bool = False) -> list:
+    db: Session = SessionLocal()
+
+    try:
+        cycles = archivable_cycles(db, keep)
+        db.rollback()
+
+        if dry_run:
+            logger.info(f"Retention dry run | would archive cycles={cycles}")
+            return cycles
+
+        for year, month in cycles:
+            operators = db.execute(
+                text("SELECT archive_cycle(:year, :month)"),
+                {"year": year, "month": month}
+            ).scalar_one()
+            version = data_version.bump(db)
+            db.commit()
+            data_version.announce(version)
+
+            logger.info(
+                f"Cycle archived | year={year} month={month} operators={operators}"
+            )
+
+        return cycles
+
+    except Exception:
+        db.rollback()
+        logger.exception("Retention failed")
+        raise
+
+    finally:
+        db.close()
+
+
+def restore_cycle(year: int, month: int) -> int:
+    db: Session = SessionLocal()
+
+    try:
+        rows = db.execute(
+            text("SELECT restore_cycle(:year, :month)"),
+            {"year": year, "month": month}
+        ).scalar_one()
+        version = data_version.bump(db)
+        db.commit()
+        data_version.announce(version)
+
+        logger.info(f"Cycle restored | year={year} month={month} rows={rows}")
+        return rows
+
+    except Exception:
+        db.rollback()
+        logger.exception(f"Restore failed | year={year} month={month}")
+        raise
+
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="Archive closed cycles")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP_CYCLES)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument(
+        "--restore",
+        nargs=2,
+        type=int,
+        metavar=("YEAR", "MONTH"),
+        help="move an archived cycle back into the live tables",
+    )
+    args = parser.parse_args()
+
+    if args.restore:
+        restore_cycle(*args.restore)
+    else:
+        archive_cycles(keep=args.keep, dry_run=args.dry_run)
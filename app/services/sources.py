@@ -0,0 +1,271 @@
+from datetime import date
+from pathlib import Path
+import csv
+import json
+import logging
+import re
+import requests
+import gspread
+
+from app.config import get_settings
+from app.services import etl_metrics
+
+API_URL = "http://csv.ccenter.uz:5000/csv-to-json/day_by"
+COLUMNS = "1,2,3,4,5,8,9,10,11,14"
+
+KPI_SHEET_URL = "https://docs.google.com/spreadsheets/d/1yKRsDh0S1lmcfFthlxhUtScGA-FK2XSe_8snO5-i50A"
+GOOGLE_CREDS = "genial-smoke-461106-e4-90a8532e00b8.json"
+OPERATORS_SHEET_URL = "https://docs.google.com/spreadsheets/d/1lOyz1d6iL6Ok0uzElqrn_KM8Im-MgrEslRHu2Hi8ZKE/edit?gid=0#gid=0"
+ALLOWED_GROUPS = {"1009", "1000", "1242", "1170", "1093", "ДОП"}
+
+OPERATORS_SHEET_FILE = "operators_sheet.json"
+KPI_SHEET_FILE = "kpi_sheet.json"
+BONUS_SHEET_FILE = "bonus_sheet.json"
+
+# header names of the bonus grid (case-insensitive), in any column order
+BONUS_COLUMNS = ("login", "year", "month", "kie", "active_participation", "monitoring")
+BONUS_VALUE_COLUMNS = BONUS_COLUMNS[3:]
+
+logger = logging.getLogger(__name__)
+
+
+def api_url() -> str:
+    return get_settings().METRICS_API_URL or API_URL
+
+
+def local_sheet(name: str) -> list[list[str]] | None:
+    """A sheet grid from SHEETS_DIR, when the sheets are stood in locally."""
+    sheets_dir = get_settings().SHEETS_DIR
+    if not sheets_dir:
+        return None
+    return json.loads((Path(sheets_dir) / name).read_text())
+
+
+def load_operator_sheet() -> dict:
+    logger.info("Loading operators sheet...")
+
+    values = local_sheet(OPERATORS_SHEET_FILE)
+
+    if values is None:
+        with etl_metrics.timer("sheets_auth"):
+            gc = gspread.service_account(GOOGLE_CREDS)
+
+        with etl_metrics.timer("sheets_operators"):
+            sh = gc.open_by_url(OPERATORS_SHEET_URL)
+            ws = sh.worksheet("Operators")
+            values = ws.get_all_values()
+
+    sheet_map = parse_operator_sheet(values)
+    etl_metrics.record("sheet_operators", len(sheet_map))
+
+    logger.info(
+        f"Operators loaded from sheet: {len(sheet_map)} | groups={ALLOWED_GROUPS}"
+    )
+    return sheet_map
+
+
+def parse_operator_sheet(values: list[list[str]]) -> dict:
+    """login -> operator fields, from the Operators grid (header row first)."""
+    rows = values[1:]
+
+    sheet_map = {}
+
+    for r in rows:
+        if len(r) < 3:
+            continue
+
+        login = r[1].strip()
+        group_name = r[2].strip()
+
+        if group_name not in ALLOWED_GROUPS:
+            continue
+
+        if not login.isdigit():
+            continue
+
+        full_name = r[0].replace("👤", "").strip()
+        avatar_url = r[5].strip() if len(r) > 5 and r[5] else None
+
+        sheet_map[login] = {
+            "full_name": full_name,
+            "group_name": group_name,
+            "avatar_url": avatar_url,
+        }
+
+    return sheet_map
+
+
+def load_kpi_map() -> dict:
+    logger.info("Loading KPI sheet...")
+
+    rows = local_sheet(KPI_SHEET_FILE)
+
+    if rows is None:
+        with etl_metrics.timer("sheets_auth"):
+            gc = gspread.service_account(GOOGLE_CREDS)
+
+        with etl_metrics.timer("sheets_kpi"):
+            rows = gc.open_by_url(KPI_SHEET_URL).sheet1.get_all_values()
+
+    kpi_map = parse_kpi_sheet(rows)
+    etl_metrics.record("sheet_kpi_rows", len(kpi_map))
+
+    logger.info(f"KPI loaded: {len(kpi_map)} rows")
+    return kpi_map
+
+
+def parse_kpi_sheet(rows: list[list[str]]) -> dict:
+    """(agent_id, cycle) -> KPI, from the KPI grid (header row first)."""
+    kpi_map = {}
+
+    for row in rows[1:]:
+        if len(row) < 3:
+            continue
+
+        fio, kpi, cycle = row[0], row[1], row[2]
+
+        m = re.search(r"\((\d+)\)", fio)
+        if not m:
+            continue
+
+        try:
+            agent_id = int(m.group(1))
+            cycle = int(cycle)
+            kpi_value = float(kpi.replace(",", "."))
+        except Exception:
+            continue
+
+        kpi_map[(agent_id, cycle)] = kpi_value
+
+    return kpi_map
+
+
+def load_bonus_grid(csv_path: Path | None = None) -> list[list[str]]:
+    """
+    The bonus grid from a CSV export, SHEETS_DIR, or the sheet at
+    BONUS_SHEET_URL, in that order.
+    """
+    if csv_path is not None:
+        with open(csv_path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.reader(f))
+
+    rows = local_sheet(BONUS_SHEET_FILE)
+    if rows is not None:
+        return rows
+
+    url = get_settings().BONUS_SHEET_URL
+    if not url:
+        raise RuntimeError("No bonus source: pass a CSV file or set BONUS_SHEET_URL")
+
+    with etl_metrics.timer("sheets_auth"):
+        gc = gspread.service_account(GOOGLE_CREDS)
+
+    with etl_metrics.timer("sheets_bonus"):
+        return gc.open_by_url(url).sheet1.get_all_values()
+
+
+def parse_bonus_sheet(rows: list[list[str]]) -> tuple[dict, list[str]]:
+    """
+    (login, year, month) -> (kie, active_participation, monitoring), from
+    the bonus grid (header row first), plus one message per rejected row.
+    A repeated key keeps the last row.
+    """
+    if not rows:
+        return {}, []
+
+    header = [h.strip().lower().replace(" ", "_") for h in rows[0]]
+    missing = [c for c in BONUS_COLUMNS if c not in header]
+    if missing:
+        raise ValueError(f"Bonus sheet is missing columns: {missing}")
+    index = {c: header.index(c) for c in BONUS_COLUMNS}
+
+    bonus_map = {}
+    rejected = []
+
+    for line, row in enumerate(rows[1:], start=2):
+        if not any(cell.strip() for cell in row):
+            continue
+
+        cells = {
+            c: row[i].strip() if i < len(row) else ""
+            for c, i in index.items()
+        }
+
+        login = cells["login"]
+        if not login.isdigit():
+            rejected.append(f"row {line}: bad login {login!r}")
+            continue
+
+        try:
+            year, month = int(cells["year"]), int(cells["month"])
+            values = tuple(
+                int(cells[c]) if cells[c] else 0
+                for c in BONUS_VALUE_COLUMNS
+            )
+        except ValueError:
+            rejected.append(f"row {line}: non-numeric year, month or value")
+            continue
+
+        if not 2000 <= year <= 2100 or not 1 <= month <= 12:
+            rejected.append(f"row {line}: bad cycle {year}-{month}")
+            continue
+
+        if any(v < 0 for v in values):
+            rejected.append(f"row {line}: negative value")
+            continue
+
+        bonus_map[(login, year, month)] = values
+
+    return bonus_map, rejected
+
+
+def resolve_cycle_for_date(d: date) -> int:
+    if d.day >= 20:
+        return d.month
+    return 12 if d.month == 1 else d.month - 1
+
+
+def resolve_monthly_cycle(d: date) -> tuple[int, int]:
+    """
+    (year, month) of the operator_monthly_metrics cycle a day belongs to.
+    Mirrors the SQL resolve_cycle() function.
+    """
+    if d.day < 20:
+        return d.year, d.month
+    if d.month == 12:
+        return d.year + 1, 1
+    return d.year, d.month + 1
+
+
+def fetch_day_data(day: date) -> list | None:
+    """
+    Rows of the ``day_by`` endpoint for one day, or None when the API has
+    no data for it yet (400 response or an ``error`` payload).
+    """
+    params = {
+        "columns": COLUMNS,
+        "year": day.year,
+        "month": f"{day.month:02d}",
+        "day": f"{day.day:02d}",
+    }
+
+    r = requests.get(api_url(), params=params, timeout=30)
+
+    etl_metrics.record("fetch_requests")
+    etl_metrics.record("fetch_bytes", len(r.content))
+
+    if r.status_code == 400:
+        logger.warning(f"API returned 400 for {day}")
+        etl_metrics.record("fetch_no_data")
+        return None
+
+    r.raise_for_status()
+
+    payload = r.json()
+
+    if "error" in payload:
+        logger.warning(f"API error for {day}: {payload['error']}")
+        etl_metrics.record("fetch_no_data")
+        return None
+
+    return payload.get("data", [])
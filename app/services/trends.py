@@ -0,0 +1,246 @@
+"""
+Multi-cycle trends of operator_monthly_metrics for one operator or a
+whole group, for GET .../trend.
+
+The metric points of a range are read in one query over
+operator_monthly_metrics. Points of closed cycles (before the current
+one) are cached in Redis per operator_key and cycle; the key carries the
+cycle's group_cycle_stats.computed_at, which every re-ranking of the
+cycle (late loads, KPI sync, restore) refreshes, so a changed cycle is
+simply read again. Names and group membership are never cached: they
+are read live from operators, so roster changes show up at once. The
+open cycle is always read from the database.
+"""
+import json
+import logging
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.cache.redis import redis_client
+from app.services.sources import resolve_monthly_cycle
+
+CACHE_PREFIX = "top_operator:trend"
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+DEFAULT_TREND_CYCLES = 6
+MAX_TREND_CYCLES = 24
+
+Cycle = tuple[int, int]
+
+logger = logging.getLogger(__name__)
+
+
+GROUP_MEMBERS_SQL = text("""
+    SELECT operator_key, id AS operator_uuid, full_name
+    FROM operators
+    WHERE group_name = :group
+""")
+
+OPERATOR_SQL = text("""
+    SELECT operator_key, id AS operator_uuid, full_name
+    FROM operators
+    WHERE id = :operator_uuid
+""")
+
+POINTS_SQL = text("""
+    SELECT
+        m.operator_key,
+        m.year,
+        m.month,
+        m.rank,
+        m.score,
+        m.stars,
+        m.call_count,
+        m.avg_busy_per_call,
+        m.kpi
+    FROM unnest(
+        CAST(:years AS int[]),
+        CAST(:months AS int[])
+    ) AS c(year, month)
+    JOIN operator_monthly_metrics m
+      ON m.year = c.year
+     AND m.month = c.month
+    WHERE m.operator_key = ANY(:operator_keys)
+""")
+
+CYCLE_STAMPS_SQL = text("""
+    SELECT s.year, s.month, MAX(s.computed_at) AS computed_at
+    FROM group_cycle_stats s
+    JOIN unnest(
+        CAST(:years AS int[]),
+        CAST(:months AS int[])
+    ) AS c(year, month)
+      ON c.year = s.year
+     AND c.month = s.month
+    GROUP BY s.year, s.month
+""")
+
+
+def cycle_index(cycle: Cycle) -> int:
+    year, month = cycle
+    return year * 12 + month - 1
+
+
+def cycle_at(index: int) -> Cycle:
+    return index // 12, index % 12 + 1
+
+
+def cycle_range(first: Cycle, last: Cycle) -> list[Cycle]:
+    return [cycle_at(i) for i in range(cycle_index(first), cycle_index(last) + 1)]
+
+
+def default_range(today: date | None = None) -> tuple[Cycle, Cycle]:
+    """The last DEFAULT_TREND_CYCLES cycles, up to the current one."""
+    last = resolve_monthly_cycle(today or date.today())
+    return cycle_at(cycle_index(last) - DEFAULT_TREND_CYCLES + 1), last
+
+
+def _args(cycles: list[Cycle]) -> dict:
+    return {
+        "years": [year for year, _ in cycles],
+        "months": [month for _, month in cycles],
+    }
+
+
+def _point(r) -> dict:
+    return {
+        "rank": r["rank"],
+        "score": r["score"],
+        "stars": r["stars"],
+        "call_count": r["call_count"],
+        "avg_busy_per_call": r["avg_busy_per_call"],
+        "kpi": r["kpi"],
+    }
+
+
+def _cycle_prefixes(db: Session, cycles: list[Cycle]) -> dict[Cycle, str]:
+    """Cache key prefix of every closed cycle that has been finalized."""
+    current = resolve_monthly_cycle(date.today())
+    closed = [c for c in cycles if cycle_index(c) < cycle_index(current)]
+    if not closed:
+        return {}
+
+    stamps = db.execute(CYCLE_STAMPS_SQL, _args(closed)).all()
+    return {
+        (r.year, r.month): (
+            f"{CACHE_PREFIX}:{r.year}-{r.month:02d}:{r.computed_at.isoformat()}"
+        )
+        for r in stamps
+    }
+
+
+def _cache_get(keys: dict) -> dict:
+    """Cached values of ``keys``; a cached None is "no row that cycle"."""
+    if not keys:
+        return {}
+    wanted = list(keys)
+    try:
+        values = redis_client.mget([keys[w] for w in wanted])
+    except Exception:
+        logger.warning("Could not read cached trends", exc_info=True)
+        return {}
+    return {w: json.loads(v) for w, v in zip(wanted, values) if v is not None}
+
+
+def _cache_set(keys: dict, values: dict) -> None:
+    if not keys:
+        return
+    try:
+        with redis_client.pipeline(transaction=False) as pipe:
+            for wanted, key in keys.items():
+                pipe.set(key, json.dumps(values[wanted]), ex=CACHE_TTL_SECONDS)
+            pipe.execute()
+    except Exception:
+        logger.warning("Could not cache trends", exc_info=True)
+
+
+def load_points(
+    db: Session,
+    operator_keys: list[int],
+    cycles: list[Cycle]
+) -> dict[tuple[int, Cycle], dict | None]:
+    """
+    Metric point of every (operator_key, cycle), None where the operator
+    has no row: cached closed cycles from Redis, the rest in one query.
+    """
+    prefixes = _cycle_prefixes(db, cycles)
+
+    def cache_keys(pairs) -> dict:
+        return {
+            (key, cycle): f"{prefixes[cycle]}:{key}"
+            for key, cycle in pairs
+            if cycle in prefixes
+        }
+
+    points = _cache_get(cache_keys(
+        (key, cycle) for cycle in cycles for key in operator_keys
+    ))
+
+    missing = [
+        (key, cycle)
+        for cycle in cycles
+        for key in operator_keys
+        if (key, cycle) not in points
+    ]
+    if missing:
+        keys = sorted({key for key, _ in missing})
+        missing_cycles = sorted({cycle for _, cycle in missing})
+        fetched: dict[tuple[int, Cycle], dict | None] = {
+            (key, cycle): None for key in keys for cycle in missing_cycles
+        }
+        rows = db.execute(
+            POINTS_SQL,
+            {"operator_keys": keys, **_args(missing_cycles)}
+        ).mappings()
+        for r in rows:
+            fetched[(r["operator_key"], (r["year"], r["month"]))] = _point(r)
+
+        _cache_set(cache_keys(fetched), fetched)
+        points.update(fetched)
+
+    return points
+
+
+def _series(points: dict, operator_key: int, cycles: list[Cycle]) -> list[tuple[Cycle, dict]]:
+    return [
+        (cycle, points[(operator_key, cycle)])
+        for cycle in cycles
+        if points.get((operator_key, cycle)) is not None
+    ]
+
+
+def group_trend(db: Session, group: str, cycles: list[Cycle]) -> list[dict]:
+    """
+    The group's current operators with their (cycle, point) series, by
+    their latest rank in the range.
+    """
+    members = db.execute(GROUP_MEMBERS_SQL, {"group": group}).mappings().all()
+    points = load_points(db, [m["operator_key"] for m in members], cycles)
+
+    operators = []
+    for m in members:
+        series = _series(points, m["operator_key"], cycles)
+        if series:
+            operators.append({
+                "operator_uuid": str(m["operator_uuid"]),
+                "full_name": m["full_name"],
+                "series": series,
+            })
+
+    operators.sort(key=lambda o: (
+        o["series"][-1][1]["rank"] is None,
+        o["series"][-1][1]["rank"] or 0,
+        o["full_name"],
+    ))
+    return operators
+
+
+def operator_trend(db: Session, operator_uuid: str, cycles: list[Cycle]) -> list[tuple[Cycle, dict]]:
+    operator = db.execute(OPERATOR_SQL, {"operator_uuid": operator_uuid}).mappings().first()
+    if operator is None:
+        return []
+
+    points = load_points(db, [operator["operator_key"]], cycles)
+    return _series(points, operator["operator_key"], cycles)
@@ -0,0 +1,164 @@
+"""
+Validation stage for ``day_by`` payloads.
+
+A day's rows are checked together as DataFrame columns instead of row by
+row: ID, call counts, duration format and range, and duplicate IDs.
+Rejected rows are written to etl_quarantine with their reasons and the
+rest of the day goes on, so one malformed record no longer fails (and
+retries) the whole day.
+"""
+import json
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.services import etl_metrics
+
+COUNT_COLUMNS = {
+    "CallCount": "call_count",
+    "DistributedCallCount": "distributed_call_count",
+}
+
+DURATION_COLUMNS = {
+    "BusyDuration": "busy_duration",
+    "FullDuration": "full_duration",
+    "HoldDuration": "hold_duration",
+    "IdleDuration": "idle_duration",
+    "LockDuration": "lock_duration",
+}
+
+# H:MM:SS, the only format the endpoint sends (and ::interval accepts)
+DURATION_FORMAT = r"^([0-9]{1,4}):([0-5][0-9]):([0-5][0-9])$"
+MAX_DURATION_SECONDS = 24 * 3600
+
+# operators.agent_id is INT
+MAX_AGENT_ID = 2**31 - 1
+
+
+@dataclass
+class Validation:
+    # agent_id, login, call counts and durations of the accepted rows,
+    # one per agent_id
+    valid: pd.DataFrame
+    # payload index -> reasons
+    rejected: dict[int, list[str]]
+
+
+def _text(values: pd.Series) -> pd.Series:
+    """Stripped strings, NA for missing and blank values."""
+    stripped = values.astype("string").str.strip()
+    return stripped.mask(stripped.eq("").fillna(False))
+
+
+def _numbers(values: pd.Series) -> pd.Series:
+    """float64, NaN for anything that is not a number."""
+    return pd.to_numeric(values, errors="coerce").astype("float64")
+
+
+def _nullable(values: pd.Series) -> pd.Series:
+    return values.astype(object).where(values.notna(), None)
+
+
+def validate_payload(api_rows: list) -> Validation:
+    raw = pd.DataFrame.from_records(
+        api_rows,
+        columns=["ID", "login", *COUNT_COLUMNS, *DURATION_COLUMNS]
+    )
+    problems: dict[str, pd.Series] = {}
+
+    ids = _text(raw["ID"])
+    digits = ids.str.fullmatch(r"[0-9]+").fillna(False).astype(bool)
+    agent_ids = _numbers(ids.where(digits))
+    problems["missing_id"] = ids.isna()
+    problems["bad_id"] = ids.notna() & ~digits
+    problems["agent_id_out_of_range"] = agent_ids > MAX_AGENT_ID
+
+    counts = {}
+    for column, name in COUNT_COLUMNS.items():
+        values = _text(raw[column])
+        # missing counts are 0, as the endpoint omits them on days off
+        numbers = _numbers(values)
+        problems[f"bad_{name}"] = values.notna() & ~np.isfinite(numbers)
+        problems[f"negative_{name}"] = numbers < 0
+        counts[name] = numbers.fillna(0)
+
+    durations = {}
+    for column, name in DURATION_COLUMNS.items():
+        values = _text(raw[column])
+        parts = values.str.extract(DURATION_FORMAT).astype(float)
+        seconds = parts[0] * 3600 + parts[1] * 60 + parts[2]
+        problems[f"bad_{name}"] = values.notna() & parts[0].isna()
+        problems[f"{name}_out_of_range"] = seconds > MAX_DURATION_SECONDS
+        durations[name] = values
+
+    reasons = pd.DataFrame(problems).astype(bool)
+    bad = reasons.any(axis=1)
+    # the last row of an agent wins, as it always has
+    reasons["duplicate_id"] = ~bad & agent_ids.where(~bad).duplicated(keep="last")
+    bad |= reasons["duplicate_id"]
+
+    good = ~bad
+    valid = pd.DataFrame({
+        "agent_id": agent_ids[good].astype("int64"),
+        "login": _nullable(_text(raw["login"])[good]),
+        **{name: values[good] for name, values in counts.items()},
+        **{name: _nullable(values[good]) for name, values in durations.items()},
+    })
+
+    flags = reasons.to_numpy()
+    rejected = {
+        int(i): list(reasons.columns[flags[i]])
+        for i in np.flatnonzero(bad.to_numpy())
+    }
+
+    for reason, count in reasons.sum().items():
+        if count:
+            etl_metrics.record(f"rejected_{reason}", int(count))
+
+    return Validation(valid=valid, rejected=rejected)
+
+
+def quarantine(db: Session, day: date, api_rows: list, rejected: dict[int, list[str]]) -> int:
+    """Replace the day's quarantined rows with ``rejected``."""
+    db.execute(
+        text("DELETE FROM etl_quarantine WHERE day = :day"),
+        {"day": day}
+    )
+    if not rejected:
+        return 0
+
+    rows = [(api_rows[i], reasons) for i, reasons in sorted(rejected.items())]
+
+    def field(row, key: str) -> str | None:
+        value = row.get(key) if isinstance(row, dict) else None
+        return None if value is None else str(value)
+
+    db.execute(
+        text("""
+            INSERT INTO etl_quarantine (day, agent_id, login, reasons, payload)
+            SELECT
+                :day,
+                v.agent_id,
+                v.login,
+                string_to_array(v.reasons, ','),
+                CAST(v.payload AS jsonb)
+            FROM unnest(
+                CAST(:agent_ids AS varchar[]),
+                CAST(:logins AS varchar[]),
+                CAST(:reasons AS varchar[]),
+                CAST(:payloads AS text[])
+            ) AS v(agent_id, login, reasons, payload)
+        """),
+        {
+            "day": day,
+            "agent_ids": [field(row, "ID") for row, _ in rows],
+            "logins": [field(row, "login") for row, _ in rows],
+            "reasons": [",".join(reasons) for _, reasons in rows],
+            "payloads": [json.dumps(row, ensure_ascii=False) for row, _ in rows],
+        }
+    )
+    return len(rows)
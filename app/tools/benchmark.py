@@ -0,0 +1,342 @@
+"""
+Benchmark suite for the ETL, the scoring functions and the dashboard API,
+on synthetic data (app.tools.synthetic) in a local scratch database.
+
+DATABASE_URL must point at a scratch database with the migrations
+applied; the suite truncates the operator tables between scenarios.
+
+    DATABASE_URL=postgresql://.../bench \\
+        python -m app.tools.benchmark --out bench/$(git rev-parse --short HEAD).json
+
+    python -m app.tools.benchmark --compare bench/base.json bench/head.json
+
+Scenarios:
+  ingest_*        days of one cycle through try_fetch_and_save
+  finalize_scores finalize_monthly_scores at each --sizes roster
+  snapshot_rank   snapshot_daily_rank at each --sizes roster
+  api_*           the dashboard_router endpoints over HTTP (uvicorn)
+"""
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+import requests
+from sqlalchemy import text
+
+from app.database import get_engine
+from app.services.etl_daily_metrics import try_fetch_and_save
+from app.services.pipeline import daterange
+from app.services.sources import resolve_cycle_for_date, resolve_monthly_cycle
+from app.tools.query_plans import cycle_bounds, previous_cycle, seed
+from app.tools.synthetic import SyntheticData
+
+RESET_SQL = text("""
+    TRUNCATE operators, archived_cycles, etl_runs, etl_quarantine,
+        group_cycle_stats
+    RESTART IDENTITY CASCADE
+""")
+
+API_PORT = 8765
+
+
+@dataclass
+class Result:
+    name: str
+    params: dict
+    samples_ms: list[float] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        s = sorted(self.samples_ms)
+        return {
+            "name": self.name,
+            "params": self.params,
+            "runs": len(s),
+            "median_ms": statistics.median(s),
+            "p95_ms": s[min(int(len(s) * 0.95), len(s) - 1)],
+            "min_ms": s[0],
+            "max_ms": s[-1],
+            "total_ms": sum(s),
+        }
+
+
+def timed(fn: Callable, *args, **kwargs) -> float:
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return (time.perf_counter() - started) * 1000
+
+
+def reset() -> None:
+    with get_engine().begin() as conn:
+        conn.execute(RESET_SQL)
+
+
+def bench_cycle() -> tuple[int, int]:
+    """The last closed cycle: every day of it is in the past."""
+    return previous_cycle(*resolve_monthly_cycle(date.today()))
+
+
+# ---------- ETL ----------
+def bench_ingest(operators: int, runs: int) -> list[Result]:
+    reset()
+    data = SyntheticData(operators=operators)
+    start, end = cycle_bounds(*bench_cycle())
+    days = list(daterange(start, end - timedelta(days=1)))
+    kpi_map = data.kpi_map(sorted({resolve_cycle_for_date(d) for d in days}))
+    sheet_map = data.sheet_map()
+    params = {"operators": operators}
+
+    def ingest(day: date) -> float:
+        return timed(
+            try_fetch_and_save,
+            day,
+            kpi_map,
+            resolve_cycle_for_date(day),
+            sheet_map,
+            fetch=data.fetch,
+        )
+
+    first = Result("ingest_day_first", params)
+    day = Result("ingest_day", params)
+    cycle = Result("ingest_cycle", params)
+    unchanged = Result("ingest_day_unchanged", params)
+
+    # first day creates the roster; later days only upsert metrics
+    first.samples_ms.append(ingest(days[0]))
+    day.samples_ms.extend(ingest(d) for d in days[1:])
+    cycle.samples_ms.append(sum(first.samples_ms + day.samples_ms))
+
+    # re-ingesting identical payloads must be cheap
+    unchanged.samples_ms.extend(ingest(d) for d in days[:runs])
+
+    return [first, day, cycle, unchanged]
+
+
+# ---------- scoring ----------
+def seed_roster(operators: int) -> None:
+    reset()
+    with get_engine().begin() as conn:
+        seed(conn, operators, [bench_cycle()])
+
+
+def bench_scoring(operators: int, runs: int) -> list[Result]:
+    year, month = bench_cycle()
+    _, end = cycle_bounds(year, month)
+    params = {"year": year, "month": month, "day": end - timedelta(days=1)}
+    result_params = {"operators": operators}
+
+    finalize = Result("finalize_scores", result_params)
+    snapshot = Result("snapshot_rank", result_params)
+
+    for _ in range(runs):
+        with get_engine().begin() as conn:
+            finalize.samples_ms.append(timed(
+                conn.execute,
+                text("SELECT finalize_monthly_scores(:year, :month)"),
+                params,
+            ))
+        with get_engine().begin() as conn:
+            snapshot.samples_ms.append(timed(
+                conn.execute,
+                text("SELECT snapshot_daily_rank(:year, :month, :day)"),
+                params,
+            ))
+
+    return [finalize, snapshot]
+
+
+# ---------- API ----------
+@contextmanager
+def api_server(port: int):
+    import uvicorn
+
+    from app.main import app
+
+    server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning")
+    )
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+def bench_api(operators: int, runs: int, port: int) -> list[Result]:
+    year, month = bench_cycle()
+    cycle = {"year": year, "month": month}
+
+    with get_engine().connect() as conn:
+        group, operator_uuid = conn.execute(text("""
+            SELECT o.group_name, o.id
+            FROM operators o
+            JOIN operator_monthly_metrics m ON m.operator_key = o.operator_key
+            WHERE m.year = :year AND m.month = :month AND m.rank = 1
+            LIMIT 1
+        """), cycle).one()
+
+    endpoints = {
+        "api_group_operators": f"/api/groups/{group}/operators",
+        "api_operator_profile": f"/api/groups/operators/{operator_uuid}/profile",
+        "api_top_operators": "/api/groups/top-operators",
+    }
+
+    results = []
+    with api_server(port) as base, requests.Session() as http:
+        for name, path in endpoints.items():
+            result = Result(name, {"operators": operators})
+
+            http.get(base + path, params=cycle).raise_for_status()  # warm up
+            for _ in range(runs):
+                started = time.perf_counter()
+                http.get(base + path, params=cycle).raise_for_status()
+                result.samples_ms.append((time.perf_counter() - started) * 1000)
+
+            results.append(result)
+
+    return results
+
+
+# ---------- report ----------
+def metadata(args: argparse.Namespace) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        commit = None
+
+    with get_engine().connect() as conn:
+        server = conn.execute(text("SHOW server_version")).scalar_one()
+
+    return {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "postgres": server,
+        "cycle": list(bench_cycle()),
+        "args": {
+            "sizes": args.sizes,
+            "ingest_operators": args.ingest_operators,
+            "runs": args.runs,
+        },
+    }
+
+
+def compare(before: dict, after: dict, threshold: float) -> int:
+    """Print median changes; returns the number of regressions."""
+    old = {r["name"] + json.dumps(r["params"], sort_keys=True): r
+           for r in before["results"]}
+    regressions = 0
+
+    print(f"{before['meta']['commit']} -> {after['meta']['commit']}")
+    for r in after["results"]:
+        key = r["name"] + json.dumps(r["params"], sort_keys=True)
+        base = old.get(key)
+        if not base:
+            print(f"new  {r['name']:24} {r['params']} {r['median_ms']:10.2f}ms")
+            continue
+
+        change = (r["median_ms"] - base["median_ms"]) / base["median_ms"]
+        flag = "SLOW" if change > threshold else "ok"
+        regressions += change > threshold
+        print(
+            f"{flag:4} {r['name']:24} {r['params']} "
+            f"{base['median_ms']:10.2f}ms -> {r['median_ms']:10.2f}ms "
+            f"{change * 100:+6.1f}%"
+        )
+
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="ETL / scoring / API benchmarks")
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--ingest-operators", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        choices=["ingest", "scoring", "api"],
+        default=["ingest", "scoring", "api"],
+    )
+    parser.add_argument(
+        "--allow-existing",
+        action="store_true",
+        help="truncate a database that already has operators",
+    )
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="median slowdown counted as a regression by --compare",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s | %(message)s")
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            return 1 if compare(json.load(f), json.load(g), args.threshold) else 0
+
+    with get_engine().connect() as conn:
+        existing = conn.execute(text("SELECT COUNT(*) FROM operators")).scalar_one()
+    if existing and not args.allow_existing:
+        print(f"operators has {existing} rows; use a scratch database")
+        return 2
+
+    results: list[Result] = []
+
+    if "ingest" in args.only:
+        print(f"ingest: {args.ingest_operators} operators")
+        results += bench_ingest(args.ingest_operators, args.runs)
+
+    for size in args.sizes:
+        if not {"scoring", "api"} & set(args.only):
+            break
+        print(f"seeding {size} operators")
+        seed_roster(size)
+        if "scoring" in args.only:
+            results += bench_scoring(size, args.runs)
+        if "api" in args.only:
+            results += bench_api(size, args.runs, args.port)
+
+    reset()
+
+    report = {
+        "meta": metadata(args),
+        "results": [r.as_dict() for r in results],
+    }
+
+    for r in report["results"]:
+        print(
+            f"{r['name']:24} {json.dumps(r['params']):24} "
+            f"median={r['median_ms']:9.2f}ms p95={r['p95_ms']:9.2f}ms runs={r['runs']}"
+        )
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,54 @@
+"""
+Measure the cold-start (import) time of the API in fresh interpreters and
+check that importing it does not create a database engine:
+
+    python -m app.tools.cold_start [--runs 10] [--module app.main]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+import app.database
+print(json.dumps({{"seconds": elapsed, "engine": app.database._engine is not None}}))
+"""
+
+
+def measure(module: str, runs: int) -> list[dict]:
+    results = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module)],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure API import time")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--module", default="app.main")
+    args = parser.parse_args()
+
+    results = measure(args.module, args.runs)
+    seconds = [r["seconds"] for r in results]
+
+    print(
+        f"{args.module}: runs={len(seconds)} "
+        f"min={min(seconds) * 1000:.1f}ms "
+        f"median={statistics.median(seconds) * 1000:.1f}ms "
+        f"max={max(seconds) * 1000:.1f}ms"
+    )
+
+    if any(r["engine"] for r in results):
+        print("importing created a database engine")
+        sys.exit(1)
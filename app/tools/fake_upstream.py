@@ -0,0 +1,146 @@
+"""
+Local stand-in for the upstream ``day_by`` metrics API, serving synthetic
+(app.tools.synthetic) or saved payloads with the same contract:
+
+- 200 ``{"data": [...]}`` for a day with data
+- 400 for a day that has no data yet (after --available-until)
+- 200 ``{"error": "..."}`` for --error-days
+- 200 ``{"data": []}`` for --empty-days
+
+plus injected latency and 500s. Point the ETL at it with
+METRICS_API_URL, and at the sheets it writes with SHEETS_DIR:
+
+    python -m app.tools.fake_upstream --operators 1000 --sheets-dir /tmp/sheets
+    METRICS_API_URL=http://127.0.0.1:8099/csv-to-json/day_by \\
+    SHEETS_DIR=/tmp/sheets \\
+        python -m app.services.etl_daily_metrics range 2025-11-20 2025-12-19
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from app.services.pipeline import Fetcher, payload_fetcher
+from app.tools.synthetic import SyntheticData, write_sheets
+
+DAY_BY_PATH = "/csv-to-json/day_by"
+
+
+@dataclass
+class Behaviour:
+    available_until: date = field(default_factory=lambda: date.today() - timedelta(days=1))
+    error_days: set[date] = field(default_factory=set)
+    empty_days: set[date] = field(default_factory=set)
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    failure_rate: float = 0
+
+
+def make_handler(fetch: Fetcher, behaviour: Behaviour):
+    rng = random.Random()
+    rng_lock = threading.Lock()
+
+    class DayByHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != DAY_BY_PATH:
+                return self.reply(404, {"error": "not found"})
+
+            with rng_lock:
+                delay = behaviour.latency_ms + rng.uniform(0, behaviour.jitter_ms)
+                fail = rng.random() < behaviour.failure_rate
+            time.sleep(delay / 1000)
+
+            if fail:
+                return self.reply(500, {"error": "injected failure"})
+
+            query = parse_qs(url.query)
+            try:
+                day = date(
+                    int(query["year"][0]),
+                    int(query["month"][0]),
+                    int(query["day"][0]),
+                )
+            except (KeyError, ValueError):
+                return self.reply(400, {"error": "year, month and day are required"})
+
+            if day > behaviour.available_until:
+                return self.reply(400, {"error": f"no data for {day}"})
+            if day in behaviour.error_days:
+                return self.reply(200, {"error": f"report for {day} failed"})
+            if day in behaviour.empty_days:
+                return self.reply(200, {"data": []})
+
+            rows = fetch(day)
+            if rows is None:
+                return self.reply(400, {"error": f"no data for {day}"})
+            return self.reply(200, {"data": rows})
+
+        def reply(self, status: int, payload: dict):
+            body = json.dumps(payload, ensure_ascii=False).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return DayByHandler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake day_by metrics API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--operators", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--payload-dir",
+        type=Path,
+        help="serve payloads saved by the ETL instead of synthetic ones",
+    )
+    parser.add_argument(
+        "--sheets-dir",
+        type=Path,
+        help="write matching operators / KPI sheets here (for SHEETS_DIR)",
+    )
+    parser.add_argument("--available-until", type=date.fromisoformat)
+    parser.add_argument("--error-days", type=date.fromisoformat, nargs="*", default=[])
+    parser.add_argument("--empty-days", type=date.fromisoformat, nargs="*", default=[])
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--failure-rate", type=float, default=0)
+    args = parser.parse_args()
+
+    data = SyntheticData(operators=args.operators, seed=args.seed)
+    if args.sheets_dir:
+        write_sheets(data, args.sheets_dir, cycles=list(range(1, 13)))
+
+    behaviour = Behaviour(
+        error_days=set(args.error_days),
+        empty_days=set(args.empty_days),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate,
+    )
+    if args.available_until:
+        behaviour.available_until = args.available_until
+
+    fetch = payload_fetcher(args.payload_dir) if args.payload_dir else data.fetch
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(fetch, behaviour))
+
+    print(f"serving http://{args.host}:{args.port}{DAY_BY_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
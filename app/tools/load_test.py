@@ -0,0 +1,215 @@
+"""
+Open-loop load generator for the dashboard endpoints: requests are
+started on a fixed schedule (--rps), whether or not earlier ones have
+returned, so a slow server shows up as latency instead of a lower rate.
+
+    python -m app.tools.load_test --base-url http://127.0.0.1:8000 \\
+        --year 2025 --month 12 --rps 50 --duration 60 [--out load.json]
+
+Reports p50/p95/p99 latency, error rate and achieved RPS per endpoint.
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import requests
+
+# relative share of each endpoint in the mix
+DEFAULT_MIX = {
+    "group_operators": 5,
+    "operator_profile": 3,
+    "top_operators": 2,
+}
+
+
+@dataclass
+class EndpointStats:
+    latencies_ms: list[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=dict)
+
+    def summary(self, duration: float) -> dict:
+        s = sorted(self.latencies_ms)
+        total = len(s)
+
+        def pct(p: float) -> float | None:
+            return s[min(int(total * p), total - 1)] if s else None
+
+        return {
+            "requests": total,
+            "rps": total / duration if duration else 0,
+            "errors": self.errors,
+            "error_rate": self.errors / total if total else 0,
+            "statuses": self.statuses,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "mean_ms": statistics.fmean(s) if s else None,
+        }
+
+
+def discover(base_url: str, year: int, month: int) -> tuple[list[str], list[str]]:
+    """Groups and operator uuids to spread the load over."""
+    r = requests.get(
+        f"{base_url}/api/groups/top-operators",
+        params={"year": year, "month": month},
+        timeout=30,
+    )
+    r.raise_for_status()
+
+    groups, operators = [], []
+    for group in r.json()["groups"]:
+        groups.append(group["group"])
+        operators += [o["operator_uuid"] for o in group["top_operators"]]
+
+    if not groups:
+        raise SystemExit(f"no ranked operators for {year}-{month}; load data first")
+    return groups, operators
+
+
+def run(
+    base_url: str,
+    year: int,
+    month: int,
+    rps: float,
+    duration: float,
+    mix: dict[str, int],
+    workers: int,
+    timeout: float
+) -> dict:
+    groups, operators = discover(base_url, year, month)
+    params = {"year": year, "month": month}
+
+    def url(endpoint: str) -> str:
+        if endpoint == "group_operators":
+            return f"{base_url}/api/groups/{random.choice(groups)}/operators"
+        if endpoint == "operator_profile":
+            return f"{base_url}/api/groups/operators/{random.choice(operators)}/profile"
+        return f"{base_url}/api/groups/top-operators"
+
+    stats = {name: EndpointStats() for name in mix}
+    lock = threading.Lock()
+    local = threading.local()
+
+    def call(endpoint: str) -> None:
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+
+        started = time.perf_counter()
+        status = 0
+        try:
+            status = local.session.get(url(endpoint), params=params, timeout=timeout).status_code
+        except requests.RequestException:
+            pass
+        elapsed = (time.perf_counter() - started) * 1000
+
+        with lock:
+            s = stats[endpoint]
+            s.latencies_ms.append(elapsed)
+            s.statuses[status] = s.statuses.get(status, 0) + 1
+            if not 200 <= status < 300:
+                s.errors += 1
+
+    names, weights = list(mix), list(mix.values())
+    interval = 1 / rps
+    started = time.perf_counter()
+    late = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        n = 0
+        while True:
+            due = started + n * interval
+            if due - started >= duration:
+                break
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -interval:
+                late += 1
+            pool.submit(call, random.choices(names, weights)[0])
+            n += 1
+
+    elapsed = time.perf_counter() - started
+    everything = EndpointStats()
+    for s in stats.values():
+        everything.latencies_ms += s.latencies_ms
+        everything.errors += s.errors
+        for status, count in s.statuses.items():
+            everything.statuses[status] = everything.statuses.get(status, 0) + count
+
+    return {
+        "target_rps": rps,
+        "duration": elapsed,
+        # requests the scheduler started more than one interval late:
+        # the client, not the server, was the bottleneck
+        "late_starts": late,
+        "total": everything.summary(elapsed),
+        "endpoints": {name: s.summary(elapsed) for name, s in stats.items()},
+    }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"target={report['target_rps']} rps  duration={report['duration']:.1f}s  "
+        f"late_starts={report['late_starts']}"
+    )
+    rows = [("total", report["total"])] + list(report["endpoints"].items())
+    for name, s in rows:
+        if not s["requests"]:
+            continue
+        print(
+            f"{name:18} n={s['requests']:6} rps={s['rps']:7.1f} "
+            f"p50={s['p50_ms']:8.1f}ms p95={s['p95_ms']:8.1f}ms "
+            f"p99={s['p99_ms']:8.1f}ms errors={s['error_rate'] * 100:5.2f}%"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Load-test the dashboard endpoints")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--year", type=int, required=True)
+    parser.add_argument("--month", type=int, required=True)
+    parser.add_argument("--rps", type=float, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=10)
+    parser.add_argument(
+        "--mix",
+        type=json.loads,
+        default=DEFAULT_MIX,
+        help=f"endpoint weights as JSON (default: {json.dumps(DEFAULT_MIX)})",
+    )
+    parser.add_argument("--out", help="write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    unknown = set(args.mix) - set(DEFAULT_MIX)
+    if unknown:
+        parser.error(f"unknown endpoints in --mix: {sorted(unknown)}")
+
+    report = run(
+        args.base_url.rstrip("/"),
+        args.year,
+        args.month,
+        args.rps,
+        args.duration,
+        args.mix,
+        args.workers,
+        args.timeout,
+    )
+    print_report(report)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if report["total"]["error_rate"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
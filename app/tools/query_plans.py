@@ -0,0 +1,310 @@
+"""
+Query-plan regression check for the dashboard and ETL hot queries.
+
+Seeds a realistic volume into a scratch database (inside a transaction
+that is rolled back at the end), runs EXPLAIN on every hot query and
+fails when a plan contains a forbidden node, e.g. a sequential scan.
+Run it before deploying a schema or query change:
+
+    python -m app.tools.query_plans --database-url postgresql://.../scratch
+
+The scratch database must have the migrations applied.
+"""
+import argparse
+import logging
+import sys
+from dataclasses import dataclass
+from datetime import date
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import TextClause
+
+from app.routers.dashboard_router import (
+    GROUP_STATS_SQL,
+    LEADERBOARD_SQL,
+    PROFILE_SQL,
+    RANK_GRAPH_SQL,
+    TOP_OPERATORS_SQL,
+)
+from app.routers.operators_router import SEARCH_SQL
+from app.services.trends import POINTS_SQL as TREND_POINTS_SQL
+from app.services.sources import ALLOWED_GROUPS, resolve_monthly_cycle
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PlanCheck:
+    name: str
+    sql: TextClause
+    forbid: tuple[str, ...] = ("Seq Scan",)
+
+
+# recalc_operator_monthly_metrics_daily: per-operator cycle reads
+RECALC_RANGE_SQL = text("""
+    SELECT COALESCE(SUM(call_count), 0)
+    FROM operator_metrics
+    WHERE operator_key = :operator_key
+      AND date >= :start_date
+      AND date <  :end_date
+""")
+
+# pipeline.resolve_operators
+AGENT_LOOKUP_SQL = text("""
+    SELECT agent_id, operator_key FROM operators WHERE agent_id = ANY(:ids)
+""")
+
+CHECKS = [
+    PlanCheck("leaderboard", LEADERBOARD_SQL),
+    PlanCheck("rank_graph", RANK_GRAPH_SQL),
+    PlanCheck("profile", PROFILE_SQL),
+    PlanCheck("top_operators", TOP_OPERATORS_SQL),
+    PlanCheck("group_stats", GROUP_STATS_SQL),
+    PlanCheck("operator_search", SEARCH_SQL),
+    PlanCheck("trend_points", TREND_POINTS_SQL),
+    PlanCheck("recalc_range", RECALC_RANGE_SQL),
+    PlanCheck("agent_lookup", AGENT_LOOKUP_SQL),
+]
+
+
+def cycle_bounds(year: int, month: int) -> tuple[date, date]:
+    """[start, end) dates of an operator_monthly_metrics cycle."""
+    if month == 1:
+        return date(year - 1, 12, 20), date(year, month, 20)
+    return date(year, month - 1, 20), date(year, month, 20)
+
+
+def previous_cycle(year: int, month: int) -> tuple[int, int]:
+    return (year - 1, 12) if month == 1 else (year, month - 1)
+
+
+def seed(conn: Connection, operators: int, cycles: list[tuple[int, int]]) -> None:
+    start, _ = cycle_bounds(*cycles[0])
+    _, end = cycle_bounds(*cycles[-1])
+
+    logger.info(
+        f"Seeding {operators} operators over {start}..{end} ({len(cycles)} cycles)"
+    )
+
+    # bulk load without the per-row monthly triggers; monthly rows are
+    # aggregated below in one statement instead
+    conn.execute(text("ALTER TABLE operator_metrics DISABLE TRIGGER USER"))
+
+    conn.execute(
+        text("""
+            INSERT INTO operators (operator_id, agent_id, full_name, group_name)
+            SELECT
+                (100000 + g)::text,
+                500000 + g,
+                'Operator ' || g,
+                (CAST(:groups AS varchar[]))[1 + g % cardinality(CAST(:groups AS varchar[]))]
+            FROM generate_series(1, :operators) g
+        """),
+        {"operators": operators, "groups": sorted(ALLOWED_GROUPS)}
+    )
+
+    conn.execute(
+        text("""
+            INSERT INTO operator_metrics (
+                operator_key, date, busy_duration, call_count,
+                distributed_call_count, full_duration, hold_duration,
+                idle_duration, lock_duration, kpi
+            )
+            SELECT
+                o.operator_key,
+                d::date,
+                make_interval(secs => (600 + random() * 20000)::int)::text,
+                (random() * 150)::int,
+                (random() * 160)::int,
+                CASE
+                    WHEN random() < 0.1 THEN '00:00:00'
+                    ELSE make_interval(secs => 28800)::text
+                END,
+                make_interval(secs => (random() * 1800)::int)::text,
+                make_interval(secs => (random() * 3600)::int)::text,
+                make_interval(secs => (random() * 1800)::int)::text,
+                CASE WHEN random() < 0.7 THEN round((random() * 100)::numeric, 1) END
+            FROM operators o
+            CROSS JOIN generate_series(
+                CAST(:start AS date),
+                CAST(:end AS date) - 1,
+                interval '1 day'
+            ) d
+        """),
+        {"start": start, "end": end}
+    )
+
+    conn.execute(text("ALTER TABLE operator_metrics ENABLE TRIGGER USER"))
+
+    conn.execute(text("""
+        INSERT INTO operator_monthly_metrics (
+            operator_key, year, month, call_count, avg_busy_per_call, kpi
+        )
+        SELECT
+            m.operator_key,
+            c.year,
+            c.month,
+            SUM(m.call_count),
+            COALESCE(AVG(
+                EXTRACT(EPOCH FROM m.busy_duration::interval) / m.call_count
+            ) FILTER (WHERE m.call_count > 0), 0),
+            MAX(m.kpi)
+        FROM operator_metrics m
+        CROSS JOIN LATERAL resolve_cycle(m.date) c
+        GROUP BY m.operator_key, c.year, c.month
+    """))
+
+    conn.execute(text("""
+        INSERT INTO operator_latest_metrics (
+            operator_key, date, call_count, avg_busy_seconds, kpi
+        )
+        SELECT DISTINCT ON (m.operator_key)
+            m.operator_key,
+            m.date,
+            m.call_count,
+            CASE
+                WHEN m.call_count > 0 THEN
+                    EXTRACT(EPOCH FROM m.busy_duration::interval) / m.call_count
+                ELSE 0
+            END,
+            m.kpi
+        FROM operator_metrics m
+        ORDER BY m.operator_key, m.date DESC
+    """))
+
+    conn.execute(text("""
+        INSERT INTO bonus_distributions (
+            operator_key, year, month, kie, active_participation, monitoring
+        )
+        SELECT
+            operator_key, year, month,
+            (random() * 100)::int, (random() * 100)::int, (random() * 100)::int
+        FROM operator_monthly_metrics
+    """))
+
+    for year, month in cycles:
+        params = {"year": year, "month": month}
+        conn.execute(text("SELECT finalize_monthly_scores(:year, :month)"), params)
+        conn.execute(text("SELECT rebuild_daily_rank(:year, :month)"), params)
+
+    conn.execute(text("ANALYZE"))
+
+
+def plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+def explain(conn: Connection, sql: TextClause, params: dict) -> dict:
+    row = conn.execute(
+        text("EXPLAIN (FORMAT JSON) " + sql.text),
+        params
+    ).scalar_one()
+    return row[0]["Plan"]
+
+
+def describe(node: dict) -> str:
+    relation = node.get("Relation Name")
+    index = node.get("Index Name")
+    return " ".join(
+        part for part in (
+            node["Node Type"],
+            f"on {relation}" if relation else "",
+            f"using {index}" if index else "",
+        ) if part
+    )
+
+
+def run_checks(conn: Connection, params: dict, show_plans: bool = False) -> list[str]:
+    failures = []
+
+    for check in CHECKS:
+        plan = explain(conn, check.sql, params)
+        nodes = list(plan_nodes(plan))
+        bad = [n for n in nodes if n["Node Type"] in check.forbid]
+
+        status = "FAIL" if bad else "ok"
+        print(f"{status:4} {check.name:18} {' -> '.join(describe(n) for n in nodes)}")
+
+        if show_plans:
+            for line in conn.execute(
+                text("EXPLAIN " + check.sql.text), params
+            ).scalars():
+                print(f"     {line}")
+
+        if bad:
+            failures.append(
+                f"{check.name}: " + ", ".join(describe(n) for n in bad)
+            )
+
+    return failures
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url", required=True, help="scratch database")
+    parser.add_argument("--operators", type=int, default=3000)
+    parser.add_argument("--cycles", type=int, default=3)
+    parser.add_argument("--show-plans", action="store_true")
+    parser.add_argument(
+        "--allow-existing",
+        action="store_true",
+        help="seed on top of existing rows (still rolled back)",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(message)s")
+
+    cycles = [resolve_monthly_cycle(date.today())]
+    while len(cycles) < args.cycles:
+        cycles.insert(0, previous_cycle(*cycles[0]))
+
+    engine = create_engine(args.database_url)
+
+    with engine.connect() as conn:
+        trans = conn.begin()
+        try:
+            existing = conn.execute(text("SELECT COUNT(*) FROM operators")).scalar_one()
+            if existing and not args.allow_existing:
+                print(f"operators has {existing} rows; use a scratch database")
+                return 2
+
+            seed(conn, args.operators, cycles)
+
+            year, month = cycles[-1]
+            start, end = cycle_bounds(year, month)
+            operator_uuid, operator_key, agent_id = conn.execute(text(
+                "SELECT id, operator_key, agent_id FROM operators "
+                "ORDER BY operator_id LIMIT 1"
+            )).one()
+
+            params = {
+                "year": year,
+                "month": month,
+                "group": sorted(ALLOWED_GROUPS)[0],
+                "operator_uuid": operator_uuid,
+                "operator_key": operator_key,
+                "operator_keys": [operator_key],
+                "start_date": start,
+                "end_date": end,
+                "ids": [agent_id, agent_id + 1, agent_id + 2],
+                "key": "operatr 12",
+                "years": [y for y, _ in cycles],
+                "months": [m for _, m in cycles],
+                "limit": 20,
+            }
+
+            failures = run_checks(conn, params, args.show_plans)
+        finally:
+            trans.rollback()
+
+    for failure in failures:
+        print(f"plan regression | {failure}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
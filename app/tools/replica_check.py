@@ -0,0 +1,62 @@
+"""
+Check read routing against a primary + replica pair
+(see docker-compose.replica.yml): publishes a new data version on the
+primary and reports which engine serves dashboard reads until the
+replica has replayed it.
+
+    python -m app.tools.replica_check [--timeout 10]
+"""
+import argparse
+import sys
+import time
+
+from sqlalchemy import text
+
+from app.database import ReadSessionLocal, SessionLocal, get_engine, get_read_engine
+from app.utils import data_version
+
+
+def served_by(db) -> str:
+    return "primary" if db.get_bind() is get_engine() else "replica"
+
+
+def main(timeout: float) -> int:
+    if get_read_engine() is get_engine():
+        print("DATABASE_READ_URL is not set; all reads use the primary")
+        return 1
+
+    db = SessionLocal()
+    try:
+        version = data_version.bump(db)
+        db.commit()
+    finally:
+        db.close()
+    data_version.announce(version)
+    print(f"published data version {version}")
+
+    started = time.monotonic()
+    while time.monotonic() - started < timeout:
+        db = ReadSessionLocal()
+        try:
+            where = served_by(db)
+            seen = db.execute(text("SELECT version FROM data_version")).scalar()
+        finally:
+            db.close()
+
+        elapsed = (time.monotonic() - started) * 1000
+        print(f"{elapsed:8.1f}ms  read served by {where} (version {seen})")
+
+        if where == "replica":
+            return 0 if seen >= version else 1
+        time.sleep(0.05)
+
+    print(f"replica did not catch up within {timeout}s")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check read-replica routing")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+
+    sys.exit(main(args.timeout))
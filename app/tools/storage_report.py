@@ -0,0 +1,199 @@
+"""
+Table/index sizes and join timings of the operator-keyed fact tables, for
+comparing a database before and after a key change (e.g. migration 008):
+
+    python -m app.tools.storage_report --database-url ... --out before.json
+    python -m app.migrate
+    python -m app.tools.storage_report --database-url ... --out after.json
+    python -m app.tools.storage_report --compare before.json after.json
+
+The join queries follow the schema they find (operator_uuid or
+operator_key), so the same command works on both sides of the migration.
+"""
+import argparse
+import json
+import statistics
+import sys
+from datetime import date
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+
+from app.services.sources import resolve_monthly_cycle
+from app.tools.query_plans import cycle_bounds
+
+FACT_TABLES = (
+    "operator_metrics",
+    "operator_monthly_metrics",
+    "operator_daily_rank",
+    "bonus_distributions",
+    "operator_metrics_archive",
+)
+
+SIZES_SQL = text("""
+    SELECT
+        c.relname AS table_name,
+        c.reltuples::bigint AS rows,
+        pg_table_size(c.oid) AS table_bytes,
+        pg_indexes_size(c.oid) AS index_bytes,
+        COALESCE(
+            jsonb_object_agg(i.relname, pg_relation_size(i.oid))
+                FILTER (WHERE i.oid IS NOT NULL),
+            '{}'
+        ) AS indexes
+    FROM pg_class c
+    LEFT JOIN pg_index x ON x.indrelid = c.oid
+    LEFT JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE c.relname = ANY(:tables)
+      AND c.relkind = 'r'
+    GROUP BY c.oid, c.relname
+    ORDER BY c.relname
+""")
+
+# {key} is the fact-table column, {ref} the operators column it references
+JOINS = {
+    "cycle_by_group": """
+        SELECT o.group_name, SUM(m.call_count)
+        FROM operator_metrics m
+        JOIN operators o ON o.{ref} = m.{key}
+        WHERE m.date >= :start_date AND m.date < :end_date
+        GROUP BY o.group_name
+    """,
+    "rank_history": """
+        SELECT d.{key}, COUNT(*)
+        FROM operator_daily_rank d
+        JOIN operator_metrics m
+          ON m.{key} = d.{key}
+         AND m.date = d.date
+        WHERE d.year = :year AND d.month = :month
+        GROUP BY d.{key}
+    """,
+    "profile_bonus": """
+        SELECT COUNT(*)
+        FROM operators o
+        JOIN operator_monthly_metrics m ON m.{key} = o.{ref}
+        LEFT JOIN bonus_distributions b
+          ON b.{key} = o.{ref}
+         AND b.year = m.year
+         AND b.month = m.month
+        WHERE m.year = :year AND m.month = :month
+    """,
+}
+
+
+def key_columns(conn: Connection) -> tuple[str, str]:
+    has_key = conn.execute(text("""
+        SELECT EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'operator_metrics'
+              AND column_name = 'operator_key'
+        )
+    """)).scalar_one()
+    return ("operator_key", "operator_key") if has_key else ("operator_uuid", "id")
+
+
+def execution_ms(conn: Connection, sql: str, params: dict) -> float:
+    plan = conn.execute(
+        text("EXPLAIN (ANALYZE, FORMAT JSON) " + sql), params
+    ).scalar_one()
+    return plan[0]["Execution Time"]
+
+
+def report(conn: Connection, year: int, month: int, runs: int) -> dict:
+    key, ref = key_columns(conn)
+    start, end = cycle_bounds(year, month)
+    params = {"year": year, "month": month, "start_date": start, "end_date": end}
+
+    sizes = {
+        r["table_name"]: {
+            "rows": r["rows"],
+            "table_bytes": r["table_bytes"],
+            "index_bytes": r["index_bytes"],
+            "indexes": r["indexes"],
+        }
+        for r in conn.execute(SIZES_SQL, {"tables": list(FACT_TABLES)}).mappings()
+    }
+
+    joins = {}
+    for name, template in JOINS.items():
+        sql = template.format(key=key, ref=ref)
+        execution_ms(conn, sql, params)  # warm the cache
+        timings = [execution_ms(conn, sql, params) for _ in range(runs)]
+        joins[name] = {
+            "median_ms": statistics.median(timings),
+            "min_ms": min(timings),
+        }
+
+    return {
+        "key": key,
+        "cycle": [year, month],
+        "tables": sizes,
+        "joins": joins,
+    }
+
+
+def compare(before: dict, after: dict) -> None:
+    def pct(a: float, b: float) -> str:
+        return f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+
+    print(f"keys: {before['key']} -> {after['key']}")
+
+    for table in FACT_TABLES:
+        a, b = before["tables"].get(table), after["tables"].get(table)
+        if not a or not b:
+            continue
+        for field in ("table_bytes", "index_bytes"):
+            print(
+                f"{table:26} {field:12} "
+                f"{a[field]:>12,} -> {b[field]:>12,}  {pct(a[field], b[field])}"
+            )
+
+    for name in JOINS:
+        a, b = before["joins"][name], after["joins"][name]
+        print(
+            f"{name:26} {'median_ms':12} "
+            f"{a['median_ms']:>12.2f} -> {b['median_ms']:>12.2f}  "
+            f"{pct(a['median_ms'], b['median_ms'])}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--database-url")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--out", help="write the report to this JSON file")
+    parser.add_argument(
+        "--cycle",
+        nargs=2,
+        type=int,
+        metavar=("YEAR", "MONTH"),
+        help="cycle to join over (default: the current one)",
+    )
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            compare(json.load(f), json.load(g))
+        return 0
+
+    if not args.database_url:
+        parser.error("--database-url is required unless --compare is given")
+
+    year, month = args.cycle or resolve_monthly_cycle(date.today())
+
+    engine = create_engine(args.database_url)
+    with engine.connect() as conn:
+        result = report(conn, year, month, args.runs)
+        conn.rollback()
+
+    output = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Synthetic upstream data: ``day_by`` payloads and the Operators / KPI sheet
+grids for a configurable roster. Output is deterministic for a given seed,
+so re-generating a day yields the same payload (and the same content
+hashes).
+
+    python -m app.tools.synthetic --operators 1000 \\
+        --start 2025-11-20 --end 2025-12-19 --out /tmp/synthetic
+
+writes ``payloads/YYYY-MM-DD.json`` (replayable with ``etl replay``),
+``operators_sheet.json`` and ``kpi_sheet.json`` (usable as SHEETS_DIR).
+"""
+import argparse
+import json
+import random
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+
+from app.services.pipeline import daterange, save_payload
+from app.services.sources import (
+    ALLOWED_GROUPS,
+    KPI_SHEET_FILE,
+    OPERATORS_SHEET_FILE,
+    parse_kpi_sheet,
+    parse_operator_sheet,
+    resolve_cycle_for_date,
+)
+
+FIRST_LOGIN = 100_000
+FIRST_AGENT_ID = 500_000
+
+FIRST_NAMES = (
+    "Азиз", "Дилноза", "Шахзод", "Мадина", "Жасур", "Нилуфар", "Бобур",
+    "Гулноза", "Sardor", "Malika", "Otabek", "Kamola", "Rustam", "Zarina",
+)
+LAST_NAMES = (
+    "Каримов", "Юсупова", "Рахимов", "Абдуллаева", "Тошпулатов", "Исмоилова",
+    "Nazarov", "Saidova", "Ergashev", "Xolmatova", "Qodirov", "Sobirova",
+)
+
+
+@dataclass
+class SyntheticOperator:
+    login: str
+    agent_id: int
+    full_name: str
+    group_name: str
+    avatar_url: str | None
+    # relative performance, stable across days so ranks are plausible
+    skill: float
+
+
+def hhmmss(seconds: float) -> str:
+    seconds = max(int(seconds), 0)
+    h, rest = divmod(seconds, 3600)
+    m, s = divmod(rest, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}"
+
+
+@dataclass
+class SyntheticData:
+    operators: int = 1000
+    groups: list[str] = field(default_factory=lambda: sorted(ALLOWED_GROUPS))
+    seed: int = 0
+
+    # share of each day's rows for operators absent from the sheet
+    unknown_share: float = 0.01
+    # share of rows with a missing / non-numeric ID (quarantined by parse_rows)
+    malformed_share: float = 0.002
+    # share of listed operators with a day off (zero counters)
+    day_off_share: float = 0.1
+
+    roster: list[SyntheticOperator] = field(init=False)
+
+    def __post_init__(self):
+        rng = random.Random(self.seed)
+        self.roster = [
+            SyntheticOperator(
+                login=str(FIRST_LOGIN + i),
+                agent_id=FIRST_AGENT_ID + i,
+                full_name=f"{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}",
+                group_name=self.groups[i % len(self.groups)],
+                avatar_url=(
+                    f"https://avatars.example.com/{FIRST_LOGIN + i}.jpg"
+                    if rng.random() < 0.8 else None
+                ),
+                skill=rng.lognormvariate(0, 0.3),
+            )
+            for i in range(self.operators)
+        ]
+
+    # ---------- upstream API ----------
+    def day_payload(self, day: date) -> list[dict]:
+        """Rows as the ``day_by`` endpoint returns them for ``day``."""
+        rng = random.Random(f"{self.seed}:{day.isoformat()}")
+        rows = []
+
+        for op in self.roster:
+            if rng.random() < self.day_off_share:
+                rows.append(self._row(rng, op.agent_id, op.login, 0, 0, 0))
+                continue
+
+            calls = max(int(rng.gauss(80, 25) * op.skill), 0)
+            busy = calls * rng.uniform(90, 240) / op.skill
+            rows.append(self._row(rng, op.agent_id, op.login, calls, busy, 8 * 3600))
+
+        unknown = int(self.operators * self.unknown_share)
+        for i in range(unknown):
+            agent_id = FIRST_AGENT_ID + self.operators + i
+            calls = int(rng.uniform(0, 120))
+            rows.append(
+                self._row(rng, agent_id, str(FIRST_LOGIN + self.operators + i),
+                          calls, calls * 150, 8 * 3600)
+            )
+
+        for _ in range(int(len(rows) * self.malformed_share)):
+            bad = dict(rng.choice(rows))
+            bad["ID"] = rng.choice(["", None, "n/a"])
+            rows.append(bad)
+
+        rng.shuffle(rows)
+        return rows
+
+    @staticmethod
+    def _row(
+        rng: random.Random,
+        agent_id: int,
+        login: str,
+        calls: int,
+        busy: float,
+        full: float
+    ) -> dict:
+        # a day off (full == 0) has no time of any kind
+        share = 1 if full else 0
+        return {
+            "ID": str(agent_id),
+            "login": login,
+            "BusyDuration": hhmmss(busy),
+            "CallCount": str(calls),
+            "DistributedCallCount": str(calls + share * rng.randint(0, 10)),
+            "FullDuration": hhmmss(full),
+            "HoldDuration": hhmmss(share * rng.uniform(0, 1800)),
+            "IdleDuration": hhmmss(share * rng.uniform(0, 3600)),
+            "LockDuration": hhmmss(share * rng.uniform(0, 1800)),
+        }
+
+    def fetch(self, day: date) -> list | None:
+        """pipeline.Fetcher over the synthetic payloads."""
+        return self.day_payload(day)
+
+    # ---------- sheets ----------
+    def operator_grid(self) -> list[list[str]]:
+        """The Operators worksheet as ``get_all_values()`` returns it."""
+        header = ["ФИО", "Login", "Group", "", "", "Avatar"]
+        return [header] + [
+            [f"👤 {op.full_name}", op.login, op.group_name, "", "",
+             op.avatar_url or ""]
+            for op in self.roster
+        ]
+
+    def kpi_grid(self, cycles: list[int]) -> list[list[str]]:
+        """The KPI worksheet; decimal commas like the real sheet."""
+        rng = random.Random(f"{self.seed}:kpi")
+        header = ["ФИО", "KPI", "Cycle"]
+        grid = [header]
+
+        for cycle in cycles:
+            for op in self.roster:
+                # not every operator has a KPI for every cycle
+                if rng.random() >= 0.9:
+                    continue
+                kpi = min(60 + 30 * op.skill * rng.uniform(0.8, 1.1), 100)
+                grid.append([
+                    f"{op.full_name} ({op.agent_id})",
+                    f"{kpi:.1f}".replace(".", ","),
+                    str(cycle),
+                ])
+
+        return grid
+
+    def sheet_map(self) -> dict:
+        return parse_operator_sheet(self.operator_grid())
+
+    def kpi_map(self, cycles: list[int]) -> dict:
+        return parse_kpi_sheet(self.kpi_grid(cycles))
+
+
+def write_sheets(data: SyntheticData, sheets_dir: Path, cycles: list[int]) -> None:
+    """The sheet grids as files, in the layout SHEETS_DIR expects."""
+    sheets_dir.mkdir(parents=True, exist_ok=True)
+    (sheets_dir / OPERATORS_SHEET_FILE).write_text(
+        json.dumps(data.operator_grid(), ensure_ascii=False)
+    )
+    (sheets_dir / KPI_SHEET_FILE).write_text(
+        json.dumps(data.kpi_grid(cycles), ensure_ascii=False)
+    )
+
+
+def write_dataset(data: SyntheticData, start: date, end: date, out: Path) -> None:
+    days = list(daterange(start, end))
+
+    for d in days:
+        save_payload(out / "payloads", d, data.day_payload(d))
+
+    write_sheets(data, out, sorted({resolve_cycle_for_date(d) for d in days}))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic upstream data")
+    parser.add_argument("--operators", type=int, default=1000)
+    parser.add_argument("--groups", nargs="+", default=sorted(ALLOWED_GROUPS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", type=date.fromisoformat, required=True)
+    parser.add_argument("--end", type=date.fromisoformat, required=True)
+    parser.add_argument("--out", type=Path, required=True)
+    args = parser.parse_args()
+
+    write_dataset(
+        SyntheticData(operators=args.operators, groups=args.groups, seed=args.seed),
+        args.start,
+        args.end,
+        args.out,
+    )
+    print(f"wrote {args.out}")
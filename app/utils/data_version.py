@@ -0,0 +1,63 @@
+import logging
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.cache.redis import redis_client
+
+REDIS_KEY = "top_operator:data_version"
+
+logger = logging.getLogger(__name__)
+
+# highest version this process has already seen on the replica
+_confirmed_version = 0
+
+
+def bump(db: Session) -> int:
+    """Bump the data version inside the caller's (primary) transaction."""
+    return db.execute(text("""
+        UPDATE data_version
+        SET version = version + 1,
+            published_at = now()
+        RETURNING version
+    """)).scalar_one()
+
+
+def announce(version: int | None) -> None:
+    """Tell readers about a committed version; call after commit."""
+    if not version:
+        return
+    try:
+        redis_client.set(REDIS_KEY, version)
+    except Exception:
+        logger.warning(f"Could not announce data version {version}", exc_info=True)
+
+
+def published_version() -> int | None:
+    """Latest announced version: 0 if none yet, None if Redis is unreachable."""
+    try:
+        value = redis_client.get(REDIS_KEY)
+    except Exception:
+        logger.warning("Could not read data version", exc_info=True)
+        return None
+    return int(value) if value else 0
+
+
+def replica_is_current(db: Session) -> bool:
+    """
+    Whether the replica behind ``db`` has replayed the latest announced
+    data version. Unknown (Redis down) counts as stale.
+    """
+    global _confirmed_version
+
+    expected = published_version()
+    if expected is None:
+        return False
+    if expected <= _confirmed_version:
+        return True
+
+    current = db.execute(text("SELECT version FROM data_version")).scalar() or 0
+    if current >= expected:
+        _confirmed_version = max(_confirmed_version, current)
+        return True
+
+    return False
@@ -0,0 +1,210 @@
+"""
+Opt-in sampling profiler with flamegraph-compatible ("folded stacks")
+output, for single API requests and whole ETL runs.
+
+A background thread samples the stacks of the profiled threads every
+``interval`` seconds; nothing is hooked into the interpreter, so the
+profiled code runs unchanged and nothing at all happens unless a
+profile is asked for.
+
+API: send ``X-Profile-Token: <PROFILE_TOKEN>`` (unset = disabled). The
+folded profile is written to PROFILE_DIR and named in the
+``X-Profile-File`` response header; with ``?profile=folded`` it replaces
+the response body instead.
+
+ETL: ``python -m app.services.etl_daily_metrics --profile run.folded ...``
+
+Render with ``flamegraph.pl run.folded > run.svg`` or speedscope.
+"""
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Callable
+from urllib.parse import parse_qs
+
+from starlette.routing import Match
+
+from app.config import get_settings
+
+DEFAULT_INTERVAL = 0.005
+
+TOKEN_HEADER = b"x-profile-token"
+
+logger = logging.getLogger(__name__)
+
+
+def frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def fold(frame: FrameType) -> str:
+    """Root-first ``a;b;c`` stack of ``frame``."""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def has_code(frame: FrameType, code: CodeType) -> bool:
+    while frame is not None:
+        if frame.f_code is code:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class SamplingProfiler:
+    """
+    Samples the threads for which ``keep(thread_id, frame)`` is true
+    (default: the thread that created the profiler).
+    """
+
+    def __init__(
+        self,
+        interval: float = DEFAULT_INTERVAL,
+        keep: Callable[[int, FrameType], bool] | None = None
+    ):
+        self.interval = interval
+        owner = threading.get_ident()
+        self.keep = keep or (lambda ident, frame: ident == owner)
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self.started = self.elapsed = 0.0
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def _run(self) -> None:
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for ident, frame in sys._current_frames().items():
+                if ident != me and self.keep(ident, frame):
+                    self.stacks[fold(frame)] += 1
+
+    def start(self) -> "SamplingProfiler":
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        return self
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def write(self, path: str | Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(self.folded())
+        logger.info(
+            f"Profile written | {path} | samples={self.samples} "
+            f"stacks={len(self.stacks)} elapsed={self.elapsed:.3f}s"
+        )
+        return path
+
+
+# ---------- API ----------
+def _idle(frame: FrameType) -> bool:
+    """Event loop waiting for I/O."""
+    return frame.f_code.co_filename.endswith("selectors.py")
+
+
+def _endpoint_code(app, scope) -> CodeType | None:
+    for route in app.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(getattr(route, "endpoint", None), "__code__", None)
+    return None
+
+
+class ProfilerMiddleware:
+    """
+    Pure ASGI middleware: requests without the token header only pay for
+    one header lookup.
+
+    Sync endpoints run in a worker thread, so a request is sampled on
+    every thread currently inside its endpoint function, plus the event
+    loop thread (routing, JSON encoding) while it is not idle. Concurrent
+    calls of the same endpoint on the same worker end up in the profile
+    too; profile on a quiet instance for clean numbers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        token = dict(scope["headers"]).get(TOKEN_HEADER)
+        if token is None:
+            return await self.app(scope, receive, send)
+
+        expected = get_settings().PROFILE_TOKEN
+        if not expected or not hmac.compare_digest(token, expected.encode()):
+            return await self.app(scope, receive, send)
+
+        loop_thread = threading.get_ident()
+        endpoint = _endpoint_code(scope["app"], scope)
+
+        def keep(ident: int, frame: FrameType) -> bool:
+            if ident == loop_thread:
+                return not _idle(frame)
+            return endpoint is not None and has_code(frame, endpoint)
+
+        inline = parse_qs(scope.get("query_string", b"").decode()).get("profile") == ["folded"]
+        path = Path(get_settings().PROFILE_DIR) / (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['path'].strip('/').replace('/', '_')}"
+            f"-{os.getpid()}-{time.perf_counter_ns()}.folded"
+        )
+        status = {}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if not inline:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-file", path.name.encode())
+                    ]
+            # inline mode drops the real response and sends the profile
+            if not inline:
+                await send(message)
+
+        with SamplingProfiler(keep=keep) as profiler:
+            await self.app(scope, receive, capture)
+
+        if not inline:
+            profiler.write(path)
+            return
+
+        content = profiler.folded().encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(content)).encode()),
+                (b"x-profile-status", str(status.get("code", 0)).encode()),
+                (b"x-profile-samples", str(profiler.samples).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": content})
@@ -0,0 +1,200 @@
+"""
+Per-request SQL instrumentation for the API.
+
+SQLAlchemy cursor events count the statements a request issues and time
+them; the HTTP middleware turns that into a ``Server-Timing`` header, a
+slow-statement log (SLOW_QUERY_MS) and per-route histograms that
+``/metrics`` exposes in Prometheus text format.
+
+Histograms are per process: with several uvicorn workers, each worker
+reports its own.
+"""
+import logging
+import re
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+from app.config import get_settings
+
+METRIC_PREFIX = "top_operator_http"
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestStats:
+    statements: int = 0
+    db_seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest_sql: str | None = None
+
+
+_request: ContextVar[RequestStats | None] = ContextVar("request_sql_stats", default=None)
+
+
+# ---------- SQL ----------
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """One-line statement with literals replaced by ``?``."""
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    return _SPACE.sub(" ", statement).strip()
+
+
+def parameter_shape(parameters) -> str:
+    """Names and types of the bound parameters, never their values."""
+    def shape(value) -> str:
+        if isinstance(value, (list, tuple)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if isinstance(parameters, dict):
+        return "{" + ", ".join(f"{k}: {shape(v)}" for k, v in parameters.items()) + "}"
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], dict):
+            return f"{len(parameters)} x {parameter_shape(parameters[0])}"
+        return "(" + ", ".join(shape(v) for v in parameters) + ")"
+    return type(parameters).__name__
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request.get() is not None:
+        conn.info.setdefault("request_query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request.get()
+    starts = conn.info.get("request_query_start")
+    if stats is None or not starts:
+        return
+
+    elapsed = time.perf_counter() - starts.pop()
+    stats.statements += 1
+    stats.db_seconds += elapsed
+
+    if elapsed > stats.slowest_seconds:
+        stats.slowest_seconds = elapsed
+        stats.slowest_sql = statement
+
+    if elapsed * 1000 >= get_settings().SLOW_QUERY_MS:
+        logger.warning(
+            f"Slow query | {elapsed * 1000:.1f}ms | {normalize_sql(statement)} "
+            f"| params={parameter_shape(parameters)}"
+        )
+
+
+# ---------- histograms ----------
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.total += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+FAMILIES = {
+    "request_duration_seconds": ("Request wall time", DURATION_BUCKETS),
+    "db_duration_seconds": ("Time spent in SQL per request", DURATION_BUCKETS),
+    "db_statements": ("SQL statements per request", STATEMENT_BUCKETS),
+}
+
+_histograms: dict[tuple[str, str, str], Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def observe(family: str, route: str, method: str, value: float) -> None:
+    key = (family, route, method)
+    with _histograms_lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram(FAMILIES[family][1])
+        histogram.observe(value)
+
+
+def render_prometheus() -> str:
+    lines = []
+
+    with _histograms_lock:
+        for family, (help_text, _) in FAMILIES.items():
+            metric = f"{METRIC_PREFIX}_{family}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+
+            for (name, route, method), h in sorted(_histograms.items()):
+                if name != family:
+                    continue
+                labels = f'route="{route}",method="{method}"'
+                for bound, count in zip(h.buckets, h.counts):
+                    lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {h.total}')
+                lines.append(f"{metric}_sum{{{labels}}} {h.sum}")
+                lines.append(f"{metric}_count{{{labels}}} {h.total}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ---------- middleware ----------
+def route_template(request: Request) -> str:
+    """The matched route's path template, so histograms don't explode per id."""
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+async def sql_timing_middleware(request: Request, call_next):
+    stats = RequestStats()
+    token = _request.set(stats)
+    started = time.perf_counter()
+
+    try:
+        response = await call_next(request)
+    finally:
+        _request.reset(token)
+
+    elapsed = time.perf_counter() - started
+    route = route_template(request)
+
+    response.headers["Server-Timing"] = (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} queries", '
+        f"db-max;dur={stats.slowest_seconds * 1000:.1f}, "
+        f"total;dur={elapsed * 1000:.1f}"
+    )
+
+    if not route.startswith("/metrics"):
+        observe("request_duration_seconds", route, request.method, elapsed)
+        observe("db_duration_seconds", route, request.method, stats.db_seconds)
+        observe("db_statements", route, request.method, stats.statements)
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            f"{request.method} {route} | {elapsed * 1000:.1f}ms | "
+            f"queries={stats.statements} db={stats.db_seconds * 1000:.1f}ms "
+            f"slowest={stats.slowest_seconds * 1000:.1f}ms "
+            f"{normalize_sql(stats.slowest_sql) if stats.slowest_sql else ''}"
+        )
+    return response
@@ -0,0 +1,178 @@
+-- Rebuilds operator_daily_rank for a whole cycle in one pass.
+-- Every day of the cycle is ranked on the metrics accumulated up to that
+-- day, with the same normalisation and weights as finalize_monthly_scores.
+CREATE OR REPLACE FUNCTION rebuild_daily_rank(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start_date DATE;
+    v_end_date   DATE;
+    v_rows       INT;
+BEGIN
+
+    IF p_month = 1 THEN
+        v_start_date := make_date(p_year - 1, 12, 20);
+    ELSE
+        v_start_date := make_date(p_year, p_month - 1, 20);
+    END IF;
+
+    v_end_date := make_date(p_year, p_month, 20);
+
+    WITH daily AS (
+        SELECT
+            operator_uuid,
+            date,
+            call_count,
+            CASE
+                WHEN call_count > 0 THEN
+                    EXTRACT(EPOCH FROM busy_duration::interval) / call_count
+            END AS avg_busy,
+            kpi
+        FROM operator_metrics
+        WHERE date >= v_start_date
+          AND date <  v_end_date
+    ),
+
+    days AS (
+        SELECT DISTINCT date
+        FROM daily
+    ),
+
+    first_seen AS (
+        SELECT
+            operator_uuid,
+            MIN(date) AS first_date
+        FROM daily
+        GROUP BY operator_uuid
+    ),
+
+    -- one row per operator per day since the operator's first day in the
+    -- cycle, so days without metrics still carry the cumulative values
+    grid AS (
+        SELECT
+            f.operator_uuid,
+            o.group_name,
+            d.date,
+            x.call_count,
+            x.avg_busy,
+            x.kpi
+        FROM first_seen f
+        JOIN operators o ON o.id = f.operator_uuid
+        JOIN days d ON d.date >= f.first_date
+        LEFT JOIN daily x
+          ON x.operator_uuid = f.operator_uuid
+         AND x.date = d.date
+    ),
+
+    cumulative AS (
+        SELECT
+            operator_uuid,
+            group_name,
+            date,
+            kpi,
+
+            ROUND(SUM(COALESCE(call_count, 0)) OVER w)::INT AS call_count,
+            AVG(avg_busy) OVER w                            AS avg_busy,
+            COUNT(kpi) OVER w                               AS kpi_grp
+        FROM grid
+        WINDOW w AS (PARTITION BY operator_uuid ORDER BY date)
+    ),
+
+    as_of AS (
+        SELECT
+            operator_uuid,
+            group_name,
+            date,
+            call_count,
+            COALESCE(avg_busy, 0) AS avg_busy_per_call,
+
+            -- latest non-null KPI up to this day
+            COALESCE(FIRST_VALUE(kpi) OVER (
+                PARTITION BY operator_uuid, kpi_grp
+                ORDER BY date
+            ), 0) AS kpi
+        FROM cumulative
+    ),
+
+    stats AS (
+        SELECT
+            *,
+            MIN(call_count) OVER g AS min_call,
+            MAX(call_count) OVER g AS max_call,
+
+            MIN(kpi) OVER g AS min_kpi,
+            MAX(kpi) OVER g AS max_kpi,
+
+            MIN(avg_busy_per_call) OVER g AS min_avg,
+            MAX(avg_busy_per_call) OVER g AS max_avg
+        FROM as_of
+        WINDOW g AS (PARTITION BY group_name, date)
+    ),
+
+    scored AS (
+        SELECT
+            operator_uuid,
+            group_name,
+            date,
+            (0.5 * CASE
+                    WHEN max_call = min_call THEN 0
+                    ELSE (call_count - min_call)::FLOAT / (max_call - min_call)
+                END
+           + 0.1 * CASE
+                    WHEN max_kpi = min_kpi THEN 0
+                    ELSE (kpi - min_kpi)::FLOAT / (max_kpi - min_kpi)
+                END
+           + 0.4 * CASE
+                    WHEN max_avg = min_avg THEN 0
+                    ELSE (max_avg - avg_busy_per_call)::FLOAT / (max_avg - min_avg)
+                END) AS total_score
+        FROM stats
+    ),
+
+    ranked AS (
+        SELECT
+            operator_uuid,
+            date,
+            DENSE_RANK() OVER (
+                PARTITION BY group_name, date
+                ORDER BY total_score DESC
+            ) AS rank
+        FROM scored
+    )
+
+    INSERT INTO operator_daily_rank (
+        operator_uuid,
+        year,
+        month,
+        date,
+        rank
+    )
+    SELECT
+        operator_uuid,
+        p_year,
+        p_month,
+        date,
+        rank
+    FROM ranked
+    ON CONFLICT (operator_uuid, date)
+    DO UPDATE SET
+        year  = EXCLUDED.year,
+        month = EXCLUDED.month,
+        rank  = EXCLUDED.rank,
+        created_at = now();
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    -- rows of this cycle that the rebuild did not touch are stale
+    DELETE FROM operator_daily_rank
+    WHERE year = p_year
+      AND month = p_month
+      AND created_at < now();
+
+    RETURN v_rows;
+END;
+$$;
@@ -0,0 +1,5 @@
+-- Hash of a row's upstream content, computed by the ETL. Upserts only
+-- touch rows whose hash changed, so re-ingesting an unchanged day writes
+-- nothing and fires no triggers.
+ALTER TABLE operator_metrics
+    ADD COLUMN IF NOT EXISTS content_hash VARCHAR(32);
@@ -0,0 +1,71 @@
+-- Indexes for the dashboard queries (app/routers/dashboard_router.py),
+-- the ETL lookups and the PL/pgSQL functions. Covering (INCLUDE) columns
+-- let the hot lookups run as index-only scans.
+
+
+-- operators
+-- ETL resolves operators by agent_id and by login (operator_id).
+CREATE UNIQUE INDEX IF NOT EXISTS uq_operators_operator_id
+ON operators (operator_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_operators_agent_id
+ON operators (agent_id);
+
+-- leaderboard: group filter
+CREATE INDEX IF NOT EXISTS idx_operators_group_name
+ON operators (group_name)
+INCLUDE (full_name, avatar_url);
+
+
+-- operator_metrics
+-- The unique key also serves the profile's "yesterday" lookup (backward
+-- scan for date DESC), the graph join on full_duration and the per-cycle
+-- reads of recalc_operator_monthly_metrics_daily, all index-only.
+ALTER TABLE operator_metrics
+    DROP CONSTRAINT uq_operator_metrics_operator_date,
+    ADD CONSTRAINT uq_operator_metrics_operator_date
+        UNIQUE (operator_uuid, date)
+        INCLUDE (call_count, busy_duration, kpi, full_duration);
+
+-- prefix of the unique key above
+DROP INDEX IF EXISTS idx_operator_metrics_operator_uuid;
+
+-- per-day and per-cycle scans: rebuild_daily_rank, KPI sync, ETL
+CREATE INDEX IF NOT EXISTS idx_operator_metrics_date
+ON operator_metrics (date);
+
+
+-- operator_monthly_metrics
+-- /top-operators (rank <= 3 over all groups), leaderboard, finalize and
+-- snapshot all filter one cycle by rank.
+CREATE INDEX IF NOT EXISTS idx_operator_monthly_metrics_cycle_rank
+ON operator_monthly_metrics (year, month, rank)
+INCLUDE (operator_uuid, score, stars, call_count, kpi, avg_busy_per_call);
+
+-- leaderboard's cumulative score subquery over earlier months
+ALTER TABLE operator_monthly_metrics
+    DROP CONSTRAINT IF EXISTS uq_operator_month,
+    DROP CONSTRAINT IF EXISTS uq_operator_monthly_metrics_operator_year_month,
+    ADD CONSTRAINT uq_operator_monthly_metrics_operator_year_month
+        UNIQUE (operator_uuid, year, month)
+        INCLUDE (score);
+
+
+-- operator_daily_rank
+-- rank graphs
+DROP INDEX IF EXISTS idx_operator_daily_rank_lookup;
+
+CREATE INDEX idx_operator_daily_rank_lookup
+ON operator_daily_rank (operator_uuid, year, month, date)
+INCLUDE (rank);
+
+-- rebuild_daily_rank: whole-cycle upsert and stale-row cleanup
+CREATE INDEX IF NOT EXISTS idx_operator_daily_rank_cycle
+ON operator_daily_rank (year, month);
+
+
+-- bonus_distributions
+-- profile's LEFT JOIN
+CREATE INDEX IF NOT EXISTS idx_bonus_distributions_operator_cycle
+ON bonus_distributions (operator_uuid, year, month)
+INCLUDE (kie, active_participation, monitoring);
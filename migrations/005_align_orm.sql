@@ -0,0 +1,3 @@
+-- Columns the ORM models declare but the original SQL schema lacked.
+ALTER TABLE bonus_distributions
+    ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT now();
@@ -0,0 +1,12 @@
+-- Monotonic version of the published dashboard data. The ETL bumps it in
+-- the same transaction as its writes, so a replica that has replayed
+-- version N also has the data of version N.
+CREATE TABLE IF NOT EXISTS data_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0,
+    published_at TIMESTAMP DEFAULT now()
+);
+
+INSERT INTO data_version (id, version)
+VALUES (TRUE, 0)
+ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,270 @@
+-- Retention for closed cycles: daily operator_metrics and
+-- operator_daily_rank rows are rolled up into one compressed row per
+-- operator and cycle, and removed from the live tables.
+
+CREATE TABLE IF NOT EXISTS operator_metrics_archive (
+    operator_uuid UUID NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+
+    -- one element per day: the operator_metrics columns plus "rank"
+    days JSONB NOT NULL,
+
+    archived_at TIMESTAMP DEFAULT now(),
+
+    PRIMARY KEY (operator_uuid, year, month),
+
+    CONSTRAINT fk_operator_metrics_archive_operator
+        FOREIGN KEY (operator_uuid)
+        REFERENCES operators(id)
+        ON DELETE CASCADE
+);
+
+-- a cycle's days are well above the TOAST threshold
+ALTER TABLE operator_metrics_archive
+    ALTER COLUMN days SET COMPRESSION lz4;
+
+CREATE TABLE IF NOT EXISTS archived_cycles (
+    year INT NOT NULL,
+    month INT NOT NULL,
+    operators INT NOT NULL,
+    metric_rows INT NOT NULL,
+    rank_rows INT NOT NULL,
+    archived_at TIMESTAMP DEFAULT now(),
+
+    PRIMARY KEY (year, month)
+);
+
+
+-- Set-based version of recalc_operator_monthly_metrics_daily for every
+-- operator of a cycle; also creates missing monthly rows.
+CREATE OR REPLACE FUNCTION recalc_cycle_monthly_metrics(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start_date DATE;
+    v_end_date   DATE;
+    v_rows       INT;
+BEGIN
+
+    IF p_month = 1 THEN
+        v_start_date := make_date(p_year - 1, 12, 20);
+    ELSE
+        v_start_date := make_date(p_year, p_month - 1, 20);
+    END IF;
+
+    v_end_date := make_date(p_year, p_month, 20);
+
+    INSERT INTO operator_monthly_metrics (
+        operator_uuid,
+        year,
+        month,
+        call_count,
+        avg_busy_per_call,
+        kpi
+    )
+    SELECT
+        operator_uuid,
+        p_year,
+        p_month,
+        COALESCE(SUM(call_count), 0),
+        COALESCE(AVG(
+            EXTRACT(EPOCH FROM busy_duration::interval) / call_count
+        ) FILTER (WHERE call_count > 0), 0),
+        (ARRAY_AGG(kpi ORDER BY date DESC) FILTER (WHERE kpi IS NOT NULL))[1]
+    FROM operator_metrics
+    WHERE date >= v_start_date
+      AND date <  v_end_date
+    GROUP BY operator_uuid
+    ON CONFLICT (operator_uuid, year, month)
+    DO UPDATE SET
+        call_count = EXCLUDED.call_count,
+        avg_busy_per_call = EXCLUDED.avg_busy_per_call,
+        kpi = EXCLUDED.kpi;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+
+-- Completes and archives one closed cycle. Returns the number of
+-- operators archived.
+CREATE OR REPLACE FUNCTION archive_cycle(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start_date  DATE;
+    v_end_date    DATE;
+    v_operators   INT;
+    v_metric_rows INT;
+    v_rank_rows   INT;
+BEGIN
+
+    IF p_month = 1 THEN
+        v_start_date := make_date(p_year - 1, 12, 20);
+    ELSE
+        v_start_date := make_date(p_year, p_month - 1, 20);
+    END IF;
+
+    v_end_date := make_date(p_year, p_month, 20);
+
+    IF v_end_date > current_date THEN
+        RAISE EXCEPTION 'cycle %-% is not closed yet', p_year, p_month;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM archived_cycles WHERE year = p_year AND month = p_month
+    ) THEN
+        RAISE EXCEPTION
+            'cycle %-% is already archived; restore_cycle() it before re-archiving',
+            p_year, p_month;
+    END IF;
+
+    -- monthly rows and rank history must be complete before the daily
+    -- rows go away
+    PERFORM recalc_cycle_monthly_metrics(p_year, p_month);
+    PERFORM finalize_monthly_scores(p_year, p_month);
+    PERFORM rebuild_daily_rank(p_year, p_month);
+
+    INSERT INTO operator_metrics_archive (
+        operator_uuid,
+        year,
+        month,
+        days
+    )
+    SELECT
+        m.operator_uuid,
+        p_year,
+        p_month,
+        jsonb_agg(
+            jsonb_build_object(
+                'date', m.date,
+                'busy_duration', m.busy_duration,
+                'call_count', m.call_count,
+                'distributed_call_count', m.distributed_call_count,
+                'full_duration', m.full_duration,
+                'hold_duration', m.hold_duration,
+                'idle_duration', m.idle_duration,
+                'lock_duration', m.lock_duration,
+                'kpi', m.kpi,
+                'content_hash', m.content_hash,
+                'rank', d.rank
+            )
+            ORDER BY m.date
+        )
+    FROM operator_metrics m
+    LEFT JOIN operator_daily_rank d
+      ON d.operator_uuid = m.operator_uuid
+     AND d.date = m.date
+    WHERE m.date >= v_start_date
+      AND m.date <  v_end_date
+    GROUP BY m.operator_uuid;
+
+    GET DIAGNOSTICS v_operators = ROW_COUNT;
+
+    DELETE FROM operator_daily_rank
+    WHERE year = p_year
+      AND month = p_month;
+
+    GET DIAGNOSTICS v_rank_rows = ROW_COUNT;
+
+    DELETE FROM operator_metrics
+    WHERE date >= v_start_date
+      AND date <  v_end_date;
+
+    GET DIAGNOSTICS v_metric_rows = ROW_COUNT;
+
+    INSERT INTO archived_cycles (year, month, operators, metric_rows, rank_rows)
+    VALUES (p_year, p_month, v_operators, v_metric_rows, v_rank_rows);
+
+    RETURN v_operators;
+END;
+$$;
+
+
+-- Moves an archived cycle back into the live tables, e.g. before a
+-- backfill of that cycle. Returns the number of daily rows restored.
+CREATE OR REPLACE FUNCTION restore_cycle(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rows INT;
+BEGIN
+
+    INSERT INTO operator_metrics (
+        operator_uuid,
+        date,
+        busy_duration,
+        call_count,
+        distributed_call_count,
+        full_duration,
+        hold_duration,
+        idle_duration,
+        lock_duration,
+        kpi,
+        content_hash
+    )
+    SELECT
+        a.operator_uuid,
+        (e->>'date')::DATE,
+        e->>'busy_duration',
+        (e->>'call_count')::DOUBLE PRECISION,
+        (e->>'distributed_call_count')::DOUBLE PRECISION,
+        e->>'full_duration',
+        e->>'hold_duration',
+        e->>'idle_duration',
+        e->>'lock_duration',
+        (e->>'kpi')::DOUBLE PRECISION,
+        e->>'content_hash'
+    FROM operator_metrics_archive a
+    CROSS JOIN LATERAL jsonb_array_elements(a.days) e
+    WHERE a.year = p_year
+      AND a.month = p_month
+    ON CONFLICT (operator_uuid, date) DO NOTHING;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    INSERT INTO operator_daily_rank (
+        operator_uuid,
+        year,
+        month,
+        date,
+        rank
+    )
+    SELECT
+        a.operator_uuid,
+        p_year,
+        p_month,
+        (e->>'date')::DATE,
+        (e->>'rank')::INT
+    FROM operator_metrics_archive a
+    CROSS JOIN LATERAL jsonb_array_elements(a.days) e
+    WHERE a.year = p_year
+      AND a.month = p_month
+      AND e->>'rank' IS NOT NULL
+    ON CONFLICT (operator_uuid, date) DO NOTHING;
+
+    DELETE FROM operator_metrics_archive
+    WHERE year = p_year
+      AND month = p_month;
+
+    DELETE FROM archived_cycles
+    WHERE year = p_year
+      AND month = p_month;
+
+    RETURN v_rows;
+END;
+$$;
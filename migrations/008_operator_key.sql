@@ -0,0 +1,937 @@
+-- Compact integer keys for the operator-keyed fact tables.
+--
+-- operators keeps its UUID (the public id the API exposes) and gets an
+-- identity operator_key. The fact tables are rewritten keyed by it, with
+-- natural composite primary keys instead of a random UUID id: sequential
+-- 4-byte keys instead of random 16-byte ones keep the B-trees dense and
+-- halve the join keys. Rows are copied in key order, so the new heaps
+-- start out clustered on the primary key.
+--
+-- bonus_distributions had no unique key; duplicates per operator and cycle
+-- are collapsed to the most recent row.
+
+ALTER TABLE operators
+    ADD COLUMN IF NOT EXISTS operator_key INT GENERATED ALWAYS AS IDENTITY;
+
+ALTER TABLE operators
+    ADD CONSTRAINT uq_operators_operator_key UNIQUE (operator_key);
+
+
+-- operator_metrics
+
+CREATE TABLE operator_metrics_new (
+    operator_key INT NOT NULL,
+    date DATE NOT NULL,
+
+    busy_duration VARCHAR,
+    call_count DOUBLE PRECISION,
+    distributed_call_count DOUBLE PRECISION,
+    full_duration VARCHAR,
+    hold_duration VARCHAR,
+    idle_duration VARCHAR,
+    lock_duration VARCHAR,
+
+    kpi DOUBLE PRECISION,
+
+    content_hash VARCHAR(32),
+
+    created_at TIMESTAMP DEFAULT now()
+);
+
+INSERT INTO operator_metrics_new (
+    operator_key, date, busy_duration, call_count, distributed_call_count,
+    full_duration, hold_duration, idle_duration, lock_duration, kpi,
+    content_hash, created_at
+)
+SELECT
+    o.operator_key, m.date, m.busy_duration, m.call_count,
+    m.distributed_call_count, m.full_duration, m.hold_duration,
+    m.idle_duration, m.lock_duration, m.kpi, m.content_hash, m.created_at
+FROM operator_metrics m
+JOIN operators o ON o.id = m.operator_uuid
+ORDER BY o.operator_key, m.date;
+
+DROP TABLE operator_metrics;
+ALTER TABLE operator_metrics_new RENAME TO operator_metrics;
+
+ALTER TABLE operator_metrics
+    ADD CONSTRAINT pk_operator_metrics
+        PRIMARY KEY (operator_key, date)
+        INCLUDE (call_count, busy_duration, kpi, full_duration),
+    ADD CONSTRAINT fk_operator_metrics_operator
+        FOREIGN KEY (operator_key)
+        REFERENCES operators(operator_key)
+        ON DELETE CASCADE;
+
+CREATE INDEX idx_operator_metrics_date
+ON operator_metrics (date);
+
+
+-- operator_monthly_metrics
+
+CREATE TABLE operator_monthly_metrics_new (
+    operator_key INT NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+
+    call_count INT,
+    avg_busy_per_call FLOAT,
+    kpi FLOAT,
+
+    rank INT,
+    score INT,
+    is_top_1 BOOLEAN DEFAULT FALSE,
+    stars INT,
+
+    created_at TIMESTAMP DEFAULT now()
+);
+
+INSERT INTO operator_monthly_metrics_new (
+    operator_key, year, month, call_count, avg_busy_per_call, kpi,
+    rank, score, is_top_1, stars, created_at
+)
+SELECT
+    o.operator_key, m.year, m.month, m.call_count, m.avg_busy_per_call,
+    m.kpi, m.rank, m.score, m.is_top_1, m.stars, m.created_at
+FROM operator_monthly_metrics m
+JOIN operators o ON o.id = m.operator_uuid
+ORDER BY o.operator_key, m.year, m.month;
+
+DROP TABLE operator_monthly_metrics;
+ALTER TABLE operator_monthly_metrics_new RENAME TO operator_monthly_metrics;
+
+ALTER TABLE operator_monthly_metrics
+    ADD CONSTRAINT pk_operator_monthly_metrics
+        PRIMARY KEY (operator_key, year, month)
+        INCLUDE (score),
+    ADD CONSTRAINT fk_operator_monthly_metrics_operator
+        FOREIGN KEY (operator_key)
+        REFERENCES operators(operator_key)
+        ON DELETE CASCADE;
+
+CREATE INDEX idx_operator_monthly_metrics_cycle_rank
+ON operator_monthly_metrics (year, month, rank)
+INCLUDE (operator_key, score, stars, call_count, kpi, avg_busy_per_call);
+
+
+-- operator_daily_rank
+
+CREATE TABLE operator_daily_rank_new (
+    operator_key INT NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    date DATE NOT NULL,
+
+    rank INT NOT NULL,
+
+    created_at TIMESTAMP DEFAULT now()
+);
+
+INSERT INTO operator_daily_rank_new (
+    operator_key, year, month, date, rank, created_at
+)
+SELECT
+    o.operator_key, d.year, d.month, d.date, d.rank, d.created_at
+FROM operator_daily_rank d
+JOIN operators o ON o.id = d.operator_uuid
+ORDER BY o.operator_key, d.date;
+
+DROP TABLE operator_daily_rank;
+ALTER TABLE operator_daily_rank_new RENAME TO operator_daily_rank;
+
+ALTER TABLE operator_daily_rank
+    ADD CONSTRAINT pk_operator_daily_rank
+        PRIMARY KEY (operator_key, date),
+    ADD CONSTRAINT fk_operator_daily_rank_operator
+        FOREIGN KEY (operator_key)
+        REFERENCES operators(operator_key);
+
+-- rank graphs
+CREATE INDEX idx_operator_daily_rank_lookup
+ON operator_daily_rank (operator_key, year, month, date)
+INCLUDE (rank);
+
+-- rebuild_daily_rank: whole-cycle upsert and stale-row cleanup
+CREATE INDEX idx_operator_daily_rank_cycle
+ON operator_daily_rank (year, month);
+
+
+-- bonus_distributions
+
+CREATE TABLE bonus_distributions_new (
+    operator_key INT NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+    kie INT,
+    active_participation INT,
+    monitoring INT,
+
+    created_at TIMESTAMP DEFAULT now()
+);
+
+INSERT INTO bonus_distributions_new (
+    operator_key, year, month, kie, active_participation, monitoring,
+    created_at
+)
+SELECT DISTINCT ON (o.operator_key, b.year, b.month)
+    o.operator_key, b.year, b.month, b.kie, b.active_participation,
+    b.monitoring, b.created_at
+FROM bonus_distributions b
+JOIN operators o ON o.id = b.operator_uuid
+ORDER BY o.operator_key, b.year, b.month, b.created_at DESC NULLS LAST;
+
+DROP TABLE bonus_distributions;
+ALTER TABLE bonus_distributions_new RENAME TO bonus_distributions;
+
+-- the primary key covers the profile's LEFT JOIN
+ALTER TABLE bonus_distributions
+    ADD CONSTRAINT pk_bonus_distributions
+        PRIMARY KEY (operator_key, year, month)
+        INCLUDE (kie, active_participation, monitoring),
+    ADD CONSTRAINT fk_bonus_distributions_operator
+        FOREIGN KEY (operator_key)
+        REFERENCES operators(operator_key)
+        ON DELETE CASCADE;
+
+
+-- operator_metrics_archive
+
+CREATE TABLE operator_metrics_archive_new (
+    operator_key INT NOT NULL,
+    year INT NOT NULL,
+    month INT NOT NULL,
+
+    -- one element per day: the operator_metrics columns plus "rank"
+    days JSONB NOT NULL,
+
+    archived_at TIMESTAMP DEFAULT now()
+);
+
+ALTER TABLE operator_metrics_archive_new
+    ALTER COLUMN days SET COMPRESSION lz4;
+
+INSERT INTO operator_metrics_archive_new (
+    operator_key, year, month, days, archived_at
+)
+SELECT
+    o.operator_key, a.year, a.month, a.days, a.archived_at
+FROM operator_metrics_archive a
+JOIN operators o ON o.id = a.operator_uuid
+ORDER BY o.operator_key, a.year, a.month;
+
+DROP TABLE operator_metrics_archive;
+ALTER TABLE operator_metrics_archive_new RENAME TO operator_metrics_archive;
+
+ALTER TABLE operator_metrics_archive
+    ADD CONSTRAINT pk_operator_metrics_archive
+        PRIMARY KEY (operator_key, year, month),
+    ADD CONSTRAINT fk_operator_metrics_archive_operator
+        FOREIGN KEY (operator_key)
+        REFERENCES operators(operator_key)
+        ON DELETE CASCADE;
+
+
+-- Functions: same logic, keyed by operator_key. The per-operator recalc
+-- changes signature, so the UUID version is dropped.
+
+DROP FUNCTION IF EXISTS recalc_operator_monthly_metrics_daily(UUID, INT, INT);
+
+CREATE OR REPLACE FUNCTION ensure_operator_monthly_row()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_year  INT;
+    v_month INT;
+BEGIN
+    SELECT year, month
+    INTO v_year, v_month
+    FROM resolve_cycle(NEW.date);
+
+    INSERT INTO operator_monthly_metrics (
+        operator_key,
+        year,
+        month,
+        call_count,
+        avg_busy_per_call,
+        kpi,
+        rank,
+        score,
+        is_top_1,
+        stars
+    )
+    VALUES (
+        NEW.operator_key,
+        v_year,
+        v_month,
+        0,
+        0,
+        NULL,
+        NULL,
+        NULL,
+        FALSE,
+        NULL
+    )
+    ON CONFLICT (operator_key, year, month)
+    DO NOTHING;
+
+    RETURN NEW;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION recalc_operator_monthly_metrics_daily(
+    p_operator_key INT,
+    p_year  INT,
+    p_month INT
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start_date DATE;
+    v_end_date   DATE;
+    v_call_count INT;
+    v_avg_busy   FLOAT;
+    v_kpi        FLOAT;
+BEGIN
+
+    IF p_month = 1 THEN
+        v_start_date := make_date(p_year - 1, 12, 20);
+    ELSE
+        v_start_date := make_date(p_year, p_month - 1, 20);
+    END IF;
+
+    v_end_date := make_date(p_year, p_month, 20);
+
+    SELECT COALESCE(SUM(call_count), 0)
+    INTO v_call_count
+    FROM operator_metrics
+    WHERE operator_key = p_operator_key
+      AND date >= v_start_date
+      AND date <  v_end_date;
+
+    SELECT AVG(
+        EXTRACT(EPOCH FROM busy_duration::interval) / call_count
+    )
+    INTO v_avg_busy
+    FROM operator_metrics
+    WHERE operator_key = p_operator_key
+      AND date >= v_start_date
+      AND date <  v_end_date
+      AND call_count > 0;
+
+    SELECT kpi
+    INTO v_kpi
+    FROM operator_metrics
+    WHERE operator_key = p_operator_key
+      AND date >= v_start_date
+      AND date <  v_end_date
+      AND kpi IS NOT NULL
+    ORDER BY date DESC
+    LIMIT 1;
+
+    UPDATE operator_monthly_metrics
+    SET
+        call_count = v_call_count,
+        avg_busy_per_call = COALESCE(v_avg_busy, 0),
+        kpi = v_kpi
+    WHERE operator_key = p_operator_key
+      AND year = p_year
+      AND month = p_month;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION trg_update_monthly_metrics_daily()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_year  INT;
+    v_month INT;
+BEGIN
+    SELECT year, month
+    INTO v_year, v_month
+    FROM resolve_cycle(NEW.date);
+
+    PERFORM recalc_operator_monthly_metrics_daily(
+        NEW.operator_key,
+        v_year,
+        v_month
+    );
+
+    RETURN NEW;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION finalize_monthly_scores(
+    p_year  INT,
+    p_month INT
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    WITH base AS (
+        SELECT
+            m.operator_key,
+            o.group_name,
+
+            COALESCE(m.call_count, 0)         AS call_count,
+            COALESCE(m.kpi, 0)                AS kpi,
+            COALESCE(m.avg_busy_per_call, 0) AS avg_busy_per_call
+        FROM operator_monthly_metrics m
+        JOIN operators o ON o.operator_key = m.operator_key
+        WHERE m.year = p_year
+          AND m.month = p_month
+    ),
+
+    stats AS (
+        SELECT
+            *,
+            MIN(call_count) OVER (PARTITION BY group_name) AS min_call,
+            MAX(call_count) OVER (PARTITION BY group_name) AS max_call,
+
+            MIN(kpi) OVER (PARTITION BY group_name) AS min_kpi,
+            MAX(kpi) OVER (PARTITION BY group_name) AS max_kpi,
+
+            MIN(avg_busy_per_call) OVER (PARTITION BY group_name) AS min_avg,
+            MAX(avg_busy_per_call) OVER (PARTITION BY group_name) AS max_avg
+        FROM base
+    ),
+
+    normalized AS (
+        SELECT
+            operator_key,
+            group_name,
+
+            CASE
+                WHEN max_call = min_call THEN 0
+                ELSE (call_count - min_call)::FLOAT / (max_call - min_call)
+            END AS count_norm,
+
+            CASE
+                WHEN max_kpi = min_kpi THEN 0
+                ELSE (kpi - min_kpi)::FLOAT / (max_kpi - min_kpi)
+            END AS kpi_norm,
+
+            CASE
+                WHEN max_avg = min_avg THEN 0
+                ELSE (max_avg - avg_busy_per_call)::FLOAT / (max_avg - min_avg)
+            END AS avg_norm
+        FROM stats
+    ),
+
+    scored AS (
+        SELECT
+            operator_key,
+            group_name,
+            (0.5 * count_norm
+           + 0.1 * kpi_norm
+           + 0.4 * avg_norm) AS total_score
+        FROM normalized
+    ),
+
+    ranked AS (
+        SELECT
+            operator_key,
+            group_name,
+            total_score,
+            DENSE_RANK() OVER (
+                PARTITION BY group_name
+                ORDER BY total_score DESC
+            ) AS rank
+        FROM scored
+    )
+
+    UPDATE operator_monthly_metrics m
+    SET
+        rank = r.rank,
+
+        score = CASE
+            WHEN r.rank = 1 THEN 1000
+            WHEN r.rank = 2 THEN 900
+            WHEN r.rank = 3 THEN 800
+            WHEN r.rank = 4 THEN 700
+            WHEN r.rank = 5 THEN 600
+            WHEN r.rank = 6 THEN 500
+            WHEN r.rank = 7 THEN 400
+            WHEN r.rank = 8 THEN 300
+            WHEN r.rank = 9 THEN 200
+            WHEN r.rank = 10 THEN 100
+            ELSE 0
+        END,
+
+        is_top_1 = (r.rank <= 3),
+
+        stars = CASE
+            WHEN r.rank = 1 THEN 3
+            WHEN r.rank = 2 THEN 2
+            WHEN r.rank = 3 THEN 1
+            ELSE 0
+        END
+    FROM ranked r
+    WHERE m.operator_key = r.operator_key
+      AND m.year = p_year
+      AND m.month = p_month;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION snapshot_daily_rank(
+    p_year INT,
+    p_month INT,
+    p_date DATE
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO operator_daily_rank (
+        operator_key,
+        year,
+        month,
+        date,
+        rank    )
+    SELECT
+        operator_key,
+        p_year,
+        p_month,
+        p_date,
+        rank
+    FROM operator_monthly_metrics
+    WHERE year = p_year
+      AND month = p_month
+      AND rank IS NOT NULL
+    ON CONFLICT (operator_key, date)
+    DO UPDATE SET
+        rank  = EXCLUDED.rank,
+        created_at = now();
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION rebuild_daily_rank(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start_date DATE;
+    v_end_date   DATE;
+    v_rows       INT;
+BEGIN
+
+    IF p_month = 1 THEN
+        v_start_date := make_date(p_year - 1, 12, 20);
+    ELSE
+        v_start_date := make_date(p_year, p_month - 1, 20);
+    END IF;
+
+    v_end_date := make_date(p_year, p_month, 20);
+
+    WITH daily AS (
+        SELECT
+            operator_key,
+            date,
+            call_count,
+            CASE
+                WHEN call_count > 0 THEN
+                    EXTRACT(EPOCH FROM busy_duration::interval) / call_count
+            END AS avg_busy,
+            kpi
+        FROM operator_metrics
+        WHERE date >= v_start_date
+          AND date <  v_end_date
+    ),
+
+    days AS (
+        SELECT DISTINCT date
+        FROM daily
+    ),
+
+    first_seen AS (
+        SELECT
+            operator_key,
+            MIN(date) AS first_date
+        FROM daily
+        GROUP BY operator_key
+    ),
+
+    -- one row per operator per day since the operator's first day in the
+    -- cycle, so days without metrics still carry the cumulative values
+    grid AS (
+        SELECT
+            f.operator_key,
+            o.group_name,
+            d.date,
+            x.call_count,
+            x.avg_busy,
+            x.kpi
+        FROM first_seen f
+        JOIN operators o ON o.operator_key = f.operator_key
+        JOIN days d ON d.date >= f.first_date
+        LEFT JOIN daily x
+          ON x.operator_key = f.operator_key
+         AND x.date = d.date
+    ),
+
+    cumulative AS (
+        SELECT
+            operator_key,
+            group_name,
+            date,
+            kpi,
+
+            ROUND(SUM(COALESCE(call_count, 0)) OVER w)::INT AS call_count,
+            AVG(avg_busy) OVER w                            AS avg_busy,
+            COUNT(kpi) OVER w                               AS kpi_grp
+        FROM grid
+        WINDOW w AS (PARTITION BY operator_key ORDER BY date)
+    ),
+
+    as_of AS (
+        SELECT
+            operator_key,
+            group_name,
+            date,
+            call_count,
+            COALESCE(avg_busy, 0) AS avg_busy_per_call,
+
+            -- latest non-null KPI up to this day
+            COALESCE(FIRST_VALUE(kpi) OVER (
+                PARTITION BY operator_key, kpi_grp
+                ORDER BY date
+            ), 0) AS kpi
+        FROM cumulative
+    ),
+
+    stats AS (
+        SELECT
+            *,
+            MIN(call_count) OVER g AS min_call,
+            MAX(call_count) OVER g AS max_call,
+
+            MIN(kpi) OVER g AS min_kpi,
+            MAX(kpi) OVER g AS max_kpi,
+
+            MIN(avg_busy_per_call) OVER g AS min_avg,
+            MAX(avg_busy_per_call) OVER g AS max_avg
+        FROM as_of
+        WINDOW g AS (PARTITION BY group_name, date)
+    ),
+
+    scored AS (
+        SELECT
+            operator_key,
+            group_name,
+            date,
+            (0.5 * CASE
+                    WHEN max_call = min_call THEN 0
+                    ELSE (call_count - min_call)::FLOAT / (max_call - min_call)
+                END
+           + 0.1 * CASE
+                    WHEN max_kpi = min_kpi THEN 0
+                    ELSE (kpi - min_kpi)::FLOAT / (max_kpi - min_kpi)
+                END
+           + 0.4 * CASE
+                    WHEN max_avg = min_avg THEN 0
+                    ELSE (max_avg - avg_busy_per_call)::FLOAT / (max_avg - min_avg)
+                END) AS total_score
+        FROM stats
+    ),
+
+    ranked AS (
+        SELECT
+            operator_key,
+            date,
+            DENSE_RANK() OVER (
+                PARTITION BY group_name, date
+                ORDER BY total_score DESC
+            ) AS rank
+        FROM scored
+    )
+
+    INSERT INTO operator_daily_rank (
+        operator_key,
+        year,
+        month,
+        date,
+        rank
+    )
+    SELECT
+        operator_key,
+        p_year,
+        p_month,
+        date,
+        rank
+    FROM ranked
+    ON CONFLICT (operator_key, date)
+    DO UPDATE SET
+        year  = EXCLUDED.year,
+        month = EXCLUDED.month,
+        rank  = EXCLUDED.rank,
+        created_at = now();
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    -- rows of this cycle that the rebuild did not touch are stale
+    DELETE FROM operator_daily_rank
+    WHERE year = p_year
+      AND month = p_month
+      AND created_at < now();
+
+    RETURN v_rows;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION recalc_cycle_monthly_metrics(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start_date DATE;
+    v_end_date   DATE;
+    v_rows       INT;
+BEGIN
+
+    IF p_month = 1 THEN
+        v_start_date := make_date(p_year - 1, 12, 20);
+    ELSE
+        v_start_date := make_date(p_year, p_month - 1, 20);
+    END IF;
+
+    v_end_date := make_date(p_year, p_month, 20);
+
+    INSERT INTO operator_monthly_metrics (
+        operator_key,
+        year,
+        month,
+        call_count,
+        avg_busy_per_call,
+        kpi
+    )
+    SELECT
+        operator_key,
+        p_year,
+        p_month,
+        COALESCE(SUM(call_count), 0),
+        COALESCE(AVG(
+            EXTRACT(EPOCH FROM busy_duration::interval) / call_count
+        ) FILTER (WHERE call_count > 0), 0),
+        (ARRAY_AGG(kpi ORDER BY date DESC) FILTER (WHERE kpi IS NOT NULL))[1]
+    FROM operator_metrics
+    WHERE date >= v_start_date
+      AND date <  v_end_date
+    GROUP BY operator_key
+    ON CONFLICT (operator_key, year, month)
+    DO UPDATE SET
+        call_count = EXCLUDED.call_count,
+        avg_busy_per_call = EXCLUDED.avg_busy_per_call,
+        kpi = EXCLUDED.kpi;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+    RETURN v_rows;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION archive_cycle(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start_date  DATE;
+    v_end_date    DATE;
+    v_operators   INT;
+    v_metric_rows INT;
+    v_rank_rows   INT;
+BEGIN
+
+    IF p_month = 1 THEN
+        v_start_date := make_date(p_year - 1, 12, 20);
+    ELSE
+        v_start_date := make_date(p_year, p_month - 1, 20);
+    END IF;
+
+    v_end_date := make_date(p_year, p_month, 20);
+
+    IF v_end_date > current_date THEN
+        RAISE EXCEPTION 'cycle %-% is not closed yet', p_year, p_month;
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM archived_cycles WHERE year = p_year AND month = p_month
+    ) THEN
+        RAISE EXCEPTION
+            'cycle %-% is already archived; restore_cycle() it before re-archiving',
+            p_year, p_month;
+    END IF;
+
+    -- monthly rows and rank history must be complete before the daily
+    -- rows go away
+    PERFORM recalc_cycle_monthly_metrics(p_year, p_month);
+    PERFORM finalize_monthly_scores(p_year, p_month);
+    PERFORM rebuild_daily_rank(p_year, p_month);
+
+    INSERT INTO operator_metrics_archive (
+        operator_key,
+        year,
+        month,
+        days
+    )
+    SELECT
+        m.operator_key,
+        p_year,
+        p_month,
+        jsonb_agg(
+            jsonb_build_object(
+                'date', m.date,
+                'busy_duration', m.busy_duration,
+                'call_count', m.call_count,
+                'distributed_call_count', m.distributed_call_count,
+                'full_duration', m.full_duration,
+                'hold_duration', m.hold_duration,
+                'idle_duration', m.idle_duration,
+                'lock_duration', m.lock_duration,
+                'kpi', m.kpi,
+                'content_hash', m.content_hash,
+                'rank', d.rank
+            )
+            ORDER BY m.date
+        )
+    FROM operator_metrics m
+    LEFT JOIN operator_daily_rank d
+      ON d.operator_key = m.operator_key
+     AND d.date = m.date
+    WHERE m.date >= v_start_date
+      AND m.date <  v_end_date
+    GROUP BY m.operator_key;
+
+    GET DIAGNOSTICS v_operators = ROW_COUNT;
+
+    DELETE FROM operator_daily_rank
+    WHERE year = p_year
+      AND month = p_month;
+
+    GET DIAGNOSTICS v_rank_rows = ROW_COUNT;
+
+    DELETE FROM operator_metrics
+    WHERE date >= v_start_date
+      AND date <  v_end_date;
+
+    GET DIAGNOSTICS v_metric_rows = ROW_COUNT;
+
+    INSERT INTO archived_cycles (year, month, operators, metric_rows, rank_rows)
+    VALUES (p_year, p_month, v_operators, v_metric_rows, v_rank_rows);
+
+    RETURN v_operators;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION restore_cycle(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rows INT;
+BEGIN
+
+    INSERT INTO operator_metrics (
+        operator_key,
+        date,
+        busy_duration,
+        call_count,
+        distributed_call_count,
+        full_duration,
+        hold_duration,
+        idle_duration,
+        lock_duration,
+        kpi,
+        content_hash
+    )
+    SELECT
+        a.operator_key,
+        (e->>'date')::DATE,
+        e->>'busy_duration',
+        (e->>'call_count')::DOUBLE PRECISION,
+        (e->>'distributed_call_count')::DOUBLE PRECISION,
+        e->>'full_duration',
+        e->>'hold_duration',
+        e->>'idle_duration',
+        e->>'lock_duration',
+        (e->>'kpi')::DOUBLE PRECISION,
+        e->>'content_hash'
+    FROM operator_metrics_archive a
+    CROSS JOIN LATERAL jsonb_array_elements(a.days) e
+    WHERE a.year = p_year
+      AND a.month = p_month
+    ON CONFLICT (operator_key, date) DO NOTHING;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    INSERT INTO operator_daily_rank (
+        operator_key,
+        year,
+        month,
+        date,
+        rank
+    )
+    SELECT
+        a.operator_key,
+        p_year,
+        p_month,
+        (e->>'date')::DATE,
+        (e->>'rank')::INT
+    FROM operator_metrics_archive a
+    CROSS JOIN LATERAL jsonb_array_elements(a.days) e
+    WHERE a.year = p_year
+      AND a.month = p_month
+      AND e->>'rank' IS NOT NULL
+    ON CONFLICT (operator_key, date) DO NOTHING;
+
+    DELETE FROM operator_metrics_archive
+    WHERE year = p_year
+      AND month = p_month;
+
+    DELETE FROM archived_cycles
+    WHERE year = p_year
+      AND month = p_month;
+
+    RETURN v_rows;
+END;
+$$;
+
+-- the triggers went away with the old operator_metrics table
+
+CREATE TRIGGER trg_ensure_monthly_row
+AFTER INSERT ON operator_metrics
+FOR EACH ROW
+EXECUTE FUNCTION ensure_operator_monthly_row();
+
+CREATE TRIGGER trg_operator_metrics_to_monthly_update
+AFTER INSERT OR UPDATE ON operator_metrics
+FOR EACH ROW
+EXECUTE FUNCTION trg_update_monthly_metrics_daily();
+
+ANALYZE operators;
+ANALYZE operator_metrics;
+ANALYZE operator_monthly_metrics;
+ANALYZE operator_daily_rank;
+ANALYZE bonus_distributions;
+ANALYZE operator_metrics_archive;
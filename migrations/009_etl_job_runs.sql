@@ -0,0 +1,14 @@
+-- One row per ETL job run (daily, range, replay, kpi) with its per-stage
+-- timings and counters, written when the run ends. The latest row per job
+-- backs /metrics/etl.
+CREATE TABLE IF NOT EXISTS etl_job_runs (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    job VARCHAR NOT NULL,
+    status VARCHAR NOT NULL,
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP NOT NULL,
+    stats JSONB NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_etl_job_runs_job_started
+ON etl_job_runs (job, started_at DESC);
@@ -0,0 +1,29 @@
+-- Per-day ETL ledger: the outcome of the last attempt at every day. A
+-- "done" row is written in the same transaction as the day's metrics, so
+-- it always means the rows are committed. payload_hash / inputs_hash let
+-- a later run skip a day whose payload, KPI values and roster did not
+-- change; finalized_at is NULL while the day's cycle still has to be
+-- re-ranked (range jobs finalize once, at the end).
+CREATE TABLE IF NOT EXISTS etl_runs (
+    day DATE PRIMARY KEY,
+    status VARCHAR NOT NULL,
+    job VARCHAR,
+
+    -- attempts since the day was last done
+    attempts INT NOT NULL DEFAULT 1,
+
+    fetched INT NOT NULL DEFAULT 0,
+    parsed INT NOT NULL DEFAULT 0,
+    written INT NOT NULL DEFAULT 0,
+    unchanged INT NOT NULL DEFAULT 0,
+    unresolved INT NOT NULL DEFAULT 0,
+
+    payload_hash VARCHAR(32),
+    inputs_hash VARCHAR(32),
+
+    started_at TIMESTAMP NOT NULL,
+    finished_at TIMESTAMP NOT NULL DEFAULT now(),
+    duration_seconds DOUBLE PRECISION,
+    finalized_at TIMESTAMP,
+    error TEXT
+);
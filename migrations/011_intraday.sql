@@ -0,0 +1,248 @@
+-- Intraday polling (etl_daily_metrics intraday) rewrites today's rows every
+-- few minutes. Every statement on that path now skips rows whose values
+-- did not change, provisional re-ranking can be limited to the groups
+-- that changed, and autovacuum keeps up with the dead tuples the polls
+-- leave behind.
+--
+-- The covering indexes (INCLUDE call_count, kpi, ...) make these updates
+-- non-HOT anyway, so a lower fillfactor would not help; fewer updates and
+-- earlier vacuums do.
+
+
+-- finalize_monthly_scores(year, month) keeps working: p_groups defaults
+-- to every group.
+DROP FUNCTION IF EXISTS finalize_monthly_scores(INT, INT);
+
+CREATE OR REPLACE FUNCTION finalize_monthly_scores(
+    p_year   INT,
+    p_month  INT,
+    p_groups VARCHAR[] DEFAULT NULL
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    WITH base AS (
+        SELECT
+            m.operator_key,
+            o.group_name,
+
+            COALESCE(m.call_count, 0)         AS call_count,
+            COALESCE(m.kpi, 0)                AS kpi,
+            COALESCE(m.avg_busy_per_call, 0) AS avg_busy_per_call
+        FROM operator_monthly_metrics m
+        JOIN operators o ON o.operator_key = m.operator_key
+        WHERE m.year = p_year
+          AND m.month = p_month
+          -- ranks are per group: the other groups are unaffected
+          AND (p_groups IS NULL OR o.group_name = ANY(p_groups))
+    ),
+
+    stats AS (
+        SELECT
+            *,
+            MIN(call_count) OVER (PARTITION BY group_name) AS min_call,
+            MAX(call_count) OVER (PARTITION BY group_name) AS max_call,
+
+            MIN(kpi) OVER (PARTITION BY group_name) AS min_kpi,
+            MAX(kpi) OVER (PARTITION BY group_name) AS max_kpi,
+
+            MIN(avg_busy_per_call) OVER (PARTITION BY group_name) AS min_avg,
+            MAX(avg_busy_per_call) OVER (PARTITION BY group_name) AS max_avg
+        FROM base
+    ),
+
+    normalized AS (
+        SELECT
+            operator_key,
+            group_name,
+
+            CASE
+                WHEN max_call = min_call THEN 0
+                ELSE (call_count - min_call)::FLOAT / (max_call - min_call)
+            END AS count_norm,
+
+            CASE
+                WHEN max_kpi = min_kpi THEN 0
+                ELSE (kpi - min_kpi)::FLOAT / (max_kpi - min_kpi)
+            END AS kpi_norm,
+
+            CASE
+                WHEN max_avg = min_avg THEN 0
+                ELSE (max_avg - avg_busy_per_call)::FLOAT / (max_avg - min_avg)
+            END AS avg_norm
+        FROM stats
+    ),
+
+    scored AS (
+        SELECT
+            operator_key,
+            group_name,
+            (0.5 * count_norm
+           + 0.1 * kpi_norm
+           + 0.4 * avg_norm) AS total_score
+        FROM normalized
+    ),
+
+    ranked AS (
+        SELECT
+            operator_key,
+            group_name,
+            total_score,
+            DENSE_RANK() OVER (
+                PARTITION BY group_name
+                ORDER BY total_score DESC
+            ) AS rank
+        FROM scored
+    )
+
+    UPDATE operator_monthly_metrics m
+    SET
+        rank = r.rank,
+
+        score = CASE
+            WHEN r.rank = 1 THEN 1000
+            WHEN r.rank = 2 THEN 900
+            WHEN r.rank = 3 THEN 800
+            WHEN r.rank = 4 THEN 700
+            WHEN r.rank = 5 THEN 600
+            WHEN r.rank = 6 THEN 500
+            WHEN r.rank = 7 THEN 400
+            WHEN r.rank = 8 THEN 300
+            WHEN r.rank = 9 THEN 200
+            WHEN r.rank = 10 THEN 100
+            ELSE 0
+        END,
+
+        is_top_1 = (r.rank <= 3),
+
+        stars = CASE
+            WHEN r.rank = 1 THEN 3
+            WHEN r.rank = 2 THEN 2
+            WHEN r.rank = 3 THEN 1
+            ELSE 0
+        END
+    FROM ranked r
+    WHERE m.operator_key = r.operator_key
+      AND m.year = p_year
+      AND m.month = p_month
+      -- score, is_top_1 and stars follow from rank
+      AND m.rank IS DISTINCT FROM r.rank;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION recalc_operator_monthly_metrics_daily(
+    p_operator_key INT,
+    p_year  INT,
+    p_month INT
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start_date DATE;
+    v_end_date   DATE;
+    v_call_count INT;
+    v_avg_busy   FLOAT;
+    v_kpi        FLOAT;
+BEGIN
+
+    IF p_month = 1 THEN
+        v_start_date := make_date(p_year - 1, 12, 20);
+    ELSE
+        v_start_date := make_date(p_year, p_month - 1, 20);
+    END IF;
+
+    v_end_date := make_date(p_year, p_month, 20);
+
+    SELECT COALESCE(SUM(call_count), 0)
+    INTO v_call_count
+    FROM operator_metrics
+    WHERE operator_key = p_operator_key
+      AND date >= v_start_date
+      AND date <  v_end_date;
+
+    SELECT AVG(
+        EXTRACT(EPOCH FROM busy_duration::interval) / call_count
+    )
+    INTO v_avg_busy
+    FROM operator_metrics
+    WHERE operator_key = p_operator_key
+      AND date >= v_start_date
+      AND date <  v_end_date
+      AND call_count > 0;
+
+    SELECT kpi
+    INTO v_kpi
+    FROM operator_metrics
+    WHERE operator_key = p_operator_key
+      AND date >= v_start_date
+      AND date <  v_end_date
+      AND kpi IS NOT NULL
+    ORDER BY date DESC
+    LIMIT 1;
+
+    UPDATE operator_monthly_metrics
+    SET
+        call_count = v_call_count,
+        avg_busy_per_call = COALESCE(v_avg_busy, 0),
+        kpi = v_kpi
+    WHERE operator_key = p_operator_key
+      AND year = p_year
+      AND month = p_month
+      AND (call_count, avg_busy_per_call, kpi)
+          IS DISTINCT FROM (v_call_count, COALESCE(v_avg_busy, 0), v_kpi);
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION snapshot_daily_rank(
+    p_year INT,
+    p_month INT,
+    p_date DATE
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO operator_daily_rank (
+        operator_key,
+        year,
+        month,
+        date,
+        rank    )
+    SELECT
+        operator_key,
+        p_year,
+        p_month,
+        p_date,
+        rank
+    FROM operator_monthly_metrics
+    WHERE year = p_year
+      AND month = p_month
+      AND rank IS NOT NULL
+    ON CONFLICT (operator_key, date)
+    DO UPDATE SET
+        rank  = EXCLUDED.rank,
+        created_at = now()
+    WHERE operator_daily_rank.rank IS DISTINCT FROM EXCLUDED.rank;
+END;
+$$;
+
+
+-- vacuum after ~2% dead rows instead of 20%: today's rows are rewritten
+-- by every poll that sees new calls
+ALTER TABLE operator_metrics SET (
+    autovacuum_vacuum_scale_factor = 0.02,
+    autovacuum_analyze_scale_factor = 0.05
+);
+
+ALTER TABLE operator_monthly_metrics SET (
+    autovacuum_vacuum_scale_factor = 0.02,
+    autovacuum_analyze_scale_factor = 0.05
+);
+
+ALTER TABLE operator_daily_rank SET (
+    autovacuum_vacuum_scale_factor = 0.02
+);
@@ -0,0 +1,48 @@
+-- The latest closed day of every operator, for the profile's "yesterday"
+-- block and the leaderboard's yesterday column: one primary-key read (or
+-- one join) instead of a sort over the operator's whole history.
+-- Maintained by the ETL (pipeline.write_latest_metrics) and the KPI sync;
+-- intraday (provisional) days are not "yesterday" yet and are left out.
+CREATE TABLE IF NOT EXISTS operator_latest_metrics (
+    operator_key INT NOT NULL,
+    date DATE NOT NULL,
+
+    call_count DOUBLE PRECISION,
+    avg_busy_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    kpi DOUBLE PRECISION,
+
+    updated_at TIMESTAMP DEFAULT now(),
+
+    CONSTRAINT pk_operator_latest_metrics
+        PRIMARY KEY (operator_key),
+
+    CONSTRAINT fk_operator_latest_metrics_operator
+        FOREIGN KEY (operator_key)
+        REFERENCES operators(operator_key)
+        ON DELETE CASCADE
+);
+
+INSERT INTO operator_latest_metrics (
+    operator_key, date, call_count, avg_busy_seconds, kpi
+)
+SELECT DISTINCT ON (m.operator_key)
+    m.operator_key,
+    m.date,
+    m.call_count,
+    CASE
+        WHEN m.call_count > 0 THEN
+            EXTRACT(EPOCH FROM m.busy_duration::interval) / m.call_count
+        ELSE 0
+    END,
+    m.kpi
+FROM operator_metrics m
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM etl_runs r
+    WHERE r.day = m.date
+      AND r.status = 'provisional'
+)
+ORDER BY m.operator_key, m.date DESC
+ON CONFLICT (operator_key) DO NOTHING;
+
+ANALYZE operator_latest_metrics;
@@ -0,0 +1,7 @@
+-- Local avatar thumbnails (app.services.avatars): the SHA-256 of the
+-- original image names the files in AVATAR_DIR, and avatar_source_url is
+-- the avatar_url they were made from. A sync fetches only the operators
+-- where the two URLs differ.
+ALTER TABLE operators
+    ADD COLUMN IF NOT EXISTS avatar_hash VARCHAR(64),
+    ADD COLUMN IF NOT EXISTS avatar_source_url VARCHAR;
@@ -0,0 +1,338 @@
+-- Per-group distribution statistics, refreshed by finalize_monthly_scores
+-- so nothing scans a group at request time:
+--
+-- * group_cycle_stats: count, min / max / mean, quantiles and a 10-bucket
+--   histogram of call_count, avg_busy_per_call and KPI per group and
+--   cycle (GET /api/groups/{group}/stats)
+-- * operator_monthly_metrics.*_pct: each operator's percentile position
+--   in the group (share of the group below it), carried by the profile
+
+CREATE TABLE IF NOT EXISTS group_cycle_stats (
+    year INT NOT NULL,
+    month INT NOT NULL,
+    group_name VARCHAR NOT NULL,
+    -- call_count, avg_busy_per_call or kpi
+    metric VARCHAR NOT NULL,
+
+    operators INT NOT NULL,
+    min_value DOUBLE PRECISION,
+    max_value DOUBLE PRECISION,
+    mean_value DOUBLE PRECISION,
+    p10 DOUBLE PRECISION,
+    p25 DOUBLE PRECISION,
+    p50 DOUBLE PRECISION,
+    p75 DOUBLE PRECISION,
+    p90 DOUBLE PRECISION,
+
+    -- operators per bucket: 10 equal-width buckets over [min, max]
+    histogram JSONB NOT NULL,
+
+    computed_at TIMESTAMP DEFAULT now(),
+
+    CONSTRAINT pk_group_cycle_stats
+        PRIMARY KEY (year, month, group_name, metric)
+);
+
+ALTER TABLE operator_monthly_metrics
+    ADD COLUMN IF NOT EXISTS call_count_pct REAL,
+    ADD COLUMN IF NOT EXISTS avg_busy_pct REAL,
+    ADD COLUMN IF NOT EXISTS kpi_pct REAL;
+
+
+CREATE OR REPLACE FUNCTION refresh_cycle_percentiles(
+    p_year   INT,
+    p_month  INT,
+    p_groups VARCHAR[] DEFAULT NULL
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    WITH base AS (
+        SELECT
+            m.operator_key,
+            o.group_name,
+            COALESCE(m.call_count, 0)         AS call_count,
+            COALESCE(m.avg_busy_per_call, 0) AS avg_busy_per_call,
+            m.kpi
+        FROM operator_monthly_metrics m
+        JOIN operators o ON o.operator_key = m.operator_key
+        WHERE m.year = p_year
+          AND m.month = p_month
+          AND (p_groups IS NULL OR o.group_name = ANY(p_groups))
+    ),
+
+    positions AS (
+        SELECT
+            operator_key,
+            PERCENT_RANK() OVER (
+                PARTITION BY group_name ORDER BY call_count
+            ) AS call_count_pct,
+            PERCENT_RANK() OVER (
+                PARTITION BY group_name ORDER BY avg_busy_per_call
+            ) AS avg_busy_pct,
+            -- operators without a KPI have no position
+            CASE WHEN kpi IS NOT NULL THEN
+                PERCENT_RANK() OVER (
+                    PARTITION BY group_name, kpi IS NULL ORDER BY kpi
+                )
+            END AS kpi_pct
+        FROM base
+    )
+
+    UPDATE operator_monthly_metrics m
+    SET
+        call_count_pct = p.call_count_pct,
+        avg_busy_pct = p.avg_busy_pct,
+        kpi_pct = p.kpi_pct
+    FROM positions p
+    WHERE m.operator_key = p.operator_key
+      AND m.year = p_year
+      AND m.month = p_month
+      AND (m.call_count_pct, m.avg_busy_pct, m.kpi_pct)
+          IS DISTINCT FROM (
+              p.call_count_pct::REAL, p.avg_busy_pct::REAL, p.kpi_pct::REAL
+          );
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION refresh_group_cycle_stats(
+    p_year   INT,
+    p_month  INT,
+    p_groups VARCHAR[] DEFAULT NULL
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM group_cycle_stats
+    WHERE year = p_year
+      AND month = p_month
+      AND (p_groups IS NULL OR group_name = ANY(p_groups));
+
+    WITH base AS (
+        SELECT
+            o.group_name,
+            COALESCE(m.call_count, 0)::FLOAT  AS call_count,
+            COALESCE(m.avg_busy_per_call, 0) AS avg_busy_per_call,
+            m.kpi
+        FROM operator_monthly_metrics m
+        JOIN operators o ON o.operator_key = m.operator_key
+        WHERE m.year = p_year
+          AND m.month = p_month
+          AND (p_groups IS NULL OR o.group_name = ANY(p_groups))
+    ),
+
+    observations AS (
+        SELECT b.group_name, v.metric, v.value
+        FROM base b
+        CROSS JOIN LATERAL (
+            VALUES
+                ('call_count', b.call_count),
+                ('avg_busy_per_call', b.avg_busy_per_call),
+                ('kpi', b.kpi)
+        ) AS v(metric, value)
+        WHERE v.value IS NOT NULL
+    ),
+
+    summary AS (
+        SELECT
+            group_name,
+            metric,
+            COUNT(*) AS operators,
+            MIN(value) AS min_value,
+            MAX(value) AS max_value,
+            AVG(value) AS mean_value,
+            percentile_cont(ARRAY[0.1, 0.25, 0.5, 0.75, 0.9])
+                WITHIN GROUP (ORDER BY value) AS q
+        FROM observations
+        GROUP BY group_name, metric
+    ),
+
+    buckets AS (
+        SELECT
+            o.group_name,
+            o.metric,
+            CASE
+                WHEN s.max_value = s.min_value THEN 1
+                ELSE LEAST(width_bucket(o.value, s.min_value, s.max_value, 10), 10)
+            END AS bucket,
+            COUNT(*) AS operators
+        FROM observations o
+        JOIN summary s
+          ON s.group_name = o.group_name
+         AND s.metric = o.metric
+        GROUP BY 1, 2, 3
+    ),
+
+    histograms AS (
+        SELECT
+            s.group_name,
+            s.metric,
+            jsonb_agg(COALESCE(b.operators, 0) ORDER BY g.bucket) AS histogram
+        FROM summary s
+        CROSS JOIN generate_series(1, 10) AS g(bucket)
+        LEFT JOIN buckets b
+          ON b.group_name = s.group_name
+         AND b.metric = s.metric
+         AND b.bucket = g.bucket
+        GROUP BY s.group_name, s.metric
+    )
+
+    INSERT INTO group_cycle_stats (
+        year, month, group_name, metric, operators,
+        min_value, max_value, mean_value, p10, p25, p50, p75, p90,
+        histogram
+    )
+    SELECT
+        p_year,
+        p_month,
+        s.group_name,
+        s.metric,
+        s.operators,
+        s.min_value,
+        s.max_value,
+        s.mean_value,
+        s.q[1], s.q[2], s.q[3], s.q[4], s.q[5],
+        h.histogram
+    FROM summary s
+    JOIN histograms h
+      ON h.group_name = s.group_name
+     AND h.metric = s.metric;
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION finalize_monthly_scores(
+    p_year   INT,
+    p_month  INT,
+    p_groups VARCHAR[] DEFAULT NULL
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    WITH base AS (
+        SELECT
+            m.operator_key,
+            o.group_name,
+
+            COALESCE(m.call_count, 0)         AS call_count,
+            COALESCE(m.kpi, 0)                AS kpi,
+            COALESCE(m.avg_busy_per_call, 0) AS avg_busy_per_call
+        FROM operator_monthly_metrics m
+        JOIN operators o ON o.operator_key = m.operator_key
+        WHERE m.year = p_year
+          AND m.month = p_month
+          -- ranks are per group: the other groups are unaffected
+          AND (p_groups IS NULL OR o.group_name = ANY(p_groups))
+    ),
+
+    stats AS (
+        SELECT
+            *,
+            MIN(call_count) OVER (PARTITION BY group_name) AS min_call,
+            MAX(call_count) OVER (PARTITION BY group_name) AS max_call,
+
+            MIN(kpi) OVER (PARTITION BY group_name) AS min_kpi,
+            MAX(kpi) OVER (PARTITION BY group_name) AS max_kpi,
+
+            MIN(avg_busy_per_call) OVER (PARTITION BY group_name) AS min_avg,
+            MAX(avg_busy_per_call) OVER (PARTITION BY group_name) AS max_avg
+        FROM base
+    ),
+
+    normalized AS (
+        SELECT
+            operator_key,
+            group_name,
+
+            CASE
+                WHEN max_call = min_call THEN 0
+                ELSE (call_count - min_call)::FLOAT / (max_call - min_call)
+            END AS count_norm,
+
+            CASE
+                WHEN max_kpi = min_kpi THEN 0
+                ELSE (kpi - min_kpi)::FLOAT / (max_kpi - min_kpi)
+            END AS kpi_norm,
+
+            CASE
+                WHEN max_avg = min_avg THEN 0
+                ELSE (max_avg - avg_busy_per_call)::FLOAT / (max_avg - min_avg)
+            END AS avg_norm
+        FROM stats
+    ),
+
+    scored AS (
+        SELECT
+            operator_key,
+            group_name,
+            (0.5 * count_norm
+           + 0.1 * kpi_norm
+           + 0.4 * avg_norm) AS total_score
+        FROM normalized
+    ),
+
+    ranked AS (
+        SELECT
+            operator_key,
+            group_name,
+            total_score,
+            DENSE_RANK() OVER (
+                PARTITION BY group_name
+                ORDER BY total_score DESC
+            ) AS rank
+        FROM scored
+    )
+
+    UPDATE operator_monthly_metrics m
+    SET
+        rank = r.rank,
+
+        score = CASE
+            WHEN r.rank = 1 THEN 1000
+            WHEN r.rank = 2 THEN 900
+            WHEN r.rank = 3 THEN 800
+            WHEN r.rank = 4 THEN 700
+            WHEN r.rank = 5 THEN 600
+            WHEN r.rank = 6 THEN 500
+            WHEN r.rank = 7 THEN 400
+            WHEN r.rank = 8 THEN 300
+            WHEN r.rank = 9 THEN 200
+            WHEN r.rank = 10 THEN 100
+            ELSE 0
+        END,
+
+        is_top_1 = (r.rank <= 3),
+
+        stars = CASE
+            WHEN r.rank = 1 THEN 3
+            WHEN r.rank = 2 THEN 2
+            WHEN r.rank = 3 THEN 1
+            ELSE 0
+        END
+    FROM ranked r
+    WHERE m.operator_key = r.operator_key
+      AND m.year = p_year
+      AND m.month = p_month
+      -- score, is_top_1 and stars follow from rank
+      AND m.rank IS DISTINCT FROM r.rank;
+
+    PERFORM refresh_cycle_percentiles(p_year, p_month, p_groups);
+    PERFORM refresh_group_cycle_stats(p_year, p_month, p_groups);
+END;
+$$;
+
+
+-- existing cycles: statistics and positions only, ranks are left alone
+SELECT
+    refresh_cycle_percentiles(c.year, c.month),
+    refresh_group_cycle_stats(c.year, c.month)
+FROM (
+    SELECT DISTINCT year, month
+    FROM operator_monthly_metrics
+) c;
+
+ANALYZE group_cycle_stats;
@@ -0,0 +1,16 @@
+-- Upstream rows rejected by the validation stage (app.services.validation),
+-- with the reasons and the row as received. The rows of a day are replaced
+-- whenever the day is parsed again.
+CREATE TABLE IF NOT EXISTS etl_quarantine (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    day DATE NOT NULL,
+    -- the raw ID, which may be what is wrong with the row
+    agent_id VARCHAR,
+    login VARCHAR,
+    reasons VARCHAR[] NOT NULL,
+    payload JSONB NOT NULL,
+    quarantined_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_etl_quarantine_day
+ON etl_quarantine (day);
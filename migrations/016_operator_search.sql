@@ -0,0 +1,57 @@
+-- Operator search (GET /api/operators/search): a trigram index over one
+-- Latin search key per operator, made of the transliterated full name,
+-- the login and the agent_id. Queries go through the same
+-- transliteration, so "Иванов", "ivanov" and "ivanof" find the same
+-- operator, and a login or agent_id fragment finds it by substring.
+--
+-- pg_trgm ships with PostgreSQL (contrib); creating it needs the CREATE
+-- privilege on the database.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+
+-- Lower-case Latin words: Cyrillic (Russian, plus the Uzbek letters the
+-- roster uses) is transliterated, anything else but letters and digits
+-- becomes a single space. Upper-case Cyrillic is folded explicitly so the
+-- key does not depend on the database's LC_CTYPE.
+--
+-- operators.search_key is generated from it: after changing this
+-- function, rewrite the column (UPDATE operators SET full_name = full_name).
+CREATE OR REPLACE FUNCTION operator_search_key(p_text TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT btrim(regexp_replace(
+        translate(
+            replace(replace(replace(replace(replace(
+            replace(replace(replace(replace(
+                lower(translate(
+                    p_text,
+                    'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯЎҚҒҲ',
+                    'абвгдеёжзийклмнопрстуфхцчшщъыьэюяўқғҳ'
+                )),
+                'щ', 'shch'), 'ж', 'zh'), 'х', 'kh'), 'ц', 'ts'), 'ч', 'ch'),
+                'ш', 'sh'), 'ю', 'yu'), 'я', 'ya'), 'ё', 'yo'),
+            -- ъ and ь have no counterpart and are dropped
+            'абвгдезийклмнопрстуфыэўқғҳъь',
+            'abvgdeziyklmnoprstufyeuqgh'
+        ),
+        '[^a-z0-9]+', ' ', 'g'
+    ))
+$$;
+
+
+ALTER TABLE operators
+    ADD COLUMN IF NOT EXISTS search_key TEXT
+        GENERATED ALWAYS AS (
+            operator_search_key(full_name)
+            || ' ' || operator_search_key(operator_id)
+            || ' ' || COALESCE(agent_id::text, '')
+        ) STORED;
+
+-- serves both word similarity (<%) and substring (LIKE '%...%') matches
+CREATE INDEX IF NOT EXISTS idx_operators_search_key_trgm
+ON operators USING gin (search_key gin_trgm_ops);
+
+ANALYZE operators;
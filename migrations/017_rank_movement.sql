@@ -0,0 +1,388 @@
+-- Rank movement: every operator_daily_rank row carries the change against
+-- the operator's previous ranked day of the cycle (rank_delta, positive =
+-- moved up; NULL on the first day) and the number of consecutive ranked
+-- days at the current rank (rank_streak, "#1 for 5 days").
+--
+-- snapshot_daily_rank computes both from the previous row in the same
+-- statement that writes the day; rebuild_daily_rank with window functions
+-- over the whole cycle. The latest values are copied onto
+-- operator_monthly_metrics, so the leaderboard reads them from the rows it
+-- already reads.
+ALTER TABLE operator_daily_rank
+    ADD COLUMN IF NOT EXISTS rank_delta INT,
+    ADD COLUMN IF NOT EXISTS rank_streak INT NOT NULL DEFAULT 1;
+
+ALTER TABLE operator_monthly_metrics
+    ADD COLUMN IF NOT EXISTS rank_delta INT,
+    ADD COLUMN IF NOT EXISTS rank_streak INT;
+
+-- leaderboard / top operators stay index-only
+DROP INDEX IF EXISTS idx_operator_monthly_metrics_cycle_rank;
+
+CREATE INDEX idx_operator_monthly_metrics_cycle_rank
+ON operator_monthly_metrics (year, month, rank)
+INCLUDE (
+    operator_key, score, stars, call_count, kpi, avg_busy_per_call,
+    rank_delta, rank_streak
+);
+
+
+-- monthly rows take the movement of their latest ranked day
+CREATE OR REPLACE FUNCTION refresh_monthly_rank_movement(
+    p_year  INT,
+    p_month INT
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE operator_monthly_metrics m
+    SET
+        rank_delta = l.rank_delta,
+        rank_streak = l.rank_streak
+    FROM (
+        SELECT DISTINCT ON (operator_key)
+            operator_key,
+            rank_delta,
+            rank_streak
+        FROM operator_daily_rank
+        WHERE year = p_year
+          AND month = p_month
+        ORDER BY operator_key, date DESC
+    ) l
+    WHERE m.operator_key = l.operator_key
+      AND m.year = p_year
+      AND m.month = p_month
+      AND (m.rank_delta, m.rank_streak)
+          IS DISTINCT FROM (l.rank_delta, l.rank_streak);
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION snapshot_daily_rank(
+    p_year INT,
+    p_month INT,
+    p_date DATE
+)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO operator_daily_rank (
+        operator_key,
+        year,
+        month,
+        date,
+        rank,
+        rank_delta,
+        rank_streak
+    )
+    SELECT
+        m.operator_key,
+        p_year,
+        p_month,
+        p_date,
+        m.rank,
+        prev.rank - m.rank,
+        CASE WHEN prev.rank = m.rank THEN prev.rank_streak + 1 ELSE 1 END
+    FROM operator_monthly_metrics m
+    -- the operator's previous ranked day of the cycle
+    LEFT JOIN LATERAL (
+        SELECT d.rank, d.rank_streak
+        FROM operator_daily_rank d
+        WHERE d.operator_key = m.operator_key
+          AND d.year = p_year
+          AND d.month = p_month
+          AND d.date < p_date
+        ORDER BY d.date DESC
+        LIMIT 1
+    ) prev ON true
+    WHERE m.year = p_year
+      AND m.month = p_month
+      AND m.rank IS NOT NULL
+    ON CONFLICT (operator_key, date)
+    DO UPDATE SET
+        rank  = EXCLUDED.rank,
+        rank_delta = EXCLUDED.rank_delta,
+        rank_streak = EXCLUDED.rank_streak,
+        created_at = now()
+    WHERE (
+        operator_daily_rank.rank,
+        operator_daily_rank.rank_delta,
+        operator_daily_rank.rank_streak
+    ) IS DISTINCT FROM (
+        EXCLUDED.rank,
+        EXCLUDED.rank_delta,
+        EXCLUDED.rank_streak
+    );
+
+    -- a day loaded out of order leaves the later days' movement to the
+    -- next rebuild and does not replace the latest one
+    UPDATE operator_monthly_metrics m
+    SET
+        rank_delta = d.rank_delta,
+        rank_streak = d.rank_streak
+    FROM operator_daily_rank d
+    WHERE d.operator_key = m.operator_key
+      AND d.date = p_date
+      AND m.year = p_year
+      AND m.month = p_month
+      AND NOT EXISTS (
+          SELECT 1
+          FROM operator_daily_rank n
+          WHERE n.operator_key = d.operator_key
+            AND n.year = p_year
+            AND n.month = p_month
+            AND n.date > p_date
+      )
+      AND (m.rank_delta, m.rank_streak)
+          IS DISTINCT FROM (d.rank_delta, d.rank_streak);
+END;
+$$;
+
+
+CREATE OR REPLACE FUNCTION rebuild_daily_rank(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_start_date DATE;
+    v_end_date   DATE;
+    v_rows       INT;
+BEGIN
+
+    IF p_month = 1 THEN
+        v_start_date := make_date(p_year - 1, 12, 20);
+    ELSE
+        v_start_date := make_date(p_year, p_month - 1, 20);
+    END IF;
+
+    v_end_date := make_date(p_year, p_month, 20);
+
+    WITH daily AS (
+        SELECT
+            operator_key,
+            date,
+            call_count,
+            CASE
+                WHEN call_count > 0 THEN
+                    EXTRACT(EPOCH FROM busy_duration::interval) / call_count
+            END AS avg_busy,
+            kpi
+        FROM operator_metrics
+        WHERE date >= v_start_date
+          AND date <  v_end_date
+    ),
+
+    days AS (
+        SELECT DISTINCT date
+        FROM daily
+    ),
+
+    first_seen AS (
+        SELECT
+            operator_key,
+            MIN(date) AS first_date
+        FROM daily
+        GROUP BY operator_key
+    ),
+
+    -- one row per operator per day since the operator's first day in the
+    -- cycle, so days without metrics still carry the cumulative values
+    grid AS (
+        SELECT
+            f.operator_key,
+            o.group_name,
+            d.date,
+            x.call_count,
+            x.avg_busy,
+            x.kpi
+        FROM first_seen f
+        JOIN operators o ON o.operator_key = f.operator_key
+        JOIN days d ON d.date >= f.first_date
+        LEFT JOIN daily x
+          ON x.operator_key = f.operator_key
+         AND x.date = d.date
+    ),
+
+    cumulative AS (
+        SELECT
+            operator_key,
+            group_name,
+            date,
+            kpi,
+
+            ROUND(SUM(COALESCE(call_count, 0)) OVER w)::INT AS call_count,
+            AVG(avg_busy) OVER w                            AS avg_busy,
+            COUNT(kpi) OVER w                               AS kpi_grp
+        FROM grid
+        WINDOW w AS (PARTITION BY operator_key ORDER BY date)
+    ),
+
+    as_of AS (
+        SELECT
+            operator_key,
+            group_name,
+            date,
+            call_count,
+            COALESCE(avg_busy, 0) AS avg_busy_per_call,
+
+            -- latest non-null KPI up to this day
+            COALESCE(FIRST_VALUE(kpi) OVER (
+                PARTITION BY operator_key, kpi_grp
+                ORDER BY date
+            ), 0) AS kpi
+        FROM cumulative
+    ),
+
+    stats AS (
+        SELECT
+            *,
+            MIN(call_count) OVER g AS min_call,
+            MAX(call_count) OVER g AS max_call,
+
+            MIN(kpi) OVER g AS min_kpi,
+            MAX(kpi) OVER g AS max_kpi,
+
+            MIN(avg_busy_per_call) OVER g AS min_avg,
+            MAX(avg_busy_per_call) OVER g AS max_avg
+        FROM as_of
+        WINDOW g AS (PARTITION BY group_name, date)
+    ),
+
+    scored AS (
+        SELECT
+            operator_key,
+            group_name,
+            date,
+            (0.5 * CASE
+                    WHEN max_call = min_call THEN 0
+                    ELSE (call_count - min_call)::FLOAT / (max_call - min_call)
+                END
+           + 0.1 * CASE
+                    WHEN max_kpi = min_kpi THEN 0
+                    ELSE (kpi - min_kpi)::FLOAT / (max_kpi - min_kpi)
+                END
+           + 0.4 * CASE
+                    WHEN max_avg = min_avg THEN 0
+                    ELSE (max_avg - avg_busy_per_call)::FLOAT / (max_avg - min_avg)
+                END) AS total_score
+        FROM stats
+    ),
+
+    ranked AS (
+        SELECT
+            operator_key,
+            date,
+            DENSE_RANK() OVER (
+                PARTITION BY group_name, date
+                ORDER BY total_score DESC
+            ) AS rank
+        FROM scored
+    ),
+
+    -- runs of consecutive days at the same rank (gaps and islands)
+    runs AS (
+        SELECT
+            operator_key,
+            date,
+            rank,
+            LAG(rank) OVER o - rank AS rank_delta,
+            ROW_NUMBER() OVER o
+              - ROW_NUMBER() OVER (PARTITION BY operator_key, rank ORDER BY date)
+                AS run
+        FROM ranked
+        WINDOW o AS (PARTITION BY operator_key ORDER BY date)
+    )
+
+    INSERT INTO operator_daily_rank (
+        operator_key,
+        year,
+        month,
+        date,
+        rank,
+        rank_delta,
+        rank_streak
+    )
+    SELECT
+        operator_key,
+        p_year,
+        p_month,
+        date,
+        rank,
+        rank_delta,
+        ROW_NUMBER() OVER (
+            PARTITION BY operator_key, rank, run
+            ORDER BY date
+        )
+    FROM runs
+    ON CONFLICT (operator_key, date)
+    DO UPDATE SET
+        year  = EXCLUDED.year,
+        month = EXCLUDED.month,
+        rank  = EXCLUDED.rank,
+        rank_delta = EXCLUDED.rank_delta,
+        rank_streak = EXCLUDED.rank_streak,
+        created_at = now();
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    -- rows of this cycle that the rebuild did not touch are stale
+    DELETE FROM operator_daily_rank
+    WHERE year = p_year
+      AND month = p_month
+      AND created_at < now();
+
+    PERFORM refresh_monthly_rank_movement(p_year, p_month);
+
+    RETURN v_rows;
+END;
+$$;
+
+
+-- existing history keeps its ranks; only the movement is derived
+WITH runs AS (
+    SELECT
+        operator_key,
+        year,
+        month,
+        date,
+        rank,
+        LAG(rank) OVER o - rank AS rank_delta,
+        ROW_NUMBER() OVER o
+          - ROW_NUMBER() OVER (
+                PARTITION BY operator_key, year, month, rank
+                ORDER BY date
+            ) AS run
+    FROM operator_daily_rank
+    WINDOW o AS (PARTITION BY operator_key, year, month ORDER BY date)
+),
+
+moves AS (
+    SELECT
+        operator_key,
+        date,
+        rank_delta,
+        ROW_NUMBER() OVER (
+            PARTITION BY operator_key, year, month, rank, run
+            ORDER BY date
+        ) AS rank_streak
+    FROM runs
+)
+
+UPDATE operator_daily_rank d
+SET
+    rank_delta = mv.rank_delta,
+    rank_streak = mv.rank_streak
+FROM moves mv
+WHERE d.operator_key = mv.operator_key
+  AND d.date = mv.date;
+
+SELECT refresh_monthly_rank_movement(c.year, c.month)
+FROM (
+    SELECT DISTINCT year, month
+    FROM operator_daily_rank
+) c;
@@ -0,0 +1,19 @@
+-- The KPI sync (app.services.kpi_sync) rewrites operator_metrics.kpi for
+-- whole cycles in one statement and then recomputes the KPI of the
+-- affected monthly rows in one set-based UPDATE. The per-row monthly
+-- recalc would redo the full cycle aggregation for every daily row, so a
+-- transaction can switch it off for its own statements:
+--
+--     SELECT set_config('top_operator.skip_monthly_recalc', 'on', true);
+--
+-- The WHEN clause keeps the skipped rows from even calling the function.
+DROP TRIGGER IF EXISTS trg_operator_metrics_to_monthly_update ON operator_metrics;
+
+CREATE TRIGGER trg_operator_metrics_to_monthly_update
+AFTER INSERT OR UPDATE ON operator_metrics
+FOR EACH ROW
+WHEN (
+    current_setting('top_operator.skip_monthly_recalc', true)
+        IS DISTINCT FROM 'on'
+)
+EXECUTE FUNCTION trg_update_monthly_metrics_daily();
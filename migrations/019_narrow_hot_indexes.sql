@@ -0,0 +1,30 @@
+-- Let the frequent metric updates be HOT (heap-only) again. An UPDATE can
+-- only be HOT when it changes no indexed column, and INCLUDE columns
+-- count: with call_count / kpi / busy_duration covered by the primary key
+-- of operator_metrics, and call_count / kpi / avg_busy_per_call by the
+-- cycle/rank index of operator_monthly_metrics, every ingest, intraday
+-- poll, KPI sync and monthly recalc rewrote those indexes as well.
+--
+-- The keys stay the same; only the payload columns go. The recalc reads
+-- (~30 rows per operator and cycle) and the leaderboard (10 rows) fetch
+-- them from the heap instead. The cycle/rank index keeps the columns that
+-- only change together with rank, which is indexed anyway.
+--
+-- Both tables are locked while their indexes are rebuilt.
+ALTER TABLE operator_metrics
+    DROP CONSTRAINT pk_operator_metrics,
+    ADD CONSTRAINT pk_operator_metrics
+        PRIMARY KEY (operator_key, date);
+
+DROP INDEX IF EXISTS idx_operator_monthly_metrics_cycle_rank;
+
+CREATE INDEX idx_operator_monthly_metrics_cycle_rank
+ON operator_monthly_metrics (year, month, rank)
+INCLUDE (operator_key, score, stars);
+
+-- now that updates can stay on their page, leave room for them
+ALTER TABLE operator_metrics SET (fillfactor = 90);
+ALTER TABLE operator_monthly_metrics SET (fillfactor = 90);
+
+ANALYZE operator_metrics;
+ANALYZE operator_monthly_metrics;
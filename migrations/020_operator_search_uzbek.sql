@@ -0,0 +1,36 @@
+-- operator_search_key: Uzbek letters follow the Uzbek Latin alphabet, so
+-- "Ўткир" and "O'tkir" (or "Oʻtkir") give the same key, "otkir": ў -> o,
+-- ғ -> g, and apostrophes / modifier letters are dropped instead of
+-- splitting the word. х stays "kh" (Russian); the Uzbek Latin "x"
+-- spelling only matches fuzzily.
+CREATE OR REPLACE FUNCTION operator_search_key(p_text TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+AS $$
+    SELECT btrim(regexp_replace(
+        translate(
+            replace(replace(replace(replace(replace(
+            replace(replace(replace(replace(
+                lower(translate(
+                    p_text,
+                    'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯЎҚҒҲ',
+                    'абвгдеёжзийклмнопрстуфхцчшщъыьэюяўқғҳ'
+                )),
+                'щ', 'shch'), 'ж', 'zh'), 'х', 'kh'), 'ц', 'ts'), 'ч', 'ch'),
+                'ш', 'sh'), 'ю', 'yu'), 'я', 'ya'), 'ё', 'yo'),
+            -- ъ, ь and the apostrophes of o' / g' have no counterpart and
+            -- are dropped
+            'абвгдезийклмнопрстуфыэўқғҳъь''’‘ʻʼ`',
+            'abvgdeziyklmnoprstufyeoqgh'
+        ),
+        '[^a-z0-9]+', ' ', 'g'
+    ))
+$$;
+
+-- recompute the stored search keys with the new function
+UPDATE operators
+SET full_name = full_name;
+
+ANALYZE operators;
@@ -0,0 +1,83 @@
+-- restore_cycle brought back the archived ranks but not their movement:
+-- the archive does not store rank_delta / rank_streak, so restored rank
+-- rows had none and the monthly rows kept whatever they had. The restored
+-- metrics carry full_duration, so the movement is derived again from the
+-- restored ranks, the same way 021 backfilled it.
+CREATE OR REPLACE FUNCTION restore_cycle(
+    p_year  INT,
+    p_month INT
+)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rows INT;
+BEGIN
+
+    INSERT INTO operator_metrics (
+        operator_key,
+        date,
+        busy_duration,
+        call_count,
+        distributed_call_count,
+        full_duration,
+        hold_duration,
+        idle_duration,
+        lock_duration,
+        kpi,
+        content_hash
+    )
+    SELECT
+        a.operator_key,
+        (e->>'date')::DATE,
+        e->>'busy_duration',
+        (e->>'call_count')::DOUBLE PRECISION,
+        (e->>'distributed_call_count')::DOUBLE PRECISION,
+        e->>'full_duration',
+        e->>'hold_duration',
+        e->>'idle_duration',
+        e->>'lock_duration',
+        (e->>'kpi')::DOUBLE PRECISION,
+        e->>'content_hash'
+    FROM operator_metrics_archive a
+    CROSS JOIN LATERAL jsonb_array_elements(a.days) e
+    WHERE a.year = p_year
+      AND a.month = p_month
+    ON CONFLICT (operator_key, date) DO NOTHING;
+
+    GET DIAGNOSTICS v_rows = ROW_COUNT;
+
+    INSERT INTO operator_daily_rank (
+        operator_key,
+        year,
+        month,
+        date,
+        rank
+    )
+    SELECT
+        a.operator_key,
+        p_year,
+        p_month,
+        (e->>'date')::DATE,
+        (e->>'rank')::INT
+    FROM operator_metrics_archive a
+    CROSS JOIN LATERAL jsonb_array_elements(a.days) e
+    WHERE a.year = p_year
+      AND a.month = p_month
+      AND e->>'rank' IS NOT NULL
+    ON CONFLICT (operator_key, date) DO NOTHING;
+
+    -- the archive keeps ranks only; derive their movement again
+    PERFORM rebuild_rank_movement(p_year, p_month);
+
+    DELETE FROM operator_metrics_archive
+    WHERE year = p_year
+      AND month = p_month;
+
+    DELETE FROM archived_cycles
+    WHERE year = p_year
+      AND month = p_month;
+
+    RETURN v_rows;
+END;
+$$;
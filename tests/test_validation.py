@@ -0,0 +1,150 @@
+from app.services.validation import MAX_AGENT_ID, validate_payload
+
+
+def row(agent_id="101", **fields) -> dict:
+    return {
+        "ID": agent_id,
+        "login": f"op{agent_id}",
+        "CallCount": "12",
+        "DistributedCallCount": "14",
+        "BusyDuration": "1:30:00",
+        "FullDuration": "8:00:00",
+        "HoldDuration": "0:05:00",
+        "IdleDuration": "2:00:00",
+        "LockDuration": "0:00:00",
+        **fields,
+    }
+
+
+def test_accepts_well_formed_rows():
+    result = validate_payload([row("101"), row("102")])
+
+    assert result.rejected == {}
+    assert list(result.valid["agent_id"]) == [101, 102]
+    assert list(result.valid["call_count"]) == [12.0, 12.0]
+    assert list(result.valid["busy_duration"]) == ["1:30:00", "1:30:00"]
+
+
+def test_one_bad_row_does_not_reject_the_day():
+    result = validate_payload([row("101"), row("x1"), row("103")])
+
+    assert result.rejected == {1: ["bad_id"]}
+    assert list(result.valid["agent_id"]) == [101, 103]
+
+
+def test_rejects_blank_and_missing_ids():
+    result = validate_payload([row("  "), row(None), {"login": "nobody"}])
+
+    assert result.rejected == {
+        0: ["missing_id"],
+        1: ["missing_id"],
+        2: ["missing_id"],
+    }
+    assert result.valid.empty
+
+
+def test_rejects_non_numeric_ids():
+    result = validate_payload([row("12a"), row("-5"), row("1.5")])
+
+    assert result.rejected == {0: ["bad_id"], 1: ["bad_id"], 2: ["bad_id"]}
+
+
+def test_ids_are_stripped_and_may_be_numbers():
+    result = validate_payload([row(" 101 "), row(102)])
+
+    assert result.rejected == {}
+    assert list(result.valid["agent_id"]) == [101, 102]
+
+
+def test_rejects_ids_beyond_int_range():
+    result = validate_payload([row(str(MAX_AGENT_ID)), row(str(MAX_AGENT_ID + 1))])
+
+    assert result.rejected == {1: ["agent_id_out_of_range"]}
+    assert list(result.valid["agent_id"]) == [MAX_AGENT_ID]
+
+
+def test_rejects_bad_and_negative_counts():
+    result = validate_payload([
+        row("101", CallCount="many"),
+        row("102", DistributedCallCount="-1"),
+        row("103", CallCount="inf"),
+    ])
+
+    assert result.rejected == {
+        0: ["bad_call_count"],
+        1: ["negative_distributed_call_count"],
+        2: ["bad_call_count"],
+    }
+
+
+def test_missing_counts_are_zero():
+    payload = [row("101", CallCount=None, DistributedCallCount="")]
+    del payload[0]["CallCount"]
+
+    result = validate_payload(payload)
+
+    assert result.rejected == {}
+    assert list(result.valid["call_count"]) == [0.0]
+    assert list(result.valid["distributed_call_count"]) == [0.0]
+
+
+def test_rejects_bad_duration_format():
+    result = validate_payload([
+        row("101", BusyDuration="90 min"),
+        row("102", HoldDuration="0:60:00"),
+        row("103", IdleDuration="1:00"),
+    ])
+
+    assert result.rejected == {
+        0: ["bad_busy_duration"],
+        1: ["bad_hold_duration"],
+        2: ["bad_idle_duration"],
+    }
+
+
+def test_rejects_durations_over_a_day():
+    result = validate_payload([
+        row("101", FullDuration="24:00:00"),
+        row("102", FullDuration="24:00:01"),
+    ])
+
+    assert result.rejected == {1: ["full_duration_out_of_range"]}
+
+
+def test_missing_durations_stay_null():
+    result = validate_payload([row("101", LockDuration=None)])
+
+    assert result.rejected == {}
+    assert list(result.valid["lock_duration"]) == [None]
+
+
+def test_duplicate_ids_keep_the_last_row():
+    result = validate_payload([
+        row("101", CallCount="1"),
+        row("102"),
+        row("101", CallCount="3"),
+    ])
+
+    assert result.rejected == {0: ["duplicate_id"]}
+    assert list(result.valid["agent_id"]) == [102, 101]
+    assert list(result.valid["call_count"]) == [12.0, 3.0]
+
+
+def test_a_rejected_duplicate_does_not_shadow_a_valid_row():
+    result = validate_payload([row("101"), row("101", BusyDuration="bad")])
+
+    assert result.rejected == {1: ["bad_busy_duration"]}
+    assert list(result.valid["agent_id"]) == [101]
+
+
+def test_lists_every_reason_of_a_row():
+    result = validate_payload([row("101", CallCount="-2", BusyDuration="soon")])
+
+    assert result.rejected == {0: ["negative_call_count", "bad_busy_duration"]}
+
+
+def test_empty_payload():
+    result = validate_payload([])
+
+    assert result.rejected == {}
+    assert result.valid.empty